@@ -0,0 +1 @@
+"""Benchmarks of moduledocs, run as python -m benchmarks.<name>."""
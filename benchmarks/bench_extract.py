@@ -0,0 +1,37 @@
+"""
+Benchmark of single pass ModuleVisitor against extract_* functions.
+
+Run from repository root: python -m benchmarks.bench_extract
+"""
+
+import time
+from pathlib import Path
+import parso
+from moduledocs.parse import extract_tree, extract_tree_functions
+from .corpus import large_module
+
+
+def best_of(function, tree, repeat: int = 5) -> float:
+    """Return best time of repeated extraction."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(tree, Path('large.py'))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """Run benchmark and print result."""
+    tree = parso.parse(large_module())
+    assert extract_tree(tree, Path('large.py')) == \
+        extract_tree_functions(tree, Path('large.py'))
+    functions_time = best_of(extract_tree_functions, tree)
+    visitor_time = best_of(extract_tree, tree)
+    print('extract_* functions: {:.4f}s'.format(functions_time))
+    print('ModuleVisitor:       {:.4f}s'.format(visitor_time))
+    print('speedup:             {:.2f}x'.format(functions_time / visitor_time))
+
+
+if __name__ == '__main__':
+    main()
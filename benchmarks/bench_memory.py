@@ -0,0 +1,89 @@
+"""
+Memory benchmark of parsed token objects.
+
+Compares memory retained by ParsedModule of large module with slotted and
+interned tokens against the same tree of plain dataclasses with instance
+dictionaries. Run from repository root: python -m benchmarks.bench_memory
+"""
+
+import gc
+import tracemalloc
+from dataclasses import dataclass, fields, is_dataclass
+from pathlib import Path
+from typing import Any
+import parso
+from moduledocs.parse import extract_tree
+from moduledocs.parsed_objects import ParsedName, ParsedOperator,\
+    ParsedKeyword, ParsedLiteral
+from .corpus import large_module
+
+
+@dataclass
+class DictName:
+    """Parsed name with instance dictionary."""
+
+    value: str
+    annotation: str = ''
+
+
+@dataclass
+class DictToken:
+    """Parsed operator, keyword or literal with instance dictionary."""
+
+    value: str
+
+
+def fresh(value: str) -> str:
+    """Return copy of string which is not shared with anything."""
+    return value.encode().decode()
+
+
+def plain_copy(obj: Any) -> Any:
+    """Copy parsed tree replacing tokens with dictionary based objects."""
+    if isinstance(obj, ParsedName):
+        return DictName(fresh(obj.value), fresh(obj.annotation))
+    if isinstance(obj, (ParsedOperator, ParsedKeyword, ParsedLiteral)):
+        return DictToken(fresh(obj.value))
+    if isinstance(obj, list):
+        return [plain_copy(item) for item in obj]
+    if is_dataclass(obj):
+        return type(obj)(**{field.name: plain_copy(getattr(obj, field.name))
+                            for field in fields(obj) if field.init})
+    return obj
+
+
+def retained(function, *args) -> int:
+    """Return bytes still allocated by result of function call."""
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def extract_compact(source: str):
+    """Extract module and drop parso tree."""
+    return extract_tree(parso.parse(source), Path('large.py'))
+
+
+def extract_plain(source: str):
+    """Extract module and convert it to dictionary based tokens."""
+    return plain_copy(extract_compact(source))
+
+
+def main():
+    """Run benchmark and print result."""
+    source = large_module()
+    parso.parse('')
+    compact = retained(extract_compact, source)
+    plain = retained(extract_plain, source)
+    print('dict based tokens:     {:.2f} MB'.format(plain / 2 ** 20))
+    print('slotted and interned:  {:.2f} MB'.format(compact / 2 ** 20))
+    print('reduction:             {:.0%}'.format(1 - compact / plain))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark of MarkdownBuilder on huge module and huge index.
+
+Output size is doubled on every step, time per megabyte of output should
+stay the same if rendering is linear. Run from repository root:
+python -m benchmarks.bench_render
+"""
+
+import time
+from pathlib import Path
+from typing import Callable
+import parso
+from moduledocs.index_tree import group_paths
+from moduledocs.parse import extract_tree
+from moduledocs.style_markdown import MarkdownBuilder
+from .corpus import large_module
+
+STEPS = [1000, 2000, 4000, 8000]
+
+
+def best_of(function: Callable[[], str], repeat: int = 3):
+    """Return best time of repeated call and size of its output."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = function()
+        best = min(best, time.perf_counter() - start)
+    return best, len(text)
+
+
+def report(name: str, size: int, seconds: float, length: int):
+    """Print time of rendering and time per megabyte of output."""
+    print('{:<6} {:>6} {:>10} chars {:.4f}s {:.4f}s/MB'.format(
+        name, size, length, seconds, seconds / length * 2 ** 20))
+
+
+def main():
+    """Run benchmark and print result."""
+    builder = MarkdownBuilder()
+    builder.setting()
+    for functions in STEPS:
+        tree = parso.parse(large_module(functions, nesting=2))
+        module = extract_tree(tree, Path('large.py'))
+        seconds, length = best_of(lambda: builder.feed(module))
+        report('feed', functions, seconds, length)
+    for packages in STEPS:
+        items = ['package_{}/sub_{}/module_{}.py'.format(
+            number // 100, number // 10, number)
+            for number in range(packages * 10)]
+        seconds, length = best_of(lambda: ''.join(
+            text for _, text in builder.index_pages(
+                group_paths(Path(item) for item in items))))
+        report('index', packages * 10, seconds, length)
+
+
+if __name__ == '__main__':
+    main()
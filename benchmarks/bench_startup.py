@@ -0,0 +1,63 @@
+"""
+Benchmark of startup of command line interface.
+
+Prints the slowest imports of moduledocs.cli and time of documentation
+build of single small file, which is dominated by startup. Run from
+repository root: python -m benchmarks.bench_startup
+"""
+
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+# Budget of cumulative import time of moduledocs.cli in seconds, loose
+# enough for loaded machines, it takes about 25ms
+IMPORT_BUDGET = 0.25
+# Modules which are imported only when they are used
+LAZY_MODULES = ['fire', 'parso', 'asyncio', 'concurrent.futures.process',
+                'moduledocs.parse', 'moduledocs.cache', 'moduledocs.watch',
+                'moduledocs.style_markdown', 'moduledocs.style_html',
+                'moduledocs.style_json', 'moduledocs.parse_ast',
+                'moduledocs.ir', 'moduledocs.serve', 'moduledocs.parse_large',
+                'sqlite3']
+RUN_CLI = 'from moduledocs.cli import main; main()'
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def import_times(module: str) -> Dict[str, float]:
+    """Return cumulative import time of every module imported by module."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True,
+        cwd=str(ROOT))
+    times = {}
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            times[parts[2].strip()] = int(parts[1]) / 1e6
+    return times
+
+
+def main():
+    """Run benchmark and print result."""
+    times = import_times('moduledocs.cli')
+    for name, seconds in sorted(times.items(), key=lambda item: -item[1])[:10]:
+        print('import {:<40} {:.4f}s'.format(name, seconds))
+    with tempfile.TemporaryDirectory() as temp:
+        source = Path(temp) / 'small.py'
+        source.write_text('"""Small module."""\n\n\ndef f(x):\n    return x\n')
+        best = float('inf')
+        for _ in range(5):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', RUN_CLI, str(source),
+                            '--output_directory', str(Path(temp) / 'docs')],
+                           check=True, cwd=str(ROOT))
+            best = min(best, time.perf_counter() - start)
+    print('single file build {:.4f}s'.format(best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Deterministic generator of synthetic python source trees."""
+
+from pathlib import Path
+from random import Random
+from typing import Dict, List
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'omega', 'spider', 'cat',
+         'zoo', 'city', 'node', 'tree', 'leaf', 'parse', 'build', 'cache',
+         'index', 'value', 'item', 'data', 'config']
+DECORATORS = ['staticmethod', 'classmethod', 'property', 'cached',
+              'retry(3)', 'route("/path", methods=["GET"])',
+              'validate(strict=True)', 'functools.lru_cache(maxsize=None)']
+
+
+def _name(rng: Random, parts: int = 2) -> str:
+    return '_'.join(rng.choice(WORDS) for _ in range(parts))
+
+
+def _imports(rng: Random, count: int) -> List[str]:
+    lines = ['import os', 'import sys', 'from typing import List, Dict']
+    for number in range(count):
+        names = ', '.join(['{}_{}'.format(_name(rng, 1), n)
+                           for n in range(rng.randint(1, 6))])
+        module = '{}_{}'.format(_name(rng), number)
+        lines.append('from .{} import {}'.format(module, names))
+    return lines
+
+
+def _function(rng: Random, name: str, indent: str, nesting: int,
+              decorators: int) -> List[str]:
+    lines = [indent + '@' + rng.choice(DECORATORS)
+             for _ in range(decorators)]
+    lines.append(indent + 'def {}(self, a: int, b: List[int] = None, '
+                 '*args, c: str = "{}", **kwargs) -> Dict[str, int]:'.format(
+                     name, _name(rng)))
+    lines.append(indent + '    """')
+    lines.append(indent + '    Function {}.'.format(name))
+    lines.append('')
+    lines.append(indent + '    Long description of {}.'.format(_name(rng, 4)))
+    lines.append(indent + '    """')
+    body = indent + '    '
+    for level in range(nesting):
+        statement = rng.choice(['if a > {}:', 'for x{} in range(a):',
+                                'while a < {}:', 'with open(c) as f{}:'])
+        lines.append(body + statement.format(level))
+        body += '    '
+        lines.append(body + 'b = [x * {} for x in range(a) if x]'.format(
+            level))
+    lines.append(body + 'if not b:')
+    lines.append(body + '    raise ValueError("empty {}")'.format(name))
+    if rng.random() < 0.3:
+        lines.append(body + 'yield from b')
+    else:
+        lines.append(body + 'return {"total": sum(b), "a": a}')
+    return lines
+
+
+def _module(rng: Random, classes: int, functions: int, imports: int,
+            nesting: int, decorators: int) -> str:
+    lines = ['"""Generated module {}."""'.format(_name(rng, 3))]
+    lines.extend(_imports(rng, imports))
+    lines.append('LIMIT = {}'.format(rng.randint(1, 1000)))
+    lines.append('TABLE = {' + ', '.join(
+        '"{}": ({}, {})'.format(_name(rng), n, n * 2)
+        for n in range(rng.randint(1, 20))) + '}')
+    for number in range(classes):
+        lines.append('')
+        lines.append('')
+        lines.append('class {}{}(Base, metaclass=Meta):'.format(
+            _name(rng, 1).capitalize(), number))
+        lines.append('    """Class number {}."""'.format(number))
+        lines.append('')
+        lines.append('    size = {}'.format(number))
+        for method in range(rng.randint(1, functions)):
+            lines.append('')
+            lines.extend(_function(rng, 'method_{}'.format(method), '    ',
+                                   rng.randint(0, nesting),
+                                   rng.randint(0, decorators)))
+    for number in range(functions):
+        lines.append('')
+        lines.append('')
+        lines.extend(_function(rng, 'function_{}'.format(number), '',
+                               rng.randint(0, nesting),
+                               rng.randint(0, decorators)))
+    return '\n'.join(lines) + '\n'
+
+
+def large_module(functions: int = 3000, nesting: int = 6) -> str:
+    """Return source of one large module with nested function bodies."""
+    rng = Random(0)
+    return _module(rng, functions // 10, 10, 50, nesting, 2)
+
+
+def generate_corpus(root: Path, seed: int = 0, packages: int = 8,
+                    small_modules: int = 200, huge_modules: int = 2,
+                    deep_modules: int = 5, decorated_modules: int = 5,
+                    import_modules: int = 5) -> Dict[str, int]:
+    """
+    Write synthetic python package tree to root.
+
+    The same seed always gives the same files. Returns number of files and
+    bytes written.
+    """
+    rng = Random(seed)
+    root = Path(root)
+    package_dirs = [root]
+    for number in range(packages):
+        parent = rng.choice(package_dirs)
+        package_dirs.append(parent / 'package_{}'.format(number))
+    kinds = (['small'] * small_modules + ['huge'] * huge_modules +
+             ['deep'] * deep_modules + ['decorated'] * decorated_modules +
+             ['imports'] * import_modules)
+    stats = {'files': 0, 'bytes': 0}
+
+    def write(path: Path, text: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        stats['files'] += 1
+        stats['bytes'] += len(text.encode())
+
+    for package_dir in package_dirs:
+        write(package_dir / '__init__.py', '"""Package."""\n')
+    for number, kind in enumerate(kinds):
+        if kind == 'small':
+            text = _module(rng, rng.randint(0, 2), rng.randint(1, 4),
+                           rng.randint(0, 5), 2, 1)
+        elif kind == 'huge':
+            text = _module(rng, 150, 20, 40, 4, 2)
+        elif kind == 'deep':
+            text = _module(rng, 2, 5, 2, 40, 1)
+        elif kind == 'decorated':
+            text = _module(rng, 10, 10, 2, 1, 12)
+        else:
+            text = _module(rng, 1, 2, 400, 1, 0)
+        module_dir = rng.choice(package_dirs)
+        write(module_dir / '{}_{}_{}.py'.format(kind, _name(rng), number),
+              text)
+    return stats
@@ -0,0 +1,121 @@
+"""
+Benchmark suite over synthetic corpus.
+
+Times find_python, extract, MarkdownBuilder.feed, index pages and save
+separately, writes JSON result and compares it with stored baseline.
+Run from repository root:
+
+    python -m benchmarks.run --output result.json
+    python -m benchmarks.run --baseline result.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from moduledocs import __version__
+from moduledocs.index_tree import group_paths
+from moduledocs.parse import find_python, extract
+from moduledocs.style_markdown import MarkdownBuilder
+from .corpus import generate_corpus
+
+PHASES = ['find_python', 'extract', 'feed', 'index', 'save']
+DEFAULT_TOLERANCE = 0.2
+# Differences below it are noise of timer and file system
+MIN_DELTA = 0.01
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> float:
+    """Return best wall time of repeated call."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_phases(corpus: Path, output: Path, repeat: int) -> Dict[str, float]:
+    """Time every phase of documentation build on corpus."""
+    results = {}
+    paths: List[Path] = list(find_python(corpus))
+    results['find_python'] = best_time(lambda: list(find_python(corpus)),
+                                       repeat)
+    modules = [extract(path) for path in paths]
+    results['extract'] = best_time(lambda: [extract(path) for path in paths],
+                                   repeat)
+    builder = MarkdownBuilder()
+    builder.setting()
+    texts = [(module.path, builder.feed(module)) for module in modules]
+    results['feed'] = best_time(
+        lambda: [builder.feed(module) for module in modules], repeat)
+    results['index'] = best_time(
+        lambda: list(builder.index_pages(group_paths(paths))), repeat)
+    builder.texts = texts
+    results['save'] = best_time(lambda: builder.save(output), repeat)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float],
+            tolerance: float) -> List[str]:
+    """Return phases which are slower than baseline over tolerance."""
+    regressions = []
+    for phase in PHASES:
+        if phase in baseline and \
+                results[phase] > baseline[phase] * (1 + tolerance) and \
+                results[phase] - baseline[phase] > MIN_DELTA:
+            regressions.append(phase)
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """Run benchmark suite, return exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--small', type=int, default=200,
+                        help='number of small modules')
+    parser.add_argument('--huge', type=int, default=2,
+                        help='number of huge modules')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write JSON result to file')
+    parser.add_argument('--baseline', help='JSON result to compare with')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown against baseline')
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as temp:
+        corpus = Path(temp) / 'corpus'
+        stats = generate_corpus(corpus, seed=args.seed,
+                                small_modules=args.small,
+                                huge_modules=args.huge)
+        results = run_phases(corpus, Path(temp) / 'docs', args.repeat)
+    report = {'moduledocs': __version__,
+              'python': platform.python_version(),
+              'corpus': dict(stats, seed=args.seed, small=args.small,
+                             huge=args.huge),
+              'results': results}
+    for phase in PHASES:
+        print('{:<12} {:.4f}s'.format(phase, results[phase]))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get('corpus') != report['corpus']:
+            print('baseline was made on different corpus')
+            return 2
+        regressions = compare(results, baseline['results'], args.tolerance)
+        for phase in regressions:
+            print('regression in {}: {:.4f}s, baseline {:.4f}s'.format(
+                phase, results[phase], baseline['results'][phase]))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,3 +3,5 @@ Static documentation extraction tool for python language.
 
 Supports markdown and html.
 """
+
+__version__ = '1.0.1'
@@ -0,0 +1,234 @@
+"""
+Budgets and fault isolation of extraction of single files.
+
+File over size limit is not read, extraction over time budget is
+interrupted and file which fails is recorded in ErrorReport, the rest of
+build goes on. Worker process which does not get back to interpreter
+after time budget exits, ExtractPool then finds the file which killed it
+by extracting unfinished files one by one in a new worker.
+"""
+
+import faulthandler
+import json
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Worker still busy this long after time budget is killed
+KILL_GRACE = 5.0
+ERROR_KINDS = ('size', 'timeout', 'error', 'crash')
+
+
+class BudgetExceeded(Exception):
+    """Extraction of file took longer than its time budget."""
+
+
+@dataclass(frozen=True)
+class Budget:
+    """
+    Limits of single file, zero means no limit.
+
+    Max size is size of file in bytes, timeout is wall time of its
+    extraction in seconds. Both apply to every file, also to files parsed
+    in chunks (see extract_large), chunks change only how file is parsed.
+    """
+
+    max_size: int = 0
+    timeout: float = 0.0
+
+
+@dataclass
+class FileError:
+    """
+    Failure of single file.
+
+    Kind is one of ERROR_KINDS: file over size limit, extraction over time
+    budget, exception in extraction (error is name of its type) or worker
+    process which died.
+    """
+
+    path: str
+    kind: str
+    error: str
+    message: str
+    seconds: float = 0.0
+
+
+class ErrorReport:
+    """Failures of files of one build in the order they were found."""
+
+    def __init__(self):
+        """Create empty report."""
+        self.errors: List[FileError] = []
+
+    def __len__(self) -> int:
+        """Return number of failed files."""
+        return len(self.errors)
+
+    def __iter__(self) -> Iterator[FileError]:
+        """Iterate over failures."""
+        return iter(self.errors)
+
+    def add(self, error: FileError):
+        """Record failure of file."""
+        self.errors.append(error)
+
+    def report(self) -> dict:
+        """Return report as JSON compatible dictionary."""
+        kinds = {kind: 0 for kind in ERROR_KINDS}
+        for error in self.errors:
+            kinds[error.kind] += 1
+        return {'count': len(self.errors), 'kinds': kinds,
+                'files': [asdict(error) for error in self.errors]}
+
+    def dump(self, report_path: Path):
+        """Write JSON report."""
+        with open(report_path, 'w') as file:
+            json.dump(self.report(), file, indent=1)
+
+
+@contextmanager
+def _alarm(timeout: float, kill: bool) -> Iterator[None]:
+    soft = timeout > 0 and hasattr(signal, 'setitimer') and \
+        threading.current_thread() is threading.main_thread()
+    active = [True]
+
+    def interrupt(signum: int, frame: Any):
+        if active[0]:
+            raise BudgetExceeded()
+
+    if soft:
+        previous = signal.signal(signal.SIGALRM, interrupt)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    if kill and timeout > 0:
+        faulthandler.dump_traceback_later(timeout + KILL_GRACE, exit=True)
+    try:
+        yield
+    finally:
+        active[0] = False
+        if kill and timeout > 0:
+            faulthandler.cancel_dump_traceback_later()
+        if soft:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def extract_within(extractor: Callable[[Path], Any], budget: Budget,
+                   file_name: Path, kill: bool = False) -> Any:
+    """
+    Call extractor on file within budget, return its result or FileError.
+
+    Time budget interrupts extraction by SIGALRM, so it works in main
+    thread on Unix only. With kill process exits when extraction does not
+    get back to interpreter long after budget (use it in workers only).
+    """
+    started = time.perf_counter()
+    try:
+        if budget.max_size:
+            size = file_name.stat().st_size
+            if size > budget.max_size:
+                return FileError(str(file_name), 'size', '',
+                                 '{} bytes, limit is {}'.format(
+                                     size, budget.max_size))
+        with _alarm(budget.timeout, kill):
+            return extractor(file_name)
+    except BudgetExceeded:
+        return FileError(str(file_name), 'timeout', '',
+                         'over time budget of {}s'.format(budget.timeout),
+                         time.perf_counter() - started)
+    except Exception as error:
+        return FileError(str(file_name), 'error', type(error).__name__,
+                         str(error), time.perf_counter() - started)
+
+
+class ExtractPool:
+    """
+    Process pool calling function on files which survives dead workers.
+
+    When worker dies every unfinished file is extracted again one by one
+    in a single worker, file which kills it too gets FileError of kind
+    "timeout" (if it took time budget) or "crash". Without isolate dead
+    worker raises BrokenProcessPool as in plain ProcessPoolExecutor.
+    """
+
+    def __init__(self, jobs: int, function: Callable[[Path], Any],
+                 budget: Optional[Budget] = None, isolate: bool = True):
+        """Create pool of jobs processes."""
+        from concurrent.futures import ProcessPoolExecutor
+        self.jobs = jobs
+        self.function = function
+        self.budget = budget or Budget()
+        self.isolate = isolate
+        self.executor = ProcessPoolExecutor(max_workers=jobs)
+        self.files: Dict[Any, Path] = {}
+        self.recovered: Dict[Any, Any] = {}
+
+    def __enter__(self) -> 'ExtractPool':
+        """Return pool."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop workers."""
+        self.executor.shutdown()
+
+    def submit(self, file_name: Path) -> Any:
+        """Start extraction of file, return its future."""
+        from concurrent.futures.process import BrokenProcessPool, \
+            ProcessPoolExecutor
+        try:
+            future = self.executor.submit(self.function, file_name)
+        except BrokenProcessPool:
+            if not self.isolate:
+                raise
+            self.executor.shutdown(wait=False)
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+            future = self.executor.submit(self.function, file_name)
+        self.files[future] = file_name
+        return future
+
+    def result(self, future: Any) -> Any:
+        """Return result of future, file of dead worker is run alone."""
+        from concurrent.futures.process import BrokenProcessPool
+        if future in self.recovered:
+            return self.recovered[future]
+        try:
+            value = future.result()
+        except BrokenProcessPool:
+            if not self.isolate:
+                raise
+            self._recover()
+            return self.recovered[future]
+        self.files.pop(future, None)
+        return value
+
+    def _recover(self):
+        from concurrent.futures.process import BrokenProcessPool, \
+            ProcessPoolExecutor
+        broken = [future for future in self.files
+                  if future.done() and isinstance(future.exception(),
+                                                  BrokenProcessPool)]
+        single = ProcessPoolExecutor(max_workers=1)
+        try:
+            for future in broken:
+                file_name = self.files.pop(future)
+                started = time.perf_counter()
+                try:
+                    value = single.submit(self.function, file_name).result()
+                except BrokenProcessPool:
+                    seconds = time.perf_counter() - started
+                    single.shutdown(wait=False)
+                    single = ProcessPoolExecutor(max_workers=1)
+                    value = FileError(str(file_name), 'crash', '',
+                                      'worker process died', seconds)
+                    if self.budget.timeout and \
+                            seconds >= self.budget.timeout:
+                        value.kind = 'timeout'
+                        value.message = 'worker killed after time ' \
+                            'budget of {}s'.format(self.budget.timeout)
+                self.recovered[future] = value
+        finally:
+            single.shutdown()
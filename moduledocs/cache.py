@@ -0,0 +1,153 @@
+"""Persistent on-disk cache of parsed modules."""
+
+import os
+import pickle
+from functools import partial
+from hashlib import sha256
+from pathlib import Path
+from typing import Optional
+import parso
+from . import __version__
+from .parse import LARGE_FILE_SIZE, DIGEST_BLOCK, read_source,\
+    decode_source, extract_source, source_digest, rebind
+from .parsed_objects import ParsedModule
+from .profiling import Timings, measure
+
+CACHE_FORMAT = '4'
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+
+
+class ParseCache:
+    """
+    Content addressed cache of extracted ParsedModule objects.
+
+    Entries are keyed by hash of file content together with moduledocs and
+    parso versions, parser and extraction (see extract_source), so cache is
+    never stale after upgrade. Every entry is a
+    pickle file in cache directory. When total size of entries exceeds
+    max_size least recently used entries are removed by evict().
+    """
+
+    def __init__(self, directory: Path,
+                 max_size: int = DEFAULT_CACHE_SIZE, parser: str = 'parso',
+                 extraction: str = 'full'):
+        """Create cache stored in directory."""
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.parser = parser
+        self.extraction = extraction
+        self.salt = '{}:{}:{}:{}:{}'.format(
+            CACHE_FORMAT, __version__, parso.__version__, parser,
+            extraction).encode()
+
+    def key(self, data: bytes) -> str:
+        """Return cache key for raw source content."""
+        return sha256(self.salt + data).hexdigest()
+
+    def file_key(self, file_name: Path) -> str:
+        """Return cache key for content of file, file is read by blocks."""
+        digest = sha256(self.salt)
+        with open(file_name.absolute(), 'rb') as file:
+            for block in iter(partial(file.read, DIGEST_BLOCK), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / '{}.pickle'.format(key[2:])
+
+    def get(self, key: str) -> Optional[ParsedModule]:
+        """Return cached module for key or None."""
+        entry = self._entry(key)
+        try:
+            with open(entry, 'rb') as file:
+                module = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+                ImportError, IndexError, TypeError, ValueError):
+            self._remove(entry)
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return module
+
+    def put(self, key: str, module: ParsedModule):
+        """Store module in cache under key."""
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        temp = entry.with_name('{}.{}.tmp'.format(entry.name, os.getpid()))
+        try:
+            with open(temp, 'wb') as file:
+                pickle.dump(module, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, entry)
+        except OSError:
+            self._remove(temp)
+        except BaseException:
+            # Time budget may interrupt writing
+            self._remove(temp)
+            raise
+
+    def extract(self, file_name: Path,
+                timings: Optional[Timings] = None) -> ParsedModule:
+        """
+        Extract parsed module from file using cache.
+
+        Large file is not read at once, it is hashed by blocks and
+        extracted in chunks (see extract_large).
+        """
+        if file_name.stat().st_size >= LARGE_FILE_SIZE:
+            return self._extract_large(file_name, timings)
+        with measure(timings, 'read'):
+            data = read_source(file_name)
+        with measure(timings, 'cache'):
+            key = self.key(data)
+            module = self.get(key)
+        if module is None:
+            module = extract_source(decode_source(data), file_name,
+                                    source_digest(data), timings,
+                                    self.parser, self.extraction)
+            with measure(timings, 'cache'):
+                self.put(key, module)
+        return rebind(module, file_name)
+
+    def _extract_large(self, file_name: Path,
+                       timings: Optional[Timings]) -> ParsedModule:
+        from .parse_large import extract_large
+        with measure(timings, 'cache'):
+            key = self.file_key(file_name)
+            module = self.get(key)
+        if module is None:
+            module = extract_large(file_name, timings, self.parser,
+                                   self.extraction)
+            with measure(timings, 'cache'):
+                self.put(key, module)
+        return rebind(module, file_name)
+
+    def evict(self) -> int:
+        """Remove least recently used entries above max_size."""
+        entries = []
+        total = 0
+        for entry in self.directory.glob('*/*.pickle'):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+        removed = 0
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size:
+                break
+            self._remove(entry)
+            total -= size
+            removed += 1
+        return removed
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
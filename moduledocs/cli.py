@@ -1,26 +1,455 @@
-"""Comand line interface apllication."""
-from fire import Fire
+"""
+Comand line interface apllication.
+
+Fire, parser, builders, cache and watcher are imported only when they
+are used, plain invocations are parsed by argparse, so startup stays
+short.
+"""
+import sys
+import warnings
+from argparse import ArgumentParser
+from importlib import import_module
 from pathlib import Path
-from .parse import find_and_extract
-from .style_markdown import MarkdownBuilder
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from .budget import Budget, ErrorReport
+from .discovery import Finder, DEFAULT_EXCLUDE
+from .profiling import Profiler
+
+# Module and class of builder for every style
+BUILDERS = {'md': ('.style_markdown', 'MarkdownBuilder'),
+            'html': ('.style_html', 'HtmlBuilder'),
+            'json': ('.style_json', 'JsonBuilder')}
+
+
+class FastPathError(ValueError):
+    """Arguments which fast path can not parse."""
+
+
+class FastParser(ArgumentParser):
+    """Argument parser which raises error instead of exit."""
+
+    def error(self, message: str):
+        """Raise FastPathError."""
+        raise FastPathError(message)
+
+
+def load_builder(style: str) -> Any:
+    """Import builder class of style."""
+    if style not in BUILDERS:
+        raise ValueError('Unknown style {!r}, supported: {}'.format(
+            style, ', '.join(BUILDERS)))
+    module, name = BUILDERS[style]
+    return getattr(import_module(module, __package__), name)
+
+
+def fast_arguments(command: Callable[..., Any],
+                   argv: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Parse arguments of command without Fire.
+
+    Positional arguments, --name=value, --name value and boolean --name
+    flags are supported, options are built from signature of command.
+    Return None for anything else (help, Fire flags, errors), Fire handles
+    it then.
+    """
+    if '--' in argv:
+        return None
+    code = command.__code__
+    names = code.co_varnames[:code.co_argcount]
+    defaults = dict(zip(names[len(names) - len(command.__defaults__):],
+                        command.__defaults__))
+    parser = FastParser(add_help=False, allow_abbrev=False)
+    parser.add_argument('positional', nargs='*')
+    for name, default in defaults.items():
+        flags = ['--' + name]
+        if '_' in name:
+            flags.append('--' + name.replace('_', '-'))
+        if isinstance(default, bool):
+            parser.add_argument(*flags, dest=name, action='store_true',
+                                default=None)
+        else:
+            parser.add_argument(*flags, dest=name, type=type(default),
+                                default=None)
+    try:
+        parsed = vars(parser.parse_args(argv))
+    except (FastPathError, ValueError):
+        return None
+    positional = parsed.pop('positional')
+    arguments = {name: value for name, value in parsed.items()
+                 if value is not None}
+    free = [name for name in names if name not in arguments]
+    if len(positional) > len(free) or \
+            any(name not in defaults for name in free[len(positional):]):
+        return None
+    for name, value in zip(free, positional):
+        value_type = type(defaults.get(name, ''))
+        if value_type is bool:
+            return None
+        try:
+            arguments[name] = value_type(value)
+        except ValueError:
+            return None
+    return arguments
+
+
+def make_finder(exclude: Union[str, Iterable[str]], gitignore: bool,
+                packages_only: bool, threads: int) -> Finder:
+    """Create finder from comma separated or listed exclude patterns."""
+    if isinstance(exclude, str):
+        exclude = exclude.split(',')
+    return Finder([pattern.strip() for pattern in exclude], gitignore,
+                  packages_only, threads)
+
+
+def split_styles(style: Union[str, Iterable[str]]) -> List[str]:
+    """Return styles from comma separated or listed styles."""
+    if isinstance(style, str):
+        style = style.split(',')
+    return [name.strip() for name in style if name.strip()]
+
+
+def style_paths(output_path: Path, styles: List[str]) -> List[Path]:
+    """Return output directory of every style, subdirectory if several."""
+    if len(styles) == 1:
+        return [output_path]
+    return [output_path / name for name in styles]
+
+
+def make_budget(max_file_size: float, file_timeout: float) -> Budget:
+    """Create budget from size limit in megabytes and time in seconds."""
+    return Budget(int(max_file_size * 1024 * 1024), file_timeout)
+
+
+def report_errors(errors: ErrorReport, report_path: str):
+    """Print failed files to stderr and write JSON report if path is set."""
+    for error in errors:
+        print('{}: {}: {}'.format(error.path, error.kind, ' '.join(
+            filter(None, [error.error, error.message]))), file=sys.stderr)
+    if report_path:
+        errors.dump(Path(report_path))
+
+
+def render_docs(modules: Iterable[Any], output_path: Path,
+                style: Union[str, Iterable[str]], extraction: str = 'full',
+                incremental: bool = False, symbols: bool = False,
+                profiler: Optional[Profiler] = None,
+                partial: Optional[Dict[str, int]] = None,
+                manifest_name: str = '', context: Iterable[Any] = ()):
+    """
+    Render modules by builder of every style, modules are taken once.
+
+    Partial (positions of module paths in whole build) makes builders
+    shards with manifest of manifest_name, context modules are indexed
+    with symbols only.
+    """
+    from .style_base import stream_builders
+    styles = split_styles(style)
+    builders = [load_builder(name)() for name in styles]
+    docs_paths = style_paths(output_path, styles)
+    manifests = []
+    for builder, docs_path in zip(builders, docs_paths):
+        builder.setting()
+        if symbols:
+            from .symbols import SymbolIndex
+            builder.symbols = SymbolIndex()
+        builder.partial = partial
+        if profiler is not None:
+            builder.hooks = profiler
+        manifest = None
+        if incremental or partial is not None:
+            from .manifest import Manifest, MANIFEST_NAME
+            manifest = Manifest(docs_path, '{}:{}:{}'.format(
+                builder.signature(), extraction, symbols),
+                manifest_name or MANIFEST_NAME)
+            if not incremental:
+                manifest.previous = {}
+        manifests.append(manifest)
+    stream_builders(builders, modules, docs_paths, manifests, context)
 
 
 def cli(input_directory: str, output_directory: str = 'docs',
-        style: str = 'md'):
+        style: str = 'md', jobs: int = 1, cache_dir: str = '',
+        incremental: bool = False, profile: str = '', slowest: int = 10,
+        cprofile: str = '', exclude: str = ','.join(DEFAULT_EXCLUDE),
+        gitignore: bool = False, packages_only: bool = False,
+        discovery_threads: int = 0, parser: str = 'auto',
+        extraction: str = 'full', symbols: bool = False, shard: str = '',
+        max_file_size: float = 0.0, file_timeout: float = 60.0,
+        error_report: str = ''):
     """
     Moduledocs.
 
     Module for generating documentation for python source code files.
+    Style is "md", "html", "json" or several of them separated by comma,
+    then every style is written to its subdirectory. Use jobs to extract
+    files in several processes (0 for every core) and cache_dir to keep
+    parsed modules between runs. With incremental only
+    files of changed modules are rewritten. Profile is a path of JSON
+    report with time of every phase, slowest files, peak memory and hit
+    rates of deduplication of identical files, cprofile is a path of
+    cProfile statistics of extraction. Exclude is comma
+    separated list of gitignore style patterns of skipped files and
+    directories, gitignore enables .gitignore files, packages_only skips
+    directories without __init__.py and discovery_threads lists
+    directories in parallel. Parser is "ast" (fast), "parso" (parses even
+    invalid code) or "auto" (ast with fallback to parso). Extraction
+    "signatures" keeps only names, signatures and docstrings, it skips
+    module statements and returns, yields and raises of functions. With
+    symbols annotations and parent classes link to pages where they are
+    defined, symbols.sqlite (see search command) and search.json are saved
+    to output directory; every module is kept in memory until pages are
+    rendered. Shard "i/N" builds only pages of i-th of N stable parts of
+    modules and writes partial manifest, merge command then writes index
+    and symbol files of all shards. Files larger than max_file_size
+    megabytes or extracted longer than file_timeout seconds (0 for no
+    limit, size is not limited by default) and files which fail are
+    skipped, they are printed to stderr and written to JSON error_report
+    if it is set. Files of 8 megabytes and larger are parsed in chunks of
+    top level statements, so memory stays bounded, the same limits apply
+    to them.
     """
+    from .parse import find_and_extract
     input_path = Path(input_directory)
     output_path = Path(output_directory)
-    parsed_modules = find_and_extract(input_path)
-    builder = MarkdownBuilder()
-    builder.setting()
-    builder.build(parsed_modules)
-    builder.save(output_path)
+    cache = None
+    if cache_dir:
+        from .cache import ParseCache
+        cache = ParseCache(Path(cache_dir), parser=parser,
+                           extraction=extraction)
+    profiler = None
+    if profile or cprofile:
+        if cprofile and jobs != 1:
+            warnings.warn('cProfile covers only extraction in main process, '
+                          'use jobs=1.', RuntimeWarning)
+        profiler = Profiler(slowest, cprofile)
+    finder: Any = make_finder(exclude, gitignore, packages_only,
+                              discovery_threads)
+    partial = None
+    manifest_name = ''
+    context: Iterable[Any] = ()
+    budget = make_budget(max_file_size, file_timeout)
+    errors = ErrorReport()
+    if shard:
+        from .shard import parse_shard, split_shard, ListFinder,\
+            SHARD_MANIFEST
+        index, count = parse_shard(shard)
+        python_files = list(finder.find(input_path))
+        partial = {str(path): position
+                   for position, path in enumerate(python_files)}
+        manifest_name = SHARD_MANIFEST.format(index, count)
+        own, others = split_shard(python_files, input_path, index, count)
+        finder = ListFinder(own)
+        if symbols:
+            context = find_and_extract(input_path, jobs, cache, None,
+                                       ListFinder(others), parser,
+                                       'signatures', budget=budget,
+                                       errors=ErrorReport())
+    parsed_modules = find_and_extract(input_path, jobs, cache, profiler,
+                                      finder, parser, extraction,
+                                      budget=budget, errors=errors)
+    render_docs(parsed_modules, output_path, style, extraction, incremental,
+                symbols, profiler, partial, manifest_name, context)
+    if cache is not None:
+        cache.evict()
+    if profiler is not None:
+        profiler.dump(Path(profile) if profile else None)
+    report_errors(errors, error_report)
+
+
+def watch(input_directory: str, output_directory: str = 'docs',
+          interval: float = 1.0, exclude: str = ','.join(DEFAULT_EXCLUDE),
+          gitignore: bool = False, packages_only: bool = False):
+    """
+    Moduledocs watch.
+
+    Build documentation and keep it up to date, rerendering only changed
+    files until interrupted. Exclude, gitignore and packages_only are the
+    same as in build.
+    """
+    from .watch import Watcher
+    finder = make_finder(exclude, gitignore, packages_only, 0)
+    watcher = Watcher(Path(input_directory), Path(output_directory),
+                      finder=finder)
+    watcher.build()
+    try:
+        watcher.run(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def search(prefix: str, output_directory: str = 'docs', limit: int = 20):
+    """
+    Moduledocs search.
+
+    Print symbols which names start with prefix (case insensitive), from
+    documentation built with symbols. Every line is qualified name, kind
+    and source location.
+    """
+    from .symbols import search as search_symbols, SYMBOLS_NAME
+    database = Path(output_directory) / SYMBOLS_NAME
+    if not database.is_file():
+        raise SystemExit('No symbol index {}, build documentation with '
+                         '--symbols.'.format(database))
+    for symbol in search_symbols(database, prefix, limit):
+        print('{} {} {}:{}'.format(symbol.qualified, symbol.kind,
+                                   symbol.path, symbol.line))
+
+
+def graph(input_directory: str, output: str = '', format: str = 'dot',
+          exclude: str = ','.join(DEFAULT_EXCLUDE), gitignore: bool = False,
+          packages_only: bool = False, jobs: int = 1, parser: str = 'auto'):
+    """
+    Moduledocs graph.
+
+    Write import dependency graph of modules to output (standard output
+    if it is empty). Format is "dot" (Graphviz, import cycles are red) or
+    "json" (topological order, dependencies, dependents and cycles).
+    """
+    from .graph import DependencyGraph
+    from .parse import find_and_extract
+    if format not in ('dot', 'json'):
+        raise ValueError('Unknown format {!r}, supported: dot, json'.format(
+            format))
+    finder = make_finder(exclude, gitignore, packages_only, 0)
+    dependency_graph = DependencyGraph()
+    for module in find_and_extract(Path(input_directory), jobs,
+                                   finder=finder, parser=parser,
+                                   extraction='signatures'):
+        dependency_graph.add(module)
+    text = dependency_graph.to_dot() if format == 'dot' else \
+        dependency_graph.to_json() + '\n'
+    if output:
+        Path(output).write_text(text)
+    else:
+        sys.stdout.write(text)
+
+
+def merge(output_directory: str = 'docs', style: str = 'md',
+          shards: int = 0):
+    """
+    Moduledocs merge.
+
+    Write index and symbol files of build made in shards (see shard of
+    build) to output directory, from partial manifests of shards, nothing
+    is parsed. Style has to be the same as in shards, shards is number of
+    shards (taken from partial manifests if it is zero), with several
+    styles every subdirectory is merged.
+    """
+    from .shard import merge_shards
+    styles = split_styles(style)
+    for name, docs_path in zip(styles, style_paths(Path(output_directory),
+                                                   styles)):
+        builder = load_builder(name)()
+        builder.setting()
+        merge_shards(docs_path, builder, shards)
+
+
+def extract(input_directory: str, ir_file: str = 'moduledocs.ir',
+            jobs: int = 1, cache_dir: str = '',
+            exclude: str = ','.join(DEFAULT_EXCLUDE), gitignore: bool = False,
+            packages_only: bool = False, discovery_threads: int = 0,
+            parser: str = 'auto', extraction: str = 'full',
+            max_file_size: float = 0.0, file_timeout: float = 60.0,
+            error_report: str = ''):
+    """
+    Moduledocs extract.
+
+    Extract modules once and dump them to IR file, render command makes
+    documentation from it without sources. Other arguments are the same
+    as in build.
+    """
+    from .ir import IRWriter
+    from .parse import find_and_extract
+    cache = None
+    if cache_dir:
+        from .cache import ParseCache
+        cache = ParseCache(Path(cache_dir), parser=parser,
+                           extraction=extraction)
+    finder = make_finder(exclude, gitignore, packages_only,
+                         discovery_threads)
+    errors = ErrorReport()
+    with IRWriter(Path(ir_file), {'parser': parser,
+                                  'extraction': extraction}) as writer:
+        for module in find_and_extract(
+                Path(input_directory), jobs, cache, finder=finder,
+                parser=parser, extraction=extraction,
+                budget=make_budget(max_file_size, file_timeout),
+                errors=errors):
+            writer.write(module)
+    if cache is not None:
+        cache.evict()
+    report_errors(errors, error_report)
+
+
+def render(ir_file: str = 'moduledocs.ir', output_directory: str = 'docs',
+           style: str = 'md', incremental: bool = False,
+           symbols: bool = False):
+    """
+    Moduledocs render.
+
+    Render documentation from IR file made by extract command, output is
+    the same as output of build of the same sources. Arguments are the
+    same as in build.
+    """
+    from .ir import IRReader
+    with IRReader(Path(ir_file)) as reader:
+        render_docs(reader, Path(output_directory), style,
+                    reader.metadata.get('extraction', 'full'), incremental,
+                    symbols)
+
+
+def serve(input_directory: str, host: str = '127.0.0.1', port: int = 8000,
+          style: str = 'md', jobs: int = 0, cache_size: int = 64,
+          exclude: str = ','.join(DEFAULT_EXCLUDE), gitignore: bool = False,
+          packages_only: bool = False, parser: str = 'auto',
+          extraction: str = 'full'):
+    """
+    Moduledocs serve.
+
+    Serve documentation of input directory over HTTP until interrupted.
+    Every page is extracted and rendered when it is first requested, in
+    pool of jobs processes (0 for every core), and kept in memory cache of
+    at most cache_size megabytes until its source changes. Other arguments
+    are the same as in build.
+    """
+    import asyncio
+    from .serve import DocsServer
+    docs_server = DocsServer(Path(input_directory), style, jobs,
+                             cache_size * 1024 * 1024,
+                             make_finder(exclude, gitignore, packages_only, 0),
+                             parser, extraction)
+
+    async def run():
+        server = await docs_server.start(host, port)
+        print('Serving {} at http://{}:{}/'.format(
+            input_directory, host, server.sockets[0].getsockname()[1]))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        docs_server.close()
+
+
+COMMANDS = {'watch': watch, 'search': search, 'graph': graph, 'merge': merge,
+            'extract': extract, 'render': render, 'serve': serve}
 
 
 def main():
     """Callable function for command  line interface."""
-    Fire(cli)
+    command: Callable[..., Any] = cli
+    argv = sys.argv[1:]
+    name = None
+    if argv and argv[0] in COMMANDS:
+        command = COMMANDS[argv[0]]
+        name = 'moduledocs ' + argv[0]
+        argv = argv[1:]
+    arguments = fast_arguments(command, argv)
+    if arguments is not None:
+        command(**arguments)
+        return
+    from fire import Fire
+    Fire(command, argv, name)
@@ -0,0 +1,232 @@
+"""Discovery of python files with exclude rules."""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional,\
+    Pattern, Tuple
+
+GITIGNORE_NAME = '.gitignore'
+DEFAULT_EXCLUDE = ('.git/', '.hg/', '.svn/', '__pycache__/', 'node_modules/',
+                   '.venv/', 'venv/', '.tox/', '.nox/', '.eggs/',
+                   '*.egg-info/', '.mypy_cache/', '.pytest_cache/',
+                   '/build/', '/dist/')
+
+Listing = Tuple[List[Tuple[str, bool]], str]
+Frame = Tuple[Path, str, List[Tuple[str, 'IgnoreRules']],
+              List[Tuple[str, bool]]]
+
+
+def _translate(pattern: str) -> str:
+    """Translate gitignore glob to regular expression."""
+    parts = []
+    index, length = 0, len(pattern)
+    while index < length:
+        char = pattern[index]
+        if pattern.startswith('**/', index):
+            parts.append('(?:.*/)?')
+            index += 3
+            continue
+        if pattern.startswith('/**', index) and index + 3 == length:
+            parts.append('/.*')
+            index += 3
+            continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '\\' and index + 1 < length:
+            index += 1
+            parts.append(re.escape(pattern[index]))
+        elif char == '[':
+            end = index + 1
+            if end < length and pattern[end] in '!^':
+                end += 1
+            if end < length and pattern[end] == ']':
+                end += 1
+            while end < length and pattern[end] != ']':
+                end += 1
+            if end >= length:
+                parts.append(re.escape(char))
+            else:
+                content = pattern[index + 1:end].replace('\\', '\\\\')
+                if content[0] in '!^':
+                    content = '^' + content[1:]
+                parts.append('[{}]'.format(content))
+                index = end
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return ''.join(parts)
+
+
+class IgnoreRules:
+    """
+    Compiled gitignore style patterns.
+
+    Pattern without slash matches name at any depth, pattern with slash is
+    relative to directory of rules, trailing slash matches directories only
+    and "!" includes matched path again. The last matching pattern wins.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """Compile patterns, empty lines and comments are skipped."""
+        self.rules: List[Tuple[Pattern, bool, bool]] = []
+        for line in patterns:
+            line = line.rstrip('\n')
+            if line.endswith('\\ '):
+                line = line[:-2].rstrip(' ') + '\\ '
+            else:
+                line = line.rstrip(' ')
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            anchored = '/' in line
+            if line.startswith('/'):
+                line = line[1:]
+            if not line:
+                continue
+            regex = _translate(line)
+            if not anchored:
+                regex = '(?:.*/)?' + regex
+            self.rules.append((re.compile(regex), negate, dir_only))
+
+    def __bool__(self) -> bool:
+        """Check if there is at least one pattern."""
+        return bool(self.rules)
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Check if relative path is excluded.
+
+        Return None if no pattern matches path.
+        """
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(path):
+                return not negate
+        return None
+
+
+class Finder:
+    """
+    Discovery of python files in directory and subdirectories.
+
+    Files are returned in the same order as recursive walk over iterdir
+    does. Directories matching exclude patterns or .gitignore rules (if
+    gitignore is set) are not entered at all. With packages_only
+    directories without __init__.py are skipped. With threads greater
+    than zero directories are listed ahead in a thread pool, which helps on
+    network file systems with slow metadata operations.
+    """
+
+    def __init__(self, exclude: Iterable[str] = (), gitignore: bool = False,
+                 packages_only: bool = False, threads: int = 0):
+        """Create finder with exclude rules."""
+        self.rules = IgnoreRules(exclude)
+        self.gitignore = gitignore
+        self.packages_only = packages_only
+        self.threads = threads
+
+    def find(self, base: Path) -> Iterator[Path]:
+        """Find python files in directory and subdirectories."""
+        if not base.is_dir():
+            if base.match('*.py'):
+                yield base
+            return
+        if self.threads < 1:
+            yield from self._walk(base, None)
+            return
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            yield from self._walk(base, executor)
+
+    def _list(self, directory: Path) -> Listing:
+        with os.scandir(directory) as entries:
+            items = [(entry.name, entry.is_dir()) for entry in entries]
+        gitignore = ''
+        if self.gitignore and (GITIGNORE_NAME, False) in items:
+            try:
+                with open(directory / GITIGNORE_NAME,
+                          errors='replace') as file:
+                    gitignore = file.read()
+            except OSError:
+                pass
+        return items, gitignore
+
+    def _excluded(self, chain: List[Tuple[str, IgnoreRules]], path: str,
+                  is_dir: bool) -> bool:
+        excluded = None
+        for prefix, rules in chain:
+            verdict = rules.match(path[len(prefix):], is_dir)
+            if verdict is not None:
+                excluded = verdict
+        return bool(excluded)
+
+    def _walk(self, base: Path,
+              executor: Optional[ThreadPoolExecutor]) -> Iterator[Path]:
+        pending: Dict[Path, Future] = {}
+
+        def enter(directory: Path, relative: str,
+                  chain: List[Tuple[str, IgnoreRules]]) -> Optional[Frame]:
+            if executor is None:
+                listing = self._list(directory)
+            else:
+                future = pending.pop(directory, None)
+                if future is None:
+                    future = executor.submit(self._list, directory)
+                listing = future.result()
+            frame = self._frame(directory, relative, chain, listing)
+            if frame is not None and executor is not None:
+                for name, is_dir in frame[3]:
+                    if is_dir:
+                        child = directory / name
+                        pending[child] = executor.submit(self._list, child)
+            return frame
+
+        root_chain = [('', self.rules)] if self.rules else []
+        frame = enter(base, '', root_chain)
+        stack = [(frame[0], frame[1], frame[2], iter(frame[3]))]
+        try:
+            while stack:
+                directory, relative, chain, entries = stack[-1]
+                for name, is_dir in entries:
+                    if not is_dir:
+                        yield directory / name
+                        continue
+                    frame = enter(directory / name, relative + name + '/',
+                                  chain)
+                    if frame is not None:
+                        stack.append((frame[0], frame[1], frame[2],
+                                      iter(frame[3])))
+                        break
+                else:
+                    stack.pop()
+        finally:
+            for future in pending.values():
+                future.cancel()
+
+    def _frame(self, directory: Path, relative: str,
+               chain: List[Tuple[str, IgnoreRules]],
+               listing: Listing) -> Optional[Frame]:
+        items, gitignore = listing
+        if self.packages_only and relative and \
+                ('__init__.py', False) not in items:
+            return None
+        if gitignore:
+            rules = IgnoreRules(gitignore.splitlines())
+            if rules:
+                chain = chain + [(relative, rules)]
+        entries = []
+        for name, is_dir in items:
+            if not is_dir and not os.path.normcase(name).endswith('.py'):
+                continue
+            if chain and self._excluded(chain, relative + name, is_dir):
+                continue
+            entries.append((name, is_dir))
+        return directory, relative, chain, entries
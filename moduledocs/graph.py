@@ -0,0 +1,255 @@
+"""
+Import dependency graph of scanned modules.
+
+Imports are resolved against scanned tree (relative ones against package
+of module), imports of other modules are left out. Graph gives reverse
+dependencies, topological order, import cycles and modules affected by
+change, it can be exported as DOT or JSON.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .parsed_objects import ParsedModule
+from .symbols import import_bindings, importable_names, module_name
+
+# Imported name of "import module", whole namespace of module is bound
+WHOLE_MODULE = ''
+
+
+class DependencyGraph:
+    """
+    Graph of modules keyed by module path (str(ParsedModule.path)).
+
+    Every edge goes from importing module to imported module and keeps
+    bound names with names imported from target, so change is followed
+    only through names which are really re-exported. Edges are resolved
+    when graph is used, modules can be added in any order.
+    """
+
+    def __init__(self):
+        """Create empty graph."""
+        self.names: Dict[str, str] = {}
+        self.packages: Set[str] = set()
+        self.bindings: Dict[str, List[Tuple[str, str]]] = {}
+        self._importers: Optional[Dict[str, List[Tuple[str, str, str]]]] = \
+            None
+        self._package_importers: Dict[str, List[Tuple[str, str]]] = {}
+        self._dependencies: Optional[Dict[str, List[str]]] = None
+
+    def add(self, module: ParsedModule):
+        """Add module with its imports."""
+        path = str(module.path)
+        name = module_name(module.path)
+        package = name
+        if module.path.stem == '__init__':
+            self.packages.add(name)
+        else:
+            package = name.rpartition('.')[0]
+        self.names[path] = name
+        self.bindings[path] = [
+            binding for module_import in module.imports
+            for binding in import_bindings(module_import, package, True)]
+        self._importers = self._dependencies = None
+
+    def add_removed(self, path: str):
+        """Add module which no longer exists, its importers are edges."""
+        if path.endswith('.py') and path not in self.names:
+            self.names[path] = module_name(Path(path))
+            self.bindings[path] = []
+            self._importers = self._dependencies = None
+
+    def _resolve(self):
+        paths = {name: path for path, name in self.names.items()}
+        importable = importable_names(self.names.values(), self.packages)
+        importers: Dict[str, List[Tuple[str, str, str]]] = {
+            path: [] for path in self.names}
+        dependencies: Dict[str, List[str]] = {}
+        package_importers: Dict[str, List[Tuple[str, str]]] = {}
+        for path, bindings in self.bindings.items():
+            targets = set()
+            for local, dotted in bindings:
+                parts = dotted.split('.')
+                # Plain "import a.b" binds "a"
+                bound = importable.get(parts[0] if local == parts[0]
+                                       else dotted)
+                if bound in self.packages:
+                    package_importers.setdefault(bound, []).append(
+                        (path, local))
+                for end in range(len(parts), 0, -1):
+                    target = importable.get('.'.join(parts[:end]))
+                    if target is not None:
+                        imported = parts[end] if end < len(parts) else \
+                            WHOLE_MODULE
+                        importers[paths[target]].append(
+                            (path, local, imported))
+                        targets.add(paths[target])
+                        break
+            dependencies[path] = sorted(targets)
+        self._importers = importers
+        self._dependencies = dependencies
+        self._package_importers = package_importers
+
+    @property
+    def importers(self) -> Dict[str, List[Tuple[str, str, str]]]:
+        """
+        Edges to every module path.
+
+        Edge is importing module path, bound name and name imported from
+        target (WHOLE_MODULE for import of module).
+        """
+        if self._importers is None:
+            self._resolve()
+        return self._importers  # type: ignore
+
+    @property
+    def dependencies(self) -> Dict[str, List[str]]:
+        """Sorted paths of imported modules for every module path."""
+        if self._dependencies is None:
+            self._resolve()
+        return self._dependencies  # type: ignore
+
+    @property
+    def dependents(self) -> Dict[str, List[str]]:
+        """Reverse dependencies, sorted paths of importing modules."""
+        return {path: sorted(set(importer for importer, _, _ in edges))
+                for path, edges in self.importers.items()}
+
+    def components(self) -> List[List[str]]:
+        """
+        Return strongly connected components in topological order.
+
+        Dependencies come before dependents, modules of import cycle are
+        in one component. Tarjan's algorithm with explicit stack.
+        """
+        dependencies = self.dependencies
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+        components: List[List[str]] = []
+        for root in sorted(dependencies):
+            if root in index:
+                continue
+            work = [(root, iter(dependencies[root]))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                path, targets = work[-1]
+                for target in targets:
+                    if target not in index:
+                        index[target] = low[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(dependencies[target])))
+                        break
+                    if target in on_stack:
+                        low[path] = min(low[path], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[path])
+                    if low[path] == index[path]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == path:
+                                break
+                        components.append(sorted(component))
+        return components
+
+    def topological_order(self) -> List[str]:
+        """Return module paths, every module after modules it imports."""
+        return [path for component in self.components()
+                for path in component]
+
+    def cycles(self) -> List[List[str]]:
+        """Return groups of modules which import each other."""
+        dependencies = self.dependencies
+        return [component for component in self.components()
+                if len(component) > 1 or
+                component[0] in dependencies[component[0]]]
+
+    def affected(self, changed: Iterable[str]) -> Set[str]:
+        """
+        Return changed modules with modules whose names may refer to them.
+
+        Importer of changed module is affected. Importer of affected
+        module is affected only if it imports the whole module or a name
+        which that module has bound by import from affected module.
+        Module which binds a package reaches its submodules as attributes
+        ("pkg.base.Base"), so it is affected by all of them.
+        """
+        importers = self.importers
+        package_importers = self._package_importers
+        affected: Dict[str, Optional[Set[str]]] = {}
+        queue: List[Tuple[str, Optional[Set[str]]]] = []
+        for path in changed:
+            if path in importers:
+                affected[path] = None
+                queue.append((path, None))
+        while queue:
+            path, names = queue.pop()
+            hits: Dict[str, Set[str]] = {}
+            for importer, local, imported in importers[path]:
+                if names is None or imported == WHOLE_MODULE or \
+                        imported in names:
+                    hits.setdefault(importer, set()).add(local)
+            parts = self.names[path].split('.')
+            for end in range(1, len(parts) + 1):
+                for importer, local in package_importers.get(
+                        '.'.join(parts[:end]), ()):
+                    hits.setdefault(importer, set()).add(local)
+            for importer, bound in hits.items():
+                if importer in affected:
+                    known = affected[importer]
+                    if known is None or bound <= known:
+                        continue
+                    bound = bound - known
+                    affected[importer] = known | bound
+                else:
+                    affected[importer] = bound
+                queue.append((importer, bound))
+        return set(affected)
+
+    def to_json(self) -> str:
+        """
+        Return graph as JSON.
+
+        Modules are dotted names in topological order, with dependencies,
+        dependents and cycles.
+        """
+        names = self.names
+        return json.dumps({
+            'modules': [names[path] for path in self.topological_order()],
+            'dependencies': {names[path]: [names[target] for target in
+                                           targets]
+                             for path, targets in self.dependencies.items()},
+            'dependents': {names[path]: [names[importer] for importer in
+                                         importers]
+                           for path, importers in self.dependents.items()},
+            'cycles': [[names[path] for path in cycle]
+                       for cycle in self.cycles()]},
+            indent=1, sort_keys=True)
+
+    def to_dot(self) -> str:
+        """Return graph in Graphviz DOT language, cycles are red."""
+        names = self.names
+        cycle_of = {path: number for number, cycle in enumerate(self.cycles())
+                    for path in cycle}
+        lines = ['digraph modules {']
+        for path in self.topological_order():
+            lines.append('    "{}";'.format(names[path]))
+        for path, targets in sorted(self.dependencies.items()):
+            for target in targets:
+                color = ''
+                if path in cycle_of and cycle_of[path] == cycle_of.get(target):
+                    color = ' [color=red]'
+                lines.append('    "{}" -> "{}"{};'.format(
+                    names[path], names[target], color))
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,186 @@
+"""
+Hierarchical index of documentation.
+
+Module paths grouped by directory are put to tree of directories once,
+then one walk over the tree gives index page of every directory (split to
+pages of page_size modules) and top level page with tree of directories.
+Pages are described by IndexPage, builders only format them.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+INDEX_NAME = 'index'
+INDEX_PAGE_SIZE = 500
+INDEX_KEY = re.compile(r'{}(-[0-9]+)?'.format(INDEX_NAME))
+
+
+@dataclass
+class IndexDirectory:
+    """
+    Directory of index tree.
+
+    Key is location of its index pages relative to documentation root,
+    modules are pairs of name and url without extension relative to its
+    pages, total is number of modules in directory and its subdirectories.
+    """
+
+    name: str
+    key: Path
+    modules: List[Tuple[str, str]] = field(default_factory=list)
+    directories: Dict[str, 'IndexDirectory'] = field(default_factory=dict)
+    total: int = 0
+
+
+@dataclass
+class IndexPage:
+    """
+    Single index page with links relative to it.
+
+    Title is slash separated directory ("" for top level page), links are
+    pairs of text and url, directories have number of modules and tree
+    (top level page only) has depth of every directory.
+    """
+
+    path: Path
+    title: str
+    number: int
+    count: int
+    up: str = ''
+    previous: str = ''
+    next: str = ''
+    directories: List[Tuple[str, str, int]] = field(default_factory=list)
+    modules: List[Tuple[str, str]] = field(default_factory=list)
+    tree: List[Tuple[int, str, str, int]] = field(default_factory=list)
+
+
+def group_paths(paths: Iterable[Path]) -> Dict[Path, List[Path]]:
+    """Group module paths by directory."""
+    groups: Dict[str, List[Path]] = {}
+    for path in paths:
+        groups.setdefault(os.path.dirname(str(path)), []).append(path)
+    return {Path(directory): group for directory, group in groups.items()}
+
+
+def is_index_key(key: str) -> bool:
+    """Check if manifest key belongs to index page."""
+    return INDEX_KEY.fullmatch(Path(key).name) is not None
+
+
+def page_path(key: Path, number: int) -> Path:
+    """Return path of page number (counted from 0) of directory key."""
+    if number == 0:
+        return key / INDEX_NAME
+    return key / '{}-{}'.format(INDEX_NAME, number + 1)
+
+
+def build_tree(groups: Dict[Path, List[Path]]) -> IndexDirectory:
+    """
+    Return root of tree of directories grouping module paths.
+
+    Anchor of absolute directory and leading ".." are left out of its key,
+    so index pages stay in documentation directory. Modules of absolute
+    directory are linked by absolute url.
+    """
+    root = IndexDirectory('', Path('.'))
+    nodes: Dict[Tuple[str, ...], IndexDirectory] = {(): root}
+    for directory, paths in groups.items():
+        parts = _tree_parts(directory)
+        node = nodes.get(parts)
+        if node is None:
+            known = len(parts)
+            while parts[:known] not in nodes:
+                known -= 1
+            node = nodes[parts[:known]]
+            for end in range(known + 1, len(parts) + 1):
+                child = IndexDirectory(parts[end - 1],
+                                       node.key / parts[end - 1])
+                node.directories[child.name] = child
+                nodes[parts[:end]] = node = child
+        prefix = _module_prefix(directory, parts)
+        node.modules.extend((path.name, prefix + path.name) for path in paths)
+    stack = [(root, False)]
+    while stack:
+        node, done = stack.pop()
+        if done:
+            node.modules.sort()
+            node.total = len(node.modules) + sum(
+                child.total for child in node.directories.values())
+            continue
+        stack.append((node, True))
+        stack.extend((child, False) for child in node.directories.values())
+    return root
+
+
+def _tree_parts(directory: Path) -> Tuple[str, ...]:
+    parts = directory.parts[1:] if directory.anchor else directory.parts
+    start = 0
+    while start < len(parts) and parts[start] == '..':
+        start += 1
+    return parts[start:]
+
+
+def _module_prefix(directory: Path, parts: Tuple[str, ...]) -> str:
+    if directory.anchor:
+        return directory.as_posix().rstrip('/') + '/'
+    if len(parts) == len(directory.parts):
+        return ''
+    return '../' * len(parts) + directory.as_posix() + '/'
+
+
+def _children(node: IndexDirectory) -> List[IndexDirectory]:
+    return [node.directories[name] for name in sorted(node.directories)]
+
+
+def _tree(root: IndexDirectory,
+          extension: str) -> List[Tuple[int, str, str, int]]:
+    tree = []
+    stack = [(child, 0) for child in reversed(_children(root))]
+    while stack:
+        node, depth = stack.pop()
+        tree.append((depth, node.name,
+                     page_path(node.key, 0).as_posix() + extension,
+                     node.total))
+        stack.extend((child, depth + 1)
+                     for child in reversed(_children(node)))
+    return tree
+
+
+def index_pages(root: IndexDirectory, extension: str,
+                page_size: int = INDEX_PAGE_SIZE) -> Iterator[IndexPage]:
+    """
+    Yield index pages of every directory, root first.
+
+    Links are relative to page except links to modules of absolute paths.
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        children = _children(node)
+        stack.extend(reversed(children))
+        count = max(1, -(-len(node.modules) // page_size))
+        directories = [(child.name, '{}/{}{}'.format(child.name, INDEX_NAME,
+                                                     extension), child.total)
+                       for child in children]
+        for number in range(count):
+            page = IndexPage(page_path(node.key, number),
+                             '' if node is root else '/' + node.key.as_posix(),
+                             number, count, directories=directories)
+            if node is not root:
+                page.up = '../{}{}'.format(INDEX_NAME, extension)
+            if number > 0:
+                page.previous = page_path(Path('.'), number - 1).as_posix() \
+                    + extension
+            if number + 1 < count:
+                page.next = page_path(Path('.'), number + 1).as_posix() + \
+                    extension
+            page.modules = [
+                (name, url + extension)
+                for name, url in node.modules[number * page_size:
+                                              (number + 1) * page_size]]
+            if node is root:
+                page.tree = _tree(root, extension)
+            yield page
@@ -0,0 +1,182 @@
+"""
+Binary file of parsed modules.
+
+Modules are extracted once, dumped and rendered later by any builder
+without sources. File is magic, JSON header, records of pickled modules
+(every one prefixed by its length), zero length end marker, JSON index of
+records and trailer with offset of index. Writer streams records, reader
+unpickles every module only when it is taken.
+"""
+
+import json
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from . import __version__
+from .parsed_objects import ParsedModule
+
+IR_MAGIC = b'MDIR'
+IR_FORMAT = 1
+LENGTH = struct.Struct('<I')
+TRAILER = struct.Struct('<Q4s')
+# Record of index: module path, offset of record, length of record, digest
+IndexEntry = Tuple[str, int, int, str]
+
+
+class IRWriter:
+    """
+    Writer of IR file.
+
+    Metadata (extraction settings) is saved in header. File is written to
+    temporary name and replaces path on close, so readers never see partly
+    written file.
+    """
+
+    def __init__(self, path: Path, metadata: Optional[Dict[str, Any]] = None):
+        """Create IR file and write its header."""
+        self.path = Path(path)
+        self.temp = self.path.with_name('.{}.{}.tmp'.format(self.path.name,
+                                                            os.getpid()))
+        self.index: List[IndexEntry] = []
+        header = dict(metadata or {})
+        header.update(format=IR_FORMAT, version=__version__)
+        data = json.dumps(header, sort_keys=True).encode()
+        self.file: BinaryIO = open(self.temp, 'wb')
+        self.file.write(IR_MAGIC + LENGTH.pack(len(data)) + data)
+
+    def write(self, module: ParsedModule):
+        """Append module record."""
+        data = pickle.dumps(module, pickle.HIGHEST_PROTOCOL)
+        offset = self.file.tell()
+        self.file.write(LENGTH.pack(len(data)) + data)
+        self.index.append((str(module.path), offset, len(data),
+                           module.digest))
+
+    def close(self):
+        """Write index and trailer and move file to its path."""
+        if self.file.closed:
+            return
+        try:
+            self.file.write(LENGTH.pack(0))
+            offset = self.file.tell()
+            data = json.dumps(self.index).encode()
+            self.file.write(LENGTH.pack(len(data)) + data)
+            self.file.write(TRAILER.pack(offset, IR_MAGIC))
+            self.file.close()
+            os.replace(self.temp, self.path)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        """Remove partly written file."""
+        self.file.close()
+        try:
+            self.temp.unlink()
+        except OSError:
+            pass
+
+    def __enter__(self) -> 'IRWriter':
+        """Return writer."""
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        """Close writer, partly written file is removed on error."""
+        if kind is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class IRReader:
+    """
+    Lazy reader of IR file.
+
+    Iteration unpickles modules one by one in order they were written.
+    Paths and digests come from index without unpickling, load takes single
+    module. Raise ValueError for file of other format or version.
+    """
+
+    def __init__(self, path: Path):
+        """Open IR file and read its header."""
+        self.path = Path(path)
+        self.file: BinaryIO = open(self.path, 'rb')
+        try:
+            if self.file.read(4) != IR_MAGIC:
+                raise ValueError('{} is not IR file'.format(self.path))
+            self.metadata: Dict[str, Any] = json.loads(self._record())
+        except BaseException:
+            self.file.close()
+            raise
+        if self.metadata.get('format') != IR_FORMAT:
+            self.file.close()
+            raise ValueError('{} has IR format {}, expected {}'.format(
+                self.path, self.metadata.get('format'), IR_FORMAT))
+        # Pickled modules have layout of version which wrote them
+        if self.metadata.get('version') != __version__:
+            self.file.close()
+            raise ValueError('{} was written by moduledocs {}, this is {}'
+                             .format(self.path, self.metadata.get('version'),
+                                     __version__))
+        self.start = self.file.tell()
+        self._index: Optional[List[IndexEntry]] = None
+
+    def _record(self) -> bytes:
+        head = self.file.read(LENGTH.size)
+        if len(head) < LENGTH.size:
+            raise ValueError('{} is truncated'.format(self.path))
+        length, = LENGTH.unpack(head)
+        data = self.file.read(length)
+        if len(data) < length:
+            raise ValueError('{} is truncated'.format(self.path))
+        return data
+
+    def __iter__(self) -> Iterator[ParsedModule]:
+        """Yield modules in order, every one is unpickled when taken."""
+        position = self.start
+        while True:
+            self.file.seek(position)
+            data = self._record()
+            position = self.file.tell()
+            if not data:
+                return
+            yield pickle.loads(data)
+
+    @property
+    def index(self) -> List[IndexEntry]:
+        """Path, offset, length and digest of every module record."""
+        if self._index is None:
+            self.file.seek(-TRAILER.size, os.SEEK_END)
+            offset, magic = TRAILER.unpack(self.file.read(TRAILER.size))
+            if magic != IR_MAGIC:
+                raise ValueError('{} has no index'.format(self.path))
+            self.file.seek(offset)
+            self._index = [tuple(entry)  # type: ignore
+                           for entry in json.loads(self._record())]
+        return self._index  # type: ignore
+
+    def paths(self) -> List[Path]:
+        """Return paths of modules."""
+        return [Path(entry[0]) for entry in self.index]
+
+    def load(self, path: Path) -> ParsedModule:
+        """Return module with path, raise KeyError if it is not in file."""
+        for name, offset, _, _ in self.index:
+            if name == str(path):
+                self.file.seek(offset)
+                return pickle.loads(self._record())
+        raise KeyError(str(path))
+
+    def close(self):
+        """Close file."""
+        self.file.close()
+
+    def __enter__(self) -> 'IRReader':
+        """Return reader."""
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        """Close file."""
+        self.close()
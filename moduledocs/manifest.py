@@ -0,0 +1,95 @@
+"""Build manifest for incremental documentation output."""
+
+import json
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Dict, List, Iterable
+
+MANIFEST_NAME = '.moduledocs.json'
+
+
+def text_digest(text: str) -> str:
+    """Return content hash of rendered text."""
+    return sha256(text.encode()).hexdigest()
+
+
+def paths_digest(paths: Iterable[str]) -> str:
+    """Return hash of set of paths, used as input hash for index."""
+    return text_digest('\n'.join(sorted(paths)))
+
+
+class Manifest:
+    """
+    Record of previous build stored in docs directory.
+
+    Maps every output key (module path or "index") to pair of input hash
+    and output hash, output hash is empty for modules without output (see
+    record_source). Entry of page with links has sorted paths of linked
+    modules as third item. Previous record is used only if it was made
+    with the same builder settings, otherwise everything is treated as
+    changed.
+    Extra data is saved with entries, it is not loaded.
+    """
+
+    def __init__(self, docs_path: Path, settings: str = '',
+                 name: str = MANIFEST_NAME):
+        """Load manifest of previous build from file name in docs_path."""
+        self.docs_path = Path(docs_path)
+        self.settings = settings
+        self.name = name
+        self.previous: Dict[str, List[str]] = {}
+        self.current: Dict[str, List[str]] = {}
+        self.extra: Dict[str, Any] = {}
+        self.load()
+
+    @property
+    def path(self) -> Path:
+        """Location of manifest file."""
+        return self.docs_path / self.name
+
+    def load(self):
+        """Read previous manifest if it exists and settings match."""
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('settings') == self.settings:
+            self.previous = data.get('entries', {})
+
+    def is_fresh(self, key: str, digest: str, output: Path) -> bool:
+        """
+        Check if output for key is up to date.
+
+        Fresh entries are carried over to current manifest.
+        """
+        entry = self.previous.get(key)
+        if not digest or not entry or entry[0] != digest:
+            return False
+        if not output.exists():
+            return False
+        self.current[key] = entry
+        return True
+
+    def record(self, key: str, digest: str, text: str,
+               links: Iterable[str] = ()):
+        """Record rendered output for key and modules it links to."""
+        self.current[key] = [digest, text_digest(text)]
+        if links:
+            self.current[key].append(sorted(links))
+
+    def record_source(self, key: str, digest: str):
+        """Record input of module which is not rendered by this build."""
+        self.current[key] = [digest, '']
+
+    def removed(self) -> List[str]:
+        """Keys of previous build which are not in current one."""
+        return [key for key in self.previous if key not in self.current]
+
+    def save(self):
+        """Write current manifest to docs directory."""
+        self.docs_path.mkdir(parents=True, exist_ok=True)
+        data = dict(self.extra)
+        data.update(settings=self.settings, entries=self.current)
+        with open(self.path, 'w') as file:
+            json.dump(data, file, indent=1, sort_keys=True)
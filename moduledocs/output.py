@@ -0,0 +1,121 @@
+"""Writing of rendered documentation files."""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from locale import getpreferredencoding
+from pathlib import Path
+from threading import get_ident
+from typing import Deque, Optional, Set
+
+SAVE_THREADS = 8
+SAVE_WINDOW = 4
+
+
+@dataclass
+class SaveReport:
+    """Number of written, unchanged and removed output files."""
+
+    written: int = 0
+    skipped: int = 0
+    removed: int = 0
+
+
+def encode_text(text: str) -> bytes:
+    """Encode text the same way as open() in text mode does."""
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text.encode(getpreferredencoding(False))
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """
+    Write data to file unless it already has the same content.
+
+    File is replaced atomically, readers never see partly written file.
+    Return True if file was written.
+    """
+    try:
+        if os.stat(path).st_size == len(data):
+            with open(path, 'rb') as file:
+                if file.read() == data:
+                    return False
+    except OSError:
+        pass
+    temp = path.with_name('.{}.{}.{}.tmp'.format(path.name, os.getpid(),
+                                                 get_ident()))
+    try:
+        with open(temp, 'wb') as file:
+            file.write(data)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            temp.unlink()
+        except OSError:
+            pass
+        raise
+    return True
+
+
+class OutputWriter:
+    """
+    Bulk writer of output files.
+
+    Every directory is created once, files are written by write_if_changed
+    in bounded thread pool (only a few files per thread are queued) and
+    result is counted in report.
+    """
+
+    def __init__(self, threads: int = SAVE_THREADS):
+        """Create writer with number of threads, one writes in place."""
+        self.report = SaveReport()
+        self.directories: Set[Path] = set()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        if threads > 1:
+            self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.window = threads * SAVE_WINDOW
+        self.pending: Deque[Future] = deque()
+
+    def directory(self, path: Path):
+        """Create directory if it is not created yet."""
+        if path not in self.directories:
+            path.mkdir(parents=True, exist_ok=True)
+            self.directories.add(path)
+
+    def write(self, path: Path, text: str):
+        """Write text to file if it changed."""
+        self.directory(path.parent)
+        data = encode_text(text)
+        if self.executor is None:
+            self._count(write_if_changed(path, data))
+            return
+        self.pending.append(self.executor.submit(write_if_changed, path,
+                                                 data))
+        if len(self.pending) >= self.window:
+            self._count(self.pending.popleft().result())
+
+    def remove(self, path: Path) -> bool:
+        """Remove file, return False if it did not exist."""
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        self.report.removed += 1
+        return True
+
+    def close(self) -> SaveReport:
+        """Wait for every queued file and return report."""
+        try:
+            while self.pending:
+                self._count(self.pending.popleft().result())
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+        return self.report
+
+    def _count(self, written: bool):
+        if written:
+            self.report.written += 1
+        else:
+            self.report.skipped += 1
@@ -2,54 +2,125 @@
 
 from pathlib import Path
 from copy import copy
-from typing import List, Iterator, Union, Any
+from os import cpu_count
+from locale import getpreferredencoding
+from hashlib import sha256
+from concurrent.futures import Future
+from collections import deque
+from dataclasses import replace
+from functools import partial
+from typing import List, Iterator, Iterable, Union, Any, Optional,\
+    AbstractSet, Deque, Callable, Tuple
 from textwrap import dedent
 import parso
+from parso.tree import BaseNode
 from parso.python.tree import PythonBaseNode, PythonNode, Module, Class,\
-    Function, Keyword, Name, Operator, ExprStmt, Literal
+    Function, Keyword, Name, Operator, Literal
+from .budget import Budget, ErrorReport, ExtractPool, FileError,\
+    extract_within
+from .discovery import Finder
+from .profiling import Instrumentation, Timings, measure
+from .share import PlannedShare, duplicate_keys
 from .parsed_objects import ParsedClass, ParsedDecorator,\
     ParsedDocstring, ParsedFunction, ParsedImport, ParsedModule,\
     ParsedParameter, ParsedStatement, ParsedKeyword, ParsedOperator,\
     ParsedName, ParsedLiteral
 
+EXTRACT_WINDOW = 4
+# Files of this size and larger are extracted in chunks (see parse_large)
+LARGE_FILE_SIZE = 8 * 1024 * 1024
+# Size of chunk of large file, chunks end at top level statements
+CHUNK_SIZE = 1024 * 1024
+DIGEST_BLOCK = 1024 * 1024
+PART_TYPES = frozenset(['name', 'keyword', 'operator', 'number', 'string'])
+IMPORT_PART_TYPES = frozenset(['name', 'keyword', 'operator'])
+DECORATOR_PART_TYPES = frozenset(['name', 'operator', 'number', 'string'])
+NAME_TYPES = frozenset(['name'])
+STATEMENT_TYPES = frozenset(['expr_stmt'])
+
+
+def norm_doc(value: str) -> ParsedDocstring:
+    """Normalize docstring from source text of string literal."""
+    doc = dedent(value.strip(' \t\n\r\x0b\x0c\'"'))
+    return ParsedDocstring(doc.strip())
+
 
 def extract_doc(node: Union[Module, Class, Function]) -> ParsedDocstring:
     """Extract parsed docstring from module, class or function."""
     doc_node = node.get_doc_node()
-    if doc_node:
-        doc = doc_node.value.strip(' \t\n\r\x0b\x0c\'"')
-        doc = dedent(doc)
-    else:
-        doc = ''
-    return ParsedDocstring(doc.strip())
+    return norm_doc(doc_node.value if doc_node else '')
+
+
+def iter_nodes(node: PythonBaseNode,
+               types: AbstractSet[str]) -> Iterator[PythonBaseNode]:
+    """
+    Find every node which type is in types.
+
+    Nodes are yielded in depth-first order, children of found node are not
+    examined. Uses explicit stack, so any depth of tree is supported.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.type in types:
+            yield node
+        elif isinstance(node, BaseNode):
+            stack.extend(reversed(node.children))
+
+
+def iter_shallow_nodes(node: PythonBaseNode,
+                       types: AbstractSet[str],
+                       depth: int = 2,
+                       examine: bool = True) -> Iterator[PythonBaseNode]:
+    """
+    Find every node which type is in types with depth limit.
+
+    If examine is false only children of module or plain node are
+    examined at first level.
+    """
+    stack = [(node, depth, examine)]
+    while stack:
+        node, depth, examine = stack.pop()
+        if not depth:
+            continue
+        if node.type in types:
+            yield node
+        elif isinstance(node, (Module, PythonNode)) or (
+             examine and isinstance(node, BaseNode)):
+            stack.extend([(child, depth - 1, True)
+                          for child in reversed(node.children)])
 
 
 def filter_nodes(node: PythonBaseNode,
                  targets: List[Any]) -> Iterator[PythonBaseNode]:
-    """Recursive find every node with target type."""
-    targets_hit = [isinstance(node, t) for t in targets]
-    if any(targets_hit):
-        yield node
-    elif hasattr(node, 'children'):
-        for child in node.children:
-            for nodes in filter_nodes(child, targets):
-                yield nodes
+    """Find every node with target type."""
+    targets = tuple(targets)
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, targets):
+            yield node
+        elif isinstance(node, BaseNode):
+            stack.extend(reversed(node.children))
 
 
 def shallow_filter_nodes(node: PythonBaseNode,
                          targets: List[Any],
                          depth: int = 2,
                          examine: bool = True) -> Iterator[PythonBaseNode]:
-    """Recursive find every node with target type with depth limit."""
-    if depth:
-        targets_hit = [isinstance(node, t) for t in targets]
-        if any(targets_hit):
+    """Find every node with target type with depth limit."""
+    targets = tuple(targets)
+    stack = [(node, depth, examine)]
+    while stack:
+        node, depth, examine = stack.pop()
+        if not depth:
+            continue
+        if isinstance(node, targets):
             yield node
         elif isinstance(node, (Module, PythonNode)) or (
-             examine and hasattr(node, 'children')):
-            for child in node.children:
-                for nodes in shallow_filter_nodes(child, targets, depth - 1):
-                    yield nodes
+             examine and isinstance(node, BaseNode)):
+            stack.extend([(child, depth - 1, True)
+                          for child in reversed(node.children)])
 
 
 def same_parsed(
@@ -69,12 +140,13 @@ def same_parsed(
         raise Exception('Same not found!')
 
 
-def norm_stmt(node: PythonBaseNode, equation: bool = True) -> List[Any]:
-    """Statement normalization function."""
+def norm_parts(parts: Iterable[PythonBaseNode],
+               equation: bool = True) -> ParsedStatement:
+    """Normalize statement from names, keywords, operators, literals."""
     statement_data: List[ParsedName] = []
     statement_value: List[Any] = []
     state = copy(equation)
-    for part in filter_nodes(node, [Name, Keyword, Operator, Literal]):
+    for part in parts:
         value = part.value
         if isinstance(part, Operator):
             if state and value == '=':
@@ -93,22 +165,34 @@ def norm_stmt(node: PythonBaseNode, equation: bool = True) -> List[Any]:
     return ParsedStatement(statement_data, statement_value)
 
 
+def norm_stmt(node: PythonBaseNode, equation: bool = True) -> List[Any]:
+    """Statement normalization function."""
+    return norm_parts(iter_nodes(node, PART_TYPES), equation)
+
+
+def norm_import(parts: Iterable[PythonBaseNode],
+                node_import: PythonBaseNode) -> ParsedImport:
+    """Normalize import from names, keywords and operators."""
+    from_module = ''
+    import_data = []
+    for part in parts:
+        value = part.value
+        if not from_module and isinstance(part, Name):
+            from_module = value
+        if isinstance(part, (Name, Keyword, Operator)):
+            import_data.append(same_parsed(part, value))
+        else:
+            raise ValueError('Unexpected "import" python code: ' +
+                             node_import.get_code())
+    return ParsedImport(from_module, import_data)
+
+
 def extract_imports(node: Module) -> List[ParsedImport]:
     """Extract parsed imports from module."""
     node_imports = []
     for node_import in node.iter_imports():
-        from_module = ''
-        import_data = []
-        for part in filter_nodes(node_import, [Name, Keyword, Operator]):
-            value = part.value
-            if not from_module and isinstance(part, Name):
-                from_module = value
-            if isinstance(part, (Name, Keyword, Operator)):
-                import_data.append(same_parsed(part, value))
-            else:
-                raise ValueError('Unexpected "import" python code: ' +
-                                 node_import.get_code())
-        node_imports.append(ParsedImport(from_module, import_data))
+        parts = iter_nodes(node_import, IMPORT_PART_TYPES)
+        node_imports.append(norm_import(parts, node_import))
     return node_imports
 
 
@@ -123,8 +207,8 @@ def extract_statements(node: PythonBaseNode) -> List[ParsedStatement]:
 
     """
     statements = []
-    for statement_node in shallow_filter_nodes(node, [ExprStmt], 3,
-                                               examine=False):
+    for statement_node in iter_shallow_nodes(node, STATEMENT_TYPES, 3,
+                                             examine=False):
         statements.append(norm_stmt(statement_node))
     return statements
 
@@ -143,32 +227,33 @@ def extract_params(node: Union[Class, Function]) -> List[ParsedParameter]:
     """
     params = []
     for param in node.get_params():
-        for part in filter_nodes(param, [Name,
-                                         Operator,
-                                         Literal,
-                                         Keyword]):
+        for part in iter_nodes(param, PART_TYPES):
             params.append(same_parsed(part, part.value))
             # TODO Parsed parameter!!
     return params
 
 
+def norm_decorator(parts: Iterable[PythonBaseNode]) -> ParsedDecorator:
+    """Normalize decorator from names, operators and literals."""
+    name = []
+    args = []
+    brackets = False
+    for part in parts:
+        if part.value in '()' and isinstance(part, Operator):
+            brackets = True
+        elif brackets:
+            args.append(same_parsed(part, part.value))
+        elif not brackets:
+            name.append(part.value)
+    return ParsedDecorator(''.join(name), args)
+
+
 def extract_decorators(node: Union[Class, Function]) -> List[ParsedDecorator]:
     """Extract parsed decorators for function, method or class."""
     decorators = []
     for decorator in node.get_decorators():
-        name = []
-        args = []
-        brackets = False
-        for part in filter_nodes(decorator, [Name,
-                                             Operator,
-                                             Literal]):
-            if part.value in '()' and isinstance(part, Operator):
-                brackets = True
-            elif brackets:
-                args.append(same_parsed(part, part.value))
-            elif not brackets:
-                name.append(part.value)
-        decorators.append(ParsedDecorator(''.join(name), args))
+        parts = iter_nodes(decorator, DECORATOR_PART_TYPES)
+        decorators.append(norm_decorator(parts))
     return decorators
 
 
@@ -195,7 +280,8 @@ def extract_functions(node: Union[Module, Class]) -> List[ParsedFunction]:
             return_annotation=ParsedName('', annotation=f_annotation),
             returns=f_return,
             yields=f_yield,
-            raises=f_raise))
+            raises=f_raise,
+            line=function_node.start_pos[0]))
     return functions
 
 
@@ -208,46 +294,622 @@ def extract_classes(node: Module) -> List[ParsedClass]:
             if isinstance(class_arg, Name):
                 class_arg = class_arg.value
             else:
-                class_arg = '.'.join([n.value for n in filter_nodes(class_arg,
-                                                                    [Name])])
+                class_arg = '.'.join([n.value for n in iter_nodes(class_arg,
+                                                                  NAME_TYPES)])
         classes.append(ParsedClass(name=ParsedName(class_node.name.value),
                                    docstring=extract_doc(class_node),
                                    parent_class=class_arg,
                                    decorators=extract_decorators(class_node),
                                    variables=extract_statements(class_node),
-                                   methods=extract_functions(class_node)))
+                                   methods=extract_functions(class_node),
+                                   line=class_node.start_pos[0]))
     return classes
 
 
-def extract(file_name: Path) -> ParsedModule:
-    """Extract parsed module from file by path."""
-    with open(file_name.absolute()) as file:
-        root_node = parso.parse(file.read())
+NAME, KEYWORD, OPERATOR, LITERAL = range(1, 5)
+LEAF_KINDS = {'name': NAME, 'keyword': KEYWORD, 'operator': OPERATOR,
+              'number': LITERAL, 'string': LITERAL}
+ALL_PARTS = frozenset([NAME, KEYWORD, OPERATOR, LITERAL])
+IMPORT_PARTS = frozenset([NAME, KEYWORD, OPERATOR])
+DECORATOR_PARTS = frozenset([NAME, OPERATOR, LITERAL])
+NAME_PARTS = frozenset([NAME])
+# Same containers as parso uses in Scope and Function scans
+FLOW_CONTAINERS = frozenset(['if_stmt', 'while_stmt', 'for_stmt', 'try_stmt',
+                             'with_stmt', 'async_stmt', 'suite'])
+RETURN_CONTAINERS = FLOW_CONTAINERS | {'simple_stmt'}
+FUNC_CONTAINERS = RETURN_CONTAINERS | {'decorated', 'async_funcdef'}
+DECORATOR_CONTAINERS = frozenset(['decorators', 'async_funcdef'])
+# Only expression statements of module and its children are extracted
+STATEMENT_DEPTH = 2
+# Extraction "signatures" skips statements, returns, yields and raises
+EXTRACTIONS = ('full', 'signatures')
+BODY_NODE_TYPES = ('expr_stmt', 'return_stmt', 'raise_stmt', 'yield_expr')
+
+
+class _Context:
+    """What the node can be part of, shared by siblings."""
+
+    __slots__ = ('scope', 'imports', 'returns', 'yields', 'depth',
+                 'decorators', 'dead', 'plain', 'container')
+
+    def __init__(self, scope: Any, imports: bool, returns: Any, yields: Any,
+                 depth: int, decorators: Optional[list]):
+        self.scope = scope
+        self.imports = imports
+        self.returns = returns
+        self.yields = yields
+        self.depth = min(depth, STATEMENT_DEPTH + 1)
+        self.decorators = decorators
+        self.dead = (scope is None and not imports and returns is None and
+                     yields is None and decorators is None and
+                     self.depth > STATEMENT_DEPTH)
+        self.plain: Optional[_Context] = None
+        self.container: Optional[_Context] = None
+
+    def child(self, node_type: str) -> '_Context':
+        """Return context for children of node with type."""
+        if node_type in RETURN_CONTAINERS:
+            if self.container is None:
+                self.container = self._derive(
+                    self.scope, self.imports, self.returns, None)
+            return self.container
+        if node_type in DECORATOR_CONTAINERS:
+            func_container = node_type in FUNC_CONTAINERS
+            return _Context(self.scope if func_container else None,
+                            self.imports and func_container, None,
+                            self.yields, self.depth + 1, self.decorators)
+        if node_type in FUNC_CONTAINERS:
+            return _Context(self.scope, self.imports, None, self.yields,
+                            self.depth + 1, None)
+        if self.plain is None:
+            self.plain = self._derive(None, False, None, None)
+        return self.plain
+
+    def _derive(self, scope: Any, imports: bool, returns: Any,
+                decorators: Optional[list]) -> '_Context':
+        if scope is self.scope and imports == self.imports and \
+                returns is self.returns and decorators is self.decorators \
+                and self.depth > STATEMENT_DEPTH:
+            return self
+        return _Context(scope, imports, returns, self.yields,
+                        self.depth + 1, decorators)
+
+
+class _Scope:
+    """Module or class which functions are collected."""
+
+    __slots__ = ('node', 'decorators', 'bases', 'functions', 'classes')
+
+    def __init__(self, node: PythonBaseNode, decorators: list,
+                 classes: Optional[list] = None):
+        self.node = node
+        self.decorators = decorators
+        self.bases: Optional[list] = None
+        self.functions: list = []
+        self.classes = classes
+
+
+class _Function:
+    """Function which parts are collected."""
+
+    __slots__ = ('node', 'decorators', 'params', 'annotation', 'returns',
+                 'yields', 'raises')
+
+    def __init__(self, node: Function, decorators: list):
+        self.node = node
+        self.decorators = decorators
+        self.params: list = []
+        self.annotation: list = []
+        self.returns: list = []
+        self.yields: list = []
+        self.raises: list = []
+
+
+class ModuleVisitor:
+    """
+    Single pass extractor of parsed module from parso tree.
+
+    Walks tree once with explicit stack and dispatches on node type. Nodes
+    of imports, statements, parameters, decorators, returns, yields and
+    raises start collectors, every leaf is added to active collectors.
+    Subtrees which can not contain anything are skipped. Gives the same
+    result as separate extract_* functions. With extraction "signatures"
+    statements, returns, yields and raises are not collected, so bodies of
+    functions are mostly skipped.
+    """
+
+    def __init__(self, extraction: str = 'full'):
+        """Create visitor with dispatch table."""
+        self.dispatch = {
+            'import_name': self._visit_import,
+            'import_from': self._visit_import,
+            'expr_stmt': self._visit_expr_stmt,
+            'return_stmt': self._visit_return,
+            'raise_stmt': self._visit_raise,
+            'yield_expr': self._visit_yield,
+            'keyword': self._visit_keyword,
+            'decorated': self._visit_decorated,
+            'decorator': self._visit_decorator,
+            'classdef': self._visit_classdef,
+            'funcdef': self._visit_funcdef,
+            'lambdef': self._visit_lambdef,
+        }
+        self.bodies = extraction == 'full'
+        if not self.bodies:
+            for node_type in BODY_NODE_TYPES:
+                del self.dispatch[node_type]
+
+    def visit(self, root_node: Module, file_name: Path,
+              digest: str = '') -> ParsedModule:
+        """Extract parsed module from parso tree in one traversal."""
+        self.module = _Scope(root_node, [], [])
+        self.imports: list = []
+        self.statements: list = []
+        self.collectors: list = []
+        self.stack: list = []
+        self._push_children(root_node, _Context(self.module, True,
+                                                None, None, 1, None))
+        self._walk()
+        return ParsedModule(name=ParsedName(file_name.name[:-3]),
+                            path=file_name,
+                            docstring=extract_doc(root_node),
+                            imports=[norm_import(parts, node)
+                                     for node, parts in self.imports],
+                            statements=[norm_parts(parts)
+                                        for parts in self.statements],
+                            classes=[self._class(c)
+                                     for c in self.module.classes],
+                            functions=[self._function(f)
+                                       for f in self.module.functions],
+                            digest=digest)
+
+    def _walk(self):
+        stack = self.stack
+        pop = stack.pop
+        collectors = self.collectors
+        dispatch = self.dispatch
+        while stack:
+            node, context = pop()
+            if node is None:
+                if context is None:
+                    collectors.pop()
+                else:
+                    collectors.append(context)
+                continue
+            handler = dispatch.get(node.type)
+            if handler is not None:
+                handler(node, context)
+            elif isinstance(node, BaseNode):
+                context = context.child(node.type)
+                if not context.dead or collectors:
+                    stack.extend([(child, context)
+                                  for child in reversed(node.children)])
+            elif collectors:
+                self._leaf(node)
+
+    def _leaf(self, leaf: PythonBaseNode):
+        kind = LEAF_KINDS.get(leaf.type)
+        for kinds, parts in self.collectors:
+            if kinds is None or kind in kinds:
+                parts.append(leaf)
+
+    def _push_children(self, node: PythonBaseNode, context: _Context):
+        if not context.dead or self.collectors:
+            self.stack.extend([(child, context)
+                               for child in reversed(node.children)])
+
+    def _collect(self, kinds: Optional[frozenset], parts: list):
+        self.collectors.append((kinds, parts))
+        self.stack.append((None, None))
+
+    def _push_collected(self, node: PythonBaseNode, context: _Context,
+                        kinds: Optional[frozenset], parts: list):
+        self.stack.append((None, None))
+        self.stack.append((node, context))
+        self.stack.append((None, (kinds, parts)))
+
+    def _visit_import(self, node: PythonBaseNode, context: _Context):
+        if context.imports:
+            parts: list = []
+            self.imports.append((node, parts))
+            self._collect(IMPORT_PARTS, parts)
+        self._push_children(node, context.child(node.type))
+
+    def _visit_expr_stmt(self, node: PythonBaseNode, context: _Context):
+        if context.depth <= STATEMENT_DEPTH:
+            parts: list = []
+            self.statements.append(parts)
+            self._collect(ALL_PARTS, parts)
+        self._push_children(node, context.child(node.type))
+
+    def _visit_return(self, node: PythonBaseNode, context: _Context):
+        if context.returns is not None:
+            parts: list = []
+            context.returns.returns.append(parts)
+            self._collect(ALL_PARTS, parts)
+        self._push_children(node, context.child(node.type))
+
+    def _visit_raise(self, node: PythonBaseNode, context: _Context):
+        if context.returns is not None:
+            parts: list = []
+            context.returns.raises.append(parts)
+            self._collect(ALL_PARTS, parts)
+        self._push_children(node, context.child(node.type))
+
+    def _visit_yield(self, node: PythonBaseNode, context: _Context):
+        if context.yields is not None:
+            parts: list = []
+            context.yields.yields.append(parts)
+            self._collect(ALL_PARTS, parts)
+        self._push_children(node, context.child(node.type))
+
+    def _visit_keyword(self, node: Keyword, context: _Context):
+        value = node.value
+        if context.returns is not None:
+            if value == 'return':
+                context.returns.returns.append([node])
+            elif value == 'raise':
+                context.returns.raises.append([node])
+        if value == 'yield' and context.yields is not None and \
+                node.parent.type != 'yield_expr':
+            context.yields.yields.append([node])
+        if self.collectors:
+            self._leaf(node)
+
+    def _visit_decorated(self, node: PythonBaseNode, context: _Context):
+        context = _Context(context.scope, context.imports, None,
+                           context.yields, context.depth + 1, [])
+        self._push_children(node, context)
+
+    def _visit_decorator(self, node: PythonBaseNode, context: _Context):
+        if context.decorators is not None:
+            parts: list = []
+            context.decorators.append(parts)
+            self._collect(DECORATOR_PARTS, parts)
+        self._push_children(node, context.child(node.type))
+
+    def _visit_classdef(self, node: Class, context: _Context):
+        scope = None
+        if context.scope is not None and context.scope.classes is not None:
+            scope = _Scope(node, context.decorators or [])
+            context.scope.classes.append(scope)
+        context = _Context(scope, False, None, None, context.depth + 1, None)
+        children = node.children
+        if scope is not None and getattr(children[2], 'value', '') == '(' \
+                and getattr(children[3], 'value', '') != ')':
+            scope.bases = []
+            for child in reversed(children[4:]):
+                self.stack.append((child, context))
+            self._push_collected(children[3], context, NAME_PARTS,
+                                 scope.bases)
+            for child in reversed(children[:3]):
+                self.stack.append((child, context))
+        else:
+            self._push_children(node, context)
+
+    def _visit_funcdef(self, node: Function, context: _Context):
+        function = None
+        if context.scope is not None:
+            function = _Function(node, context.decorators or [])
+            context.scope.functions.append(function)
+        body = function if self.bodies else None
+        context = _Context(None, False, body, body, context.depth + 1, None)
+        if function is None:
+            self._push_children(node, context)
+            return
+        stack = self.stack
+        children = node.children
+        annotation = None
+        if getattr(children[3], 'value', '') == '->':
+            annotation = children[4]
+        for child in reversed(children[3:]):
+            if child is annotation:
+                self._push_collected(child, context, None,
+                                     function.annotation)
+            else:
+                stack.append((child, context))
+        parameters = children[2]
+        parameters_context = context.child(parameters.type)
+        for child in reversed(parameters.children):
+            if child.type == 'param':
+                self._push_collected(child, parameters_context, ALL_PARTS,
+                                     function.params)
+            else:
+                stack.append((child, parameters_context))
+        for child in reversed(children[:2]):
+            stack.append((child, context))
+
+    def _visit_lambdef(self, node: PythonBaseNode, context: _Context):
+        if self.collectors:
+            context = _Context(None, False, None, None, context.depth + 1,
+                               None)
+            self._push_children(node, context)
+
+    def _function(self, function: _Function) -> ParsedFunction:
+        node = function.node
+        annotation = ''.join([leaf.prefix + leaf.value
+                              for leaf in function.annotation])
+        return ParsedFunction(
+            name=ParsedName(node.name.value),
+            docstring=extract_doc(node),
+            paramenters=[same_parsed(part, part.value)
+                         for part in function.params],
+            decorators=[norm_decorator(parts)
+                        for parts in function.decorators],
+            return_annotation=ParsedName('', annotation=annotation),
+            returns=[norm_parts(parts, False) for parts in function.returns],
+            yields=[norm_parts(parts, False) for parts in function.yields],
+            raises=[norm_parts(parts, False) for parts in function.raises],
+            line=node.start_pos[0])
+
+    def _class(self, scope: _Scope) -> ParsedClass:
+        node = scope.node
+        parent_class = None
+        if scope.bases is not None:
+            parent_class = '.'.join([part.value for part in scope.bases])
+        return ParsedClass(name=ParsedName(node.name.value),
+                           docstring=extract_doc(node),
+                           parent_class=parent_class,
+                           decorators=[norm_decorator(parts)
+                                       for parts in scope.decorators],
+                           variables=[],
+                           methods=[self._function(f)
+                                    for f in scope.functions],
+                           line=node.start_pos[0])
+
+
+def read_source(file_name: Path) -> bytes:
+    """Read raw source bytes of python file."""
+    with open(file_name.absolute(), 'rb') as file:
+        return file.read()
+
+
+def decode_source(data: bytes) -> str:
+    """Decode source bytes the same way as open() in text mode does."""
+    text = data.decode(getpreferredencoding(False))
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def source_digest(data: bytes) -> str:
+    """Return content hash of raw source bytes."""
+    return sha256(data).hexdigest()
+
+
+def file_digest(file_name: Path) -> str:
+    """Return content hash of python file, file is read by blocks."""
+    digest = sha256()
+    with open(file_name.absolute(), 'rb') as file:
+        for block in iter(partial(file.read, DIGEST_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_tree_functions(root_node: Module, file_name: Path,
+                           digest: str = '') -> ParsedModule:
+    """
+    Extract parsed module from parso tree of file.
+
+    Every part is extracted by separate extract_* function, it is reference
+    implementation for ModuleVisitor.
+    """
     return ParsedModule(name=ParsedName(file_name.name[:-3]),
                         path=file_name,
                         docstring=extract_doc(root_node),
                         imports=extract_imports(root_node),
                         statements=extract_statements(root_node),
                         classes=extract_classes(root_node),
-                        functions=extract_functions(root_node))
+                        functions=extract_functions(root_node),
+                        digest=digest)
+
+
+def extract_tree(root_node: Module, file_name: Path, digest: str = '',
+                 extraction: str = 'full') -> ParsedModule:
+    """Extract parsed module from parso tree of file in single pass."""
+    return ModuleVisitor(extraction).visit(root_node, file_name, digest)
 
 
-def find_python(base: Path) -> Iterator[Path]:
-    """Find python files in directory and subdirectories."""
-    if base.is_dir():
-        for child in base.iterdir():
-            for python_file in find_python(child):
-                yield python_file
-    elif base.match('*.py'):
-        yield base
+def extract_source_parso(code: str, file_name: Path, digest: str = '',
+                         timings: Optional[Timings] = None,
+                         extraction: str = 'full') -> ParsedModule:
+    """Extract parsed module from source code of file with parso."""
+    with measure(timings, 'parse'):
+        root_node = parso.parse(code)
+    with measure(timings, 'extract'):
+        return extract_tree(root_node, file_name, digest, extraction)
 
 
-def find_and_extract(base: Path) -> Iterator[ParsedModule]:
+def extract_source_ast(code: str, file_name: Path, digest: str = '',
+                       timings: Optional[Timings] = None,
+                       extraction: str = 'full') -> ParsedModule:
+    """Extract parsed module from source code of file with stdlib ast."""
+    from .parse_ast import extract_source_ast as extract_ast
+    return extract_ast(code, file_name, digest, timings, extraction)
+
+
+# Backends take the same arguments as extract_source_parso. Errors which
+# make auto mode try the next backend.
+BACKENDS = {'parso': extract_source_parso, 'ast': extract_source_ast}
+AUTO_BACKENDS = ('ast', 'parso')
+BACKEND_ERRORS = (SyntaxError, ValueError, RecursionError)
+PARSERS = ('auto',) + tuple(BACKENDS)
+
+
+def extract_source(code: str, file_name: Path, digest: str = '',
+                   timings: Optional[Timings] = None, parser: str = 'parso',
+                   extraction: str = 'full') -> ParsedModule:
+    """
+    Extract parsed module from source code of file.
+
+    Parser is a name of backend in BACKENDS or "auto". Backend "ast" is
+    faster, but it fails on invalid code and on syntax which it can not
+    extract exactly as "parso" does, "auto" falls back to "parso" then.
+    Extraction is "full" or "signatures", the latter leaves statements,
+    returns, yields and raises empty.
+    """
+    if extraction not in EXTRACTIONS:
+        raise ValueError('Unknown extraction {!r}'.format(extraction))
+    if parser != 'auto':
+        if parser not in BACKENDS:
+            raise ValueError('Unknown parser {!r}'.format(parser))
+        return BACKENDS[parser](code, file_name, digest, timings, extraction)
+    for backend in AUTO_BACKENDS[:-1]:
+        try:
+            return BACKENDS[backend](code, file_name, digest, timings,
+                                     extraction)
+        except BACKEND_ERRORS:
+            pass
+    return BACKENDS[AUTO_BACKENDS[-1]](code, file_name, digest, timings,
+                                       extraction)
+
+
+def extract(file_name: Path, timings: Optional[Timings] = None,
+            parser: str = 'parso', extraction: str = 'full',
+            large_size: int = LARGE_FILE_SIZE) -> ParsedModule:
+    """
+    Extract parsed module from file by path.
+
+    If timings is passed, time of read, parse and extract phases is added
+    to it. Parser and extraction are passed to extract_source. File of
+    large_size bytes or larger is extracted in chunks of top level
+    statements (see extract_large), zero turns it off.
+    """
+    if large_size and file_name.stat().st_size >= large_size:
+        from .parse_large import extract_large
+        return extract_large(file_name, timings, parser, extraction)
+    with measure(timings, 'read'):
+        data = read_source(file_name)
+        code = decode_source(data)
+        digest = source_digest(data)
+    return extract_source(code, file_name, digest, timings, parser,
+                          extraction)
+
+
+def extract_timed(extractor: Callable[..., ParsedModule],
+                  file_name: Path) -> Tuple[ParsedModule, Timings]:
+    """Call extractor with timings, return module and its timings."""
+    timings: Timings = {}
+    module = extractor(file_name, timings)
+    return module, timings
+
+
+def find_python(base: Path, exclude: Iterable[str] = (),
+                gitignore: bool = False, packages_only: bool = False,
+                threads: int = 0) -> Iterator[Path]:
+    """Find python files in directory and subdirectories, see Finder."""
+    return Finder(exclude, gitignore, packages_only, threads).find(base)
+
+
+def find_and_extract(base: Path, jobs: int = 1, cache: Any = None,
+                     hooks: Optional[Instrumentation] = None,
+                     finder: Optional[Finder] = None, parser: str = 'parso',
+                     extraction: str = 'full', dedup: bool = True,
+                     budget: Optional[Budget] = None,
+                     errors: Optional[ErrorReport] = None
+                     ) -> Iterator[ParsedModule]:
     """
     Recursive extract parsed module in directory.
 
     Extract parsed module for every python files in directory and
-    subdirectories.
+    subdirectories. With jobs greater than one files are extracted in a
+    process pool (zero means one process per core), modules are still
+    yielded in the same order as find_python returns files and only a few
+    files per process are extracted ahead of consumer. If cache
+    (ParseCache) is passed unchanged files are loaded from it. If hooks
+    (Instrumentation) are passed, discovery and every file are timed.
+    Files are found by finder (Finder) if it is passed. Parser and
+    extraction are passed to extract unless cache is passed, cache has its
+    own ones. With dedup all files are found first and file with the same
+    content as earlier file is not extracted, module of earlier file is
+    shared with name and path rebound (see duplicate_keys). If errors
+    (ErrorReport) is passed, file which fails or exceeds budget (Budget)
+    is recorded in it and skipped and worker process which dies does not
+    stop the build (see ExtractPool), budget is used only with errors.
     """
-    for python_file in find_python(base):
-        yield extract(python_file)
+    extractor: Callable[..., ParsedModule] = partial(
+        extract, parser=parser, extraction=extraction)
+    if cache is not None:
+        extractor = cache.extract
+    if jobs < 1:
+        jobs = cpu_count() or 1
+    python_files: Iterable[Path] = (finder or Finder()).find(base)
+    if hooks is not None:
+        python_files = hooks.iterate('discovery', python_files)
+        extractor = partial(extract_timed, extractor)
+    if errors is not None:
+        extractor = partial(extract_within, extractor, budget or Budget(),
+                            kill=jobs > 1)
+    share = None
+    if dedup:
+        python_files = list(python_files)
+        with (hooks or Instrumentation()).phase('dedup'):
+            share = PlannedShare(duplicate_keys(python_files, file_digest))
+    if jobs == 1:
+        for python_file in python_files:
+            shared = share.get(python_file) if share is not None else None
+            if shared is not None:
+                yield rebind(shared, python_file)
+                continue
+            if hooks is None:
+                result = extractor(python_file)
+            else:
+                with hooks.extraction():
+                    result = extractor(python_file)
+            if isinstance(result, FileError):
+                errors.add(result)  # type: ignore
+                continue
+            if hooks is None:
+                module = result
+            else:
+                module, timings = result
+                hooks.file(python_file, timings)
+            if share is not None:
+                share.put(python_file, module)
+            yield module
+    else:
+        with ExtractPool(jobs, extractor, budget,
+                         errors is not None) as pool:
+            pending: Deque[Tuple[Path, Future, bool]] = deque()
+            for python_file in python_files:
+                future = share.get(python_file) if share is not None \
+                    else None
+                if future is None:
+                    future = pool.submit(python_file)
+                    if share is not None:
+                        share.put(python_file, future)
+                    pending.append((python_file, future, False))
+                else:
+                    pending.append((python_file, future, True))
+                if len(pending) >= jobs * EXTRACT_WINDOW:
+                    module = _result(pending.popleft(), pool, hooks, errors)
+                    if module is not None:
+                        yield module
+            while pending:
+                module = _result(pending.popleft(), pool, hooks, errors)
+                if module is not None:
+                    yield module
+    if share is not None and hooks is not None:
+        hooks.shared('extract', share.stats())
+
+
+def rebind(module: ParsedModule, file_name: Path) -> ParsedModule:
+    """Return module with name and path of file_name, parts are shared."""
+    if module.path == file_name:
+        return module
+    return replace(module, name=ParsedName(file_name.name[:-3]),
+                   path=file_name)
+
+
+def _result(item: Tuple[Path, Future, bool], pool: ExtractPool,
+            hooks: Optional[Instrumentation],
+            errors: Optional[ErrorReport]) -> Optional[ParsedModule]:
+    python_file, future, shared = item
+    result = pool.result(future)
+    if isinstance(result, FileError):
+        errors.add(replace(result, path=str(python_file)))  # type: ignore
+        return None
+    if hooks is None:
+        return rebind(result, python_file)
+    module, timings = result
+    if not shared:
+        hooks.file(python_file, timings)
+    return rebind(module, python_file)
@@ -0,0 +1,639 @@
+"""
+Parser based on stdlib ast and tokenize.
+
+Returns the same objects as parser based on parso. Structure of module is
+taken from ast, parts of imports, statements, parameters and so on are
+taken from tokens of source text of their nodes and converted to parso
+leaves, so the same normalization functions are used.
+"""
+
+import ast
+import re
+import sys
+import tokenize
+from functools import lru_cache
+from keyword import kwlist
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from parso.python.tree import Name, Keyword, Operator, Number, String
+from .parse import norm_doc, norm_parts, norm_import, norm_decorator,\
+    same_parsed
+from .parsed_objects import ParsedClass, ParsedDocstring, ParsedFunction,\
+    ParsedModule, ParsedName
+from .profiling import Timings, measure
+
+KEYWORDS = frozenset(kwlist)
+ALL_LEAVES = frozenset([Name, Keyword, Operator, Number, String])
+IMPORT_LEAVES = frozenset([Name, Keyword, Operator])
+DECORATOR_LEAVES = frozenset([Name, Operator, Number, String])
+NAME_LEAVES = frozenset([Name])
+OPENING = frozenset(['(', '[', '{'])
+CLOSING = frozenset([')', ']', '}'])
+FUNCTION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+CONTAINER_TYPES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try,
+                   ast.With, ast.AsyncWith)
+STATEMENT_TYPES = (ast.Assign, ast.AugAssign, ast.AnnAssign)
+IMPORT_TYPES = (ast.Import, ast.ImportFrom)
+# Syntax which parso does not support, parso recovers from it differently
+UNSUPPORTED_TYPES = tuple(getattr(ast, name) for name in
+                          ['Match', 'TryStar', 'TypeAlias']
+                          if hasattr(ast, name))
+# Patterns of tokenize module matched over whole text of expression, it is
+# faster than generate_tokens and f-strings are single tokens in any version
+TOKEN_PATTERN = re.compile(tokenize.Whitespace + '(?:{})'.format('|'.join(
+    '(?P<{}>{})'.format(*group) for group in [
+        ('skip', tokenize.group(tokenize.Comment, r'\\\r?\n', r'\r?\n')),
+        ('string', tokenize.group(
+            tokenize.StringPrefix + "'''" + tokenize.Single3,
+            tokenize.StringPrefix + '"""' + tokenize.Double3,
+            tokenize.String)),
+        ('number', tokenize.Number),
+        ('op', tokenize.Special),
+        ('name', tokenize.Name)])), re.DOTALL)
+STRING_PREFIX = frozenset('rRbBuUfF')
+
+
+# Fields of nodes which never contain expressions
+_SCALAR_FIELDS = frozenset(['ctx', 'id', 'attr', 'arg', 'op', 'ops', 'module',
+                            'level', 'names', 'name', 'asname', 'is_async',
+                            'conversion', 'kind', 'type_comment'])
+_CHECKED_TYPES = frozenset([ast.Lambda, ast.Subscript, ast.arg, ast.Yield,
+                            ast.YieldFrom])
+_CHILD_FIELDS: Dict[type, Tuple[str, ...]] = {ast.Constant: ()}
+
+
+def _child_fields(node_type: type) -> Tuple[str, ...]:
+    """Return fields of node type which may contain child nodes."""
+    fields: Tuple[str, ...] = ()
+    if issubclass(node_type, ast.AST):
+        fields = tuple(field for field in node_type._fields
+                       if field not in _SCALAR_FIELDS)
+    _CHILD_FIELDS[node_type] = fields
+    return fields
+
+
+class UnsupportedSyntax(SyntaxError):
+    """Code which can not be extracted exactly as parso does."""
+
+
+# Kind (name, op, number or string), value and end index in text
+Token = Tuple[str, str, int]
+
+
+def tokenize_text(text: str) -> Iterator[Token]:
+    """Split text of expressions to tokens, comments are skipped."""
+    index = 0
+    length = len(text)
+    match = TOKEN_PATTERN.match
+    while index < length:
+        token = match(text, index)
+        if token is None:
+            if text[index:].strip(' \f\t'):
+                raise UnsupportedSyntax('unexpected text {!r}'.format(
+                    text[index:index + 20]))
+            return
+        index = token.end()
+        kind = token.lastgroup
+        if kind != 'skip':
+            yield kind, token.group(kind), index
+
+
+def _skip_space(text: str, index: int) -> int:
+    while index < len(text) and text[index] in ' \t\f\r\n':
+        index += 1
+    return index
+
+
+def _fstring_text(text: str, index: int, end: int, tokens: List[Token],
+                  spec: bool) -> int:
+    """Skip text of f-string or format spec, split its fields."""
+    while index < end:
+        char = text[index]
+        if char == '\\' and not spec:
+            if text.startswith('N{', index + 1):
+                index = text.find('}', index)
+                if index < 0:
+                    raise UnsupportedSyntax('f-string named escape')
+            elif text.startswith('{', index + 1):
+                raise UnsupportedSyntax('f-string escaped {')
+            else:
+                index += 1
+            index += 1
+        elif char == '{':
+            if text.startswith('{', index + 1):
+                if spec:
+                    raise UnsupportedSyntax('f-string format spec')
+                index += 2
+            else:
+                index = _fstring_field(text, index, end, tokens, spec)
+        elif char == '}':
+            if spec:
+                return index
+            if not text.startswith('}', index + 1):
+                raise UnsupportedSyntax('f-string single }')
+            index += 2
+        else:
+            index += 1
+    if spec:
+        raise UnsupportedSyntax('f-string unclosed field')
+    return index
+
+
+def _fstring_field(text: str, index: int, end: int, tokens: List[Token],
+                   nested: bool) -> int:
+    """
+    Split replacement field of f-string, return index after it.
+
+    Field nested in format spec can not have format spec in parso.
+    """
+    tokens.append(('op', '{', index + 1))
+    index = _skip_space(text, index + 1)
+    depth = 0
+    empty = True
+    while index < end and (depth or text[index] not in '!:}' or
+                           text.startswith('!=', index)):
+        token = TOKEN_PATTERN.match(text, index)
+        if token is None or token.end() > end:
+            raise UnsupportedSyntax('f-string expression')
+        kind = token.lastgroup
+        value = token.group(kind)
+        if kind == 'skip':
+            raise UnsupportedSyntax('f-string comment or backslash')
+        if kind == 'op':
+            if value in OPENING:
+                depth += 1
+            elif value in CLOSING:
+                depth -= 1
+        elif kind == 'name' and value == 'lambda' and not depth:
+            raise UnsupportedSyntax('f-string lambda')
+        index = token.end()
+        tokens.append((kind, value, index))
+        index = _skip_space(text, index)
+        empty = False
+    if empty or index >= end:
+        raise UnsupportedSyntax('f-string field')
+    if text[index] == '!':
+        token = TOKEN_PATTERN.match(text, index + 1)
+        if token is None or token.lastgroup != 'name':
+            raise UnsupportedSyntax('f-string conversion')
+        tokens.append(('op', '!', index + 1))
+        index = token.end()
+        tokens.append(('name', token.group('name'), index))
+    if text.startswith(':', index):
+        if nested:
+            raise UnsupportedSyntax('f-string nested format spec')
+        tokens.append(('op', ':', index + 1))
+        index = _fstring_text(text, index + 1, end, tokens, True)
+    if not text.startswith('}', index):
+        raise UnsupportedSyntax('f-string field end')
+    tokens.append(('op', '}', index + 1))
+    return index + 1
+
+
+@lru_cache(maxsize=1024)
+def split_fstring(value: str) -> Tuple[Token, ...]:
+    """
+    Split f-string token to tokens of its fields the same as parso does.
+
+    Text of f-string is skipped. Raise UnsupportedSyntax if parso can not
+    parse f-string, it would not parse statement with it too.
+    """
+    start = 0
+    while value[start] in STRING_PREFIX:
+        start += 1
+    quote = value[start:start + 3]
+    if quote not in ('"""', "\'\'\'"):
+        quote = value[start]
+    tokens: List[Token] = []
+    _fstring_text(value, start + len(quote), len(value) - len(quote), tokens,
+                  False)
+    return tuple(tokens)
+
+
+def _is_fstring(value: str) -> bool:
+    for char in value:
+        if char not in STRING_PREFIX:
+            return False
+        if char in 'fF':
+            return True
+    return False
+
+
+class _Scope:
+    """Module or class which functions are collected."""
+
+    __slots__ = ('node', 'functions', 'classes')
+
+    def __init__(self, node: ast.AST, classes: Optional[list] = None):
+        self.node = node
+        self.functions: list = []
+        self.classes = classes
+
+
+class _Function:
+    """Function which returns, yields and raises are collected."""
+
+    __slots__ = ('node', 'returns', 'yields', 'raises')
+
+    def __init__(self, node: ast.AST):
+        self.node = node
+        self.returns: list = []
+        self.yields: list = []
+        self.raises: list = []
+
+
+class AstExtractor:
+    """
+    Extractor of parsed module from ast tree.
+
+    Statements are walked once to find scopes, imports, returns and raises,
+    expressions are walked to find yields and syntax which parso does not
+    support (UnsupportedSyntax is raised then).
+    """
+
+    _operators: Dict[str, Operator] = {}
+    _keywords: Dict[str, Keyword] = {}
+
+    def __init__(self, code: str, extraction: str = 'full'):
+        """Create extractor for source code, see extract_source."""
+        self.code = code
+        self.bodies = extraction == 'full'
+        self.lines = [line + '\n' for line in code.split('\n')]
+
+    def extract(self, tree: ast.Module, file_name: Path,
+                digest: str = '') -> ParsedModule:
+        """Extract parsed module from ast tree of source code."""
+        self.module = _Scope(tree, [])
+        self.imports: list = []
+        self.statements: list = []
+        self._statements(tree.body, self.module, None, True)
+        return ParsedModule(
+            name=ParsedName(file_name.name[:-3]),
+            path=file_name,
+            docstring=self._doc(tree.body),
+            imports=[norm_import(self._leaves(node, IMPORT_LEAVES), node)
+                     for node in self.imports],
+            statements=[norm_parts(self._leaves(node, ALL_LEAVES))
+                        for node in self.statements],
+            classes=[self._class(scope) for scope in self.module.classes],
+            functions=[self._function(function)
+                       for function in self.module.functions],
+            digest=digest)
+
+    def _statements(self, body: List[ast.stmt], scope: Optional[_Scope],
+                    function: Optional[_Function], top: bool):
+        imports = scope is self.module
+        for node in body:
+            if isinstance(node, FUNCTION_TYPES):
+                self._visit_function(node, scope, function)
+            elif isinstance(node, ast.ClassDef):
+                self._visit_class(node, scope, function)
+            elif isinstance(node, CONTAINER_TYPES):
+                self._visit_container(node, scope, function)
+            else:
+                if isinstance(node, UNSUPPORTED_TYPES):
+                    raise UnsupportedSyntax(type(node).__name__)
+                if imports and isinstance(node, IMPORT_TYPES):
+                    self.imports.append(node)
+                elif top and self.bodies and \
+                        isinstance(node, STATEMENT_TYPES):
+                    self.statements.append(node)
+                elif function is not None:
+                    if isinstance(node, ast.Return):
+                        function.returns.append(node)
+                    elif isinstance(node, ast.Raise):
+                        function.raises.append(node)
+                self._expressions(node, function)
+
+    def _visit_function(self, node: ast.AST, scope: Optional[_Scope],
+                        outer: Optional[_Function]):
+        if getattr(node, 'type_params', None):
+            raise UnsupportedSyntax('type parameters')
+        for decorator in node.decorator_list:
+            self._expressions(decorator, outer)
+        function = None
+        if scope is not None:
+            function = _Function(node)
+            scope.functions.append(function)
+        body = function if self.bodies else None
+        self._expressions(node.args, body)
+        if node.returns is not None:
+            self._expressions(node.returns, body)
+        self._statements(node.body, None, body, False)
+
+    def _visit_class(self, node: ast.ClassDef, scope: Optional[_Scope],
+                     outer: Optional[_Function]):
+        if getattr(node, 'type_params', None):
+            raise UnsupportedSyntax('type parameters')
+        for decorator in node.decorator_list:
+            self._expressions(decorator, outer)
+        class_scope = None
+        if scope is not None and scope.classes is not None:
+            class_scope = _Scope(node)
+            scope.classes.append(class_scope)
+        for base in node.bases + node.keywords:
+            self._expressions(base, None)
+        self._statements(node.body, class_scope, None, False)
+
+    def _visit_container(self, node: ast.AST, scope: Optional[_Scope],
+                         function: Optional[_Function]):
+        if isinstance(node, (ast.With, ast.AsyncWith)):
+            self._check_with(node)
+            for item in node.items:
+                self._expressions(item, function)
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            if isinstance(node.iter, ast.Tuple) and any(
+                    isinstance(element, ast.Starred)
+                    for element in node.iter.elts) and \
+                    self._next_char(node.iter.lineno,
+                                    node.iter.col_offset) != '(':
+                raise UnsupportedSyntax('starred for iterable')
+            self._expressions(node.target, function)
+            self._expressions(node.iter, function)
+        elif isinstance(node, (ast.If, ast.While)):
+            self._expressions(node.test, function)
+        self._statements(node.body, scope, function, False)
+        for handler in getattr(node, 'handlers', ()):
+            if handler.type is not None:
+                self._expressions(handler.type, function)
+            self._statements(handler.body, scope, function, False)
+        self._statements(getattr(node, 'orelse', ()), scope, function,
+                         False)
+        self._statements(getattr(node, 'finalbody', ()), scope, function,
+                         False)
+
+    def _check_with(self, node: ast.AST):
+        """Parenthesized context managers are not supported by parso."""
+        line = self.lines[node.lineno - 1]
+        rest = line[self._column(node.lineno, node.col_offset):].lstrip()
+        if rest.startswith('async'):
+            rest = rest[5:].lstrip()
+        if not rest[4:].lstrip().startswith('('):
+            return
+        last = node.items[-1]
+        last = last.optional_vars or last.context_expr
+        if self._next_char(last.end_lineno, last.end_col_offset) == ')':
+            raise UnsupportedSyntax('parenthesized context managers')
+
+    def _next_char(self, lineno: int, col_offset: int) -> str:
+        index = self._column(lineno, col_offset)
+        lines = self.lines
+        while lineno <= len(lines):
+            line = lines[lineno - 1]
+            while index < len(line):
+                char = line[index]
+                if char == '#' or char == '\\' or char == '\n':
+                    break
+                if not char.isspace() and char != ',':
+                    return char
+                index += 1
+            lineno += 1
+            index = 0
+        return ''
+
+    def _expressions(self, node: ast.AST, function: Optional[_Function]):
+        """Find yields and unsupported syntax in expressions of node."""
+        stack = [node]
+        pop = stack.pop
+        push = stack.append
+        extend = stack.extend
+        while stack:
+            node = pop()
+            node_type = type(node)
+            fields = _CHILD_FIELDS.get(node_type)
+            if fields is None:
+                fields = _child_fields(node_type)
+            if node_type in _CHECKED_TYPES:
+                if node_type is ast.Lambda:
+                    self._expressions(node.args, None)
+                    self._expressions(node.body, None)
+                    continue
+                if node_type is ast.Subscript:
+                    if type(node.slice) is ast.Tuple and any(
+                            type(element) is ast.Starred
+                            for element in node.slice.elts):
+                        raise UnsupportedSyntax('starred subscript')
+                elif node_type is ast.arg:
+                    if type(node.annotation) is ast.Starred:
+                        raise UnsupportedSyntax('starred annotation')
+                elif function is not None:
+                    function.yields.append(node)
+            for field in fields:
+                value = getattr(node, field)
+                if type(value) is list:
+                    extend(value)
+                elif value is not None:
+                    push(value)
+
+    def _column(self, lineno: int, col_offset: int) -> int:
+        """Convert UTF-8 byte offset of ast to index in line."""
+        line = self.lines[lineno - 1]
+        if line.isascii():
+            return col_offset
+        return len(line.encode()[:col_offset].decode())
+
+    def _segment(self, lineno: int, col_offset: int, end_lineno: int,
+                 end_col_offset: int) -> str:
+        start = self._column(lineno, col_offset)
+        end = self._column(end_lineno, end_col_offset)
+        if lineno == end_lineno:
+            return self.lines[lineno - 1][start:end]
+        return ''.join([self.lines[lineno - 1][start:]] +
+                       self.lines[lineno:end_lineno - 1] +
+                       [self.lines[end_lineno - 1][:end]])
+
+    def _leaf(self, token: Token) -> Tuple[Any, ...]:
+        """Return parso leaves of token."""
+        kind, value, _ = token
+        if kind == 'name':
+            if value in KEYWORDS:
+                keyword = self._keywords.get(value)
+                if keyword is None:
+                    keyword = self._keywords[value] = Keyword(value, (0, 0))
+                return (keyword,)
+            return (Name(value, (0, 0)),)
+        if kind == 'op':
+            operator = self._operators.get(value)
+            if operator is None:
+                operator = self._operators[value] = Operator(value, (0, 0))
+            return (operator,)
+        if kind == 'number':
+            return (Number(value, (0, 0)),)
+        if _is_fstring(value):
+            return tuple(leaf for part in split_fstring(value)
+                         for leaf in self._leaf(part))
+        return (String(value, (0, 0)),)
+
+    def _token_leaves(self, tokens: Iterable[Token],
+                      kinds: frozenset) -> List[Any]:
+        leaves = []
+        for token in tokens:
+            for leaf in self._leaf(token):
+                if type(leaf) in kinds:
+                    leaves.append(leaf)
+        return leaves
+
+    def _leaves(self, node: ast.AST, kinds: frozenset) -> List[Any]:
+        """Return parso leaves of source text of node."""
+        return self._token_leaves(tokenize_text(self._segment(
+            node.lineno, node.col_offset, node.end_lineno,
+            node.end_col_offset)), kinds)
+
+    def _doc(self, body: List[ast.stmt]) -> ParsedDocstring:
+        """Docstring is the first statement if it is single string token."""
+        first = body[0] if body else None
+        if isinstance(first, ast.Expr) and \
+                isinstance(first.value, ast.Constant) and \
+                isinstance(first.value.value, (str, bytes)):
+            leaves = self._leaves(first, ALL_LEAVES)
+            if len(leaves) == 1 and isinstance(leaves[0], String):
+                return norm_doc(leaves[0].value)
+        return norm_doc('')
+
+    def _header(self, node: ast.AST) -> Tuple[str, List[Token]]:
+        """Return source text of header and its tokens up to body."""
+        body = node.body[0]
+        text = self._segment(node.lineno, node.col_offset, body.lineno,
+                             body.col_offset)
+        tokens = []
+        depth = 0
+        lambdas = 0
+        for token in tokenize_text(text):
+            tokens.append(token)
+            kind, value, _ = token
+            if kind == 'op':
+                if value in OPENING:
+                    depth += 1
+                elif value in CLOSING:
+                    depth -= 1
+                elif value == ':' and not depth:
+                    if not lambdas:
+                        break
+                    lambdas -= 1
+            elif kind == 'name' and value == 'lambda':
+                lambdas += not depth
+        return text, tokens
+
+    @staticmethod
+    def _brackets(tokens: List[Token], start: int) -> int:
+        """Return index of bracket closing bracket at start."""
+        depth = 0
+        for index in range(start, len(tokens)):
+            kind, value, _ = tokens[index]
+            if kind == 'op':
+                if value in OPENING:
+                    depth += 1
+                elif value in CLOSING:
+                    depth -= 1
+                    if not depth:
+                        return index
+        raise UnsupportedSyntax('unclosed bracket')
+
+    def _params(self, tokens: List[Token]) -> List[Any]:
+        """Split parameters as parso does, bare * and / are dropped."""
+        leaves = []
+        group: List[Token] = []
+        depth = 0
+        for token in tokens + [None]:
+            if token is not None:
+                group.append(token)
+                kind, value, _ = token
+                if kind == 'op':
+                    if value in OPENING:
+                        depth += 1
+                    elif value in CLOSING:
+                        depth -= 1
+                if depth or value != ',':
+                    continue
+            if not group:
+                continue
+            first = group[0][1]
+            if not (first == '*' and (len(group) == 1 or
+                                      group[1][1] == ',') or
+                    first == '/'):
+                for part in group:
+                    leaves.extend(self._leaf(part))
+            group = []
+        return [leaf for leaf in leaves if type(leaf) in ALL_LEAVES]
+
+    def _function(self, function: _Function) -> ParsedFunction:
+        node = function.node
+        text, tokens = self._header(node)
+        start = next(index for index, token in enumerate(tokens)
+                     if token[1] == '(')
+        end = self._brackets(tokens, start)
+        annotation = ''
+        if tokens[end + 1][1] == '->':
+            annotation = text[tokens[end + 1][2]:tokens[-2][2]]
+        yields = sorted(function.yields,
+                        key=lambda yield_node: (yield_node.lineno,
+                                                yield_node.col_offset))
+        return ParsedFunction(
+            name=ParsedName(node.name),
+            docstring=self._doc(node.body),
+            paramenters=[same_parsed(leaf, leaf.value) for leaf in
+                         self._params(tokens[start + 1:end])],
+            decorators=self._decorators(node),
+            return_annotation=ParsedName('', annotation=annotation),
+            returns=[norm_parts(self._leaves(part, ALL_LEAVES), False)
+                     for part in function.returns],
+            yields=[norm_parts(self._leaves(part, ALL_LEAVES), False)
+                    for part in yields],
+            raises=[norm_parts(self._leaves(part, ALL_LEAVES), False)
+                    for part in function.raises],
+            line=node.lineno)
+
+    def _decorators(self, node: ast.AST) -> List[Any]:
+        """Every decorator is taken with whole lines up to next one."""
+        decorators = []
+        lines = [decorator.lineno for decorator in node.decorator_list]
+        lines.append(node.lineno)
+        for start, end in zip(lines, lines[1:]):
+            leaves = self._token_leaves(tokenize_text(
+                ''.join(self.lines[start - 1:end - 1])), DECORATOR_LEAVES)
+            if not leaves or leaves[0].value != '@':
+                raise UnsupportedSyntax('decorator')
+            decorators.append(norm_decorator(leaves))
+        return decorators
+
+    def _class(self, scope: _Scope) -> ParsedClass:
+        node = scope.node
+        text, tokens = self._header(node)
+        parent_class = None
+        if tokens[2][1] == '(' and tokens[3][1] != ')':
+            end = self._brackets(tokens, 2)
+            names = []
+            for token in tokens[3:end]:
+                names.extend(leaf.value for leaf in self._leaf(token)
+                             if type(leaf) in NAME_LEAVES)
+            parent_class = '.'.join(names)
+        return ParsedClass(name=ParsedName(node.name),
+                           docstring=self._doc(node.body),
+                           parent_class=parent_class,
+                           decorators=self._decorators(node),
+                           variables=[],
+                           methods=[self._function(function)
+                                    for function in scope.functions],
+                           line=node.lineno)
+
+
+def extract_source_ast(code: str, file_name: Path, digest: str = '',
+                       timings: Optional[Timings] = None,
+                       extraction: str = 'full') -> ParsedModule:
+    """
+    Extract parsed module from source code of file with stdlib ast.
+
+    Raise SyntaxError if code can not be parsed or can not be extracted
+    exactly as parso based parser does.
+    """
+    if sys.version_info < (3, 8):
+        raise UnsupportedSyntax('ast parser requires python 3.8')
+    if code.startswith('\ufeff'):
+        code = code[1:]
+    if '\r' in code and code.count('\r') != code.count('\r\n'):
+        raise UnsupportedSyntax('carriage return without line feed')
+    with measure(timings, 'parse'):
+        tree = ast.parse(code)
+    with measure(timings, 'extract'):
+        return AstExtractor(code, extraction).extract(tree, file_name,
+                                                      digest)
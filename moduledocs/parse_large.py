@@ -0,0 +1,170 @@
+"""
+Streaming extraction of huge modules.
+
+Source file is read through memory map and split to chunks of whole top
+level statements by a scanner of brackets, strings, comments and line
+continuations. Every chunk is parsed on its own and its parts are added
+to module, so only tree of one chunk is alive at a time and memory of
+parsing is bounded by the largest chunk, not by size of file.
+"""
+
+import mmap
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+from .parse import CHUNK_SIZE, decode_source, extract_source, file_digest
+from .parsed_objects import ParsedModule
+from .profiling import Timings, measure
+
+TOKEN = re.compile(rb'[#\'"()\[\]{}\\]')
+STRING_END = {quote: re.compile(rb'\\.|' + quote, re.DOTALL)
+              for quote in [b"'", b'"', b"'''", b'"""']}
+# Top level lines which belong to statement above them
+CLAUSE = re.compile(rb'(else|elif|except|finally)\b')
+LINE_END = frozenset([b'', b'\n', b'\r\n'])
+
+
+def _scan_line(line: bytes, depth: int,
+               quote: bytes) -> Tuple[int, bytes, bool]:
+    """
+    Scan line of source from state of previous lines.
+
+    State is depth of brackets and delimiter of open string, return state
+    after line and whether line ends with backslash continuation.
+    """
+    position = 0
+    while True:
+        if quote:
+            match = STRING_END[quote].search(line, position)
+            if match is None:
+                if len(quote) == 1 and position != len(line):
+                    quote = b''  # Not closed string is syntax error
+                return depth, quote, False
+            position = match.end()
+            if match.group() == quote:
+                quote = b''
+            continue
+        match = TOKEN.search(line, position)
+        if match is None:
+            return depth, quote, False
+        char = match.group()
+        position = match.end()
+        if char == b'#':
+            return depth, quote, False
+        if char == b'\\':
+            if line[position:] in LINE_END:
+                return depth, quote, True
+        elif char in b'([{':
+            depth += 1
+        elif char in b')]}':
+            depth = max(depth - 1, 0)
+        elif line[position:position + 2] == char * 2:
+            quote = char * 3
+            position += 2
+        else:
+            quote = char
+
+
+def top_level_chunks(data: Any,
+                     chunk_size: int = CHUNK_SIZE
+                     ) -> Iterator[Tuple[int, int, int]]:
+    """
+    Split source bytes to chunks of whole top level statements.
+
+    Yield start and end offset and number of first line of every chunk,
+    chunk ends at the first statement after chunk_size bytes. Decorators
+    stay with their definitions, else, except and similar clauses with
+    their statements.
+    """
+    start = position = 0
+    first_line = line_number = 1
+    depth = 0
+    quote = b''
+    continued = decorated = started = False
+    size = len(data)
+    while position < size:
+        end = data.find(b'\n', position)
+        end = size if end < 0 else end + 1
+        if not (depth or quote or continued):
+            first = data[position:position + 1]
+            if first not in b' \t\x0c\r\n#':
+                if started and position - start >= chunk_size and \
+                        not decorated and not CLAUSE.match(data, position):
+                    yield start, position, first_line
+                    start, first_line = position, line_number
+                decorated = first == b'@'
+                started = True
+        depth, quote, continued = _scan_line(data[position:end], depth,
+                                             quote)
+        position = end
+        line_number += 1
+    if start < size or size == 0:
+        yield start, size, first_line
+
+
+@contextmanager
+def map_source(file_name: Path) -> Iterator[Any]:
+    """Map source file to memory read only, empty file gives b''."""
+    with open(file_name.absolute(), 'rb') as file:
+        if not file.seek(0, 2):
+            yield b''
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def _shift_lines(module: ParsedModule, offset: int):
+    for parsed_class in module.classes:
+        parsed_class.line += offset
+        for method in parsed_class.methods:
+            method.line += offset
+    for function in module.functions:
+        function.line += offset
+
+
+def iter_module_parts(file_name: Path, digest: str = '',
+                      timings: Optional[Timings] = None,
+                      parser: str = 'parso', extraction: str = 'full',
+                      chunk_size: int = CHUNK_SIZE
+                      ) -> Iterator[ParsedModule]:
+    """
+    Extract parsed module of every chunk of file (see top_level_chunks).
+
+    Line numbers are numbers in file, only docstring of the first part is
+    docstring of module. Parser and extraction are passed to
+    extract_source, so with "auto" only chunk which ast can not extract
+    is parsed by parso.
+    """
+    with map_source(file_name) as data:
+        for start, end, first_line in top_level_chunks(data, chunk_size):
+            with measure(timings, 'read'):
+                code = decode_source(data[start:end])
+            part = extract_source(code, file_name, digest, timings, parser,
+                                  extraction)
+            _shift_lines(part, first_line - 1)
+            yield part
+
+
+def extract_large(file_name: Path, timings: Optional[Timings] = None,
+                  parser: str = 'parso', extraction: str = 'full',
+                  chunk_size: int = CHUNK_SIZE) -> ParsedModule:
+    """
+    Extract parsed module from huge file chunk by chunk.
+
+    Result is the same as result of extract for valid code, parser
+    recovers from invalid code only within its chunk.
+    """
+    with measure(timings, 'read'):
+        digest = file_digest(file_name)
+    module = None
+    for part in iter_module_parts(file_name, digest, timings, parser,
+                                  extraction, chunk_size):
+        if module is None:
+            module = part
+            continue
+        module.imports.extend(part.imports)
+        module.statements.extend(part.statements)
+        module.classes.extend(part.classes)
+        module.functions.extend(part.functions)
+    return module  # type: ignore
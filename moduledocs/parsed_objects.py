@@ -1,11 +1,42 @@
 """Objects that can be handled by documentation builder class."""
 
 from dataclasses import dataclass
-from typing import List, Union, Any
+from typing import List, Union, Any, Dict, ClassVar, Callable, Iterator,\
+    Optional, Tuple
 from pathlib import Path
+from sys import intern
 
 
-@dataclass
+class _Interned:
+    """
+    Mixin for immutable token which is created once for every value.
+
+    Operators and keywords are repeated millions of times in large code
+    base, so every one of them is the same object.
+    """
+
+    __slots__ = ()
+    _instances: ClassVar[Dict[str, Any]]
+
+    def __init_subclass__(cls, **kwargs):
+        """Give every token class own table of instances."""
+        super().__init_subclass__(**kwargs)
+        cls._instances = {}
+
+    def __new__(cls, value: str):
+        """Return existing token with the same value if any."""
+        instance = cls._instances.get(value)
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instances[value] = instance
+        return instance
+
+    def __reduce__(self):
+        """Unpickle and copy as interned token."""
+        return type(self), (getattr(self, 'value'),)
+
+
+@dataclass(init=False)
 class ParsedName:
     """
     Parsed name.
@@ -15,31 +46,39 @@ class ParsedName:
     problem of post-processing imports or expressions.
     """
 
+    __slots__ = ('value', 'annotation')
     value: str
-    annotation: str = ''
+    annotation: str
 
+    def __init__(self, value: str, annotation: str = ''):
+        """Create parsed name, value string is interned."""
+        self.value = intern(value)
+        self.annotation = annotation
 
-@dataclass
-class ParsedOperator:
+
+@dataclass(frozen=True)
+class ParsedOperator(_Interned):
     """
     Parsed operator.
 
     Used for store code lines as it is it code. Solves the problem of
-    post-processing imports or expressions.
+    post-processing imports or expressions. Interned, so it is immutable.
     """
 
+    __slots__ = ('value',)
     value: str
 
 
-@dataclass
-class ParsedKeyword:
+@dataclass(frozen=True)
+class ParsedKeyword(_Interned):
     """
     Parsed keyword.
 
     Used for store code lines as it is it code. Solves the problem of
-    post-processing imports or expressions.
+    post-processing imports or expressions. Interned, so it is immutable.
     """
 
+    __slots__ = ('value',)
     value: str
 
 
@@ -51,6 +90,7 @@ class ParsedLiteral:
     Used for difine "strings", numbers as 1 or 2.4.
     """
 
+    __slots__ = ('value',)
     value: str
 
 
@@ -137,9 +177,15 @@ class ParsedDecorator:
     factory_parameters: List[Any]  # TODO parsed arguments
 
 
+def _space_param(code: str) -> str:
+    code = code.replace(',', ', ')
+    code = code.replace(':', ': ')
+    return code.replace('=', ' = ')
+
+
 @dataclass
 class ParsedFunction:
-    """Parsed function or method."""
+    """Parsed function or method, line is line number of def keyword."""
 
     name: ParsedName
     docstring: ParsedDocstring
@@ -149,13 +195,57 @@ class ParsedFunction:
     returns: List[Any]
     yields: List[Any]
     raises: List[Any]
+    line: int = 0
+
+    def annotation_parts(self) -> Iterator[Tuple[str, bool]]:
+        """
+        Split parameters to code parts.
+
+        Every part is pair of code and flag which is True for annotation
+        (colon and code after it up to next comma or equal sign).
+        """
+        depth = 0
+        annotation = default = False
+        part: List[str] = []
+        for parameter in self.paramenters:
+            value = parameter.value
+            if isinstance(parameter, ParsedOperator):
+                if value in '([{':
+                    depth += 1
+                elif value in ')]}':
+                    depth -= 1
+                elif depth == 0 and value in ':,=' and not (
+                        default and value == ':'):
+                    if annotation or value == ':':
+                        yield ''.join(part), annotation
+                        part = []
+                    annotation = value == ':'
+                    default = value == '='
+            part.append(value)
+        if part:
+            yield ''.join(part), annotation
+
+    def annotations(self) -> List[str]:
+        """Return annotations of parameters and return annotation."""
+        annotations = [code[1:] for code, annotation
+                       in self.annotation_parts() if annotation]
+        if self.return_annotation.annotation:
+            annotations.append(self.return_annotation.annotation)
+        return annotations
+
+    def code_param(self, convert: Optional[Callable[[str, bool], str]] = None
+                   ) -> str:
+        """
+        Return code recreation for parsed function parameters.
 
-    def code_param(self) -> str:
-        """Return code recreation for parsed function parameters."""
-        code = ''.join([p.value for p in self.paramenters])
-        code = code.replace(',', ', ')
-        code = code.replace(':', ': ')
-        code = code.replace('=', ' = ')
+        If convert is given, every part of annotation_parts is spaced and
+        then passed through it with its annotation flag.
+        """
+        if convert is None:
+            code = _space_param(''.join([p.value for p in self.paramenters]))
+        else:
+            code = ''.join([convert(_space_param(part), annotation)
+                            for part, annotation in self.annotation_parts()])
         code = '({})'.format(code)
         return code
     # TODO Parse or not nested class or func
@@ -163,7 +253,7 @@ class ParsedFunction:
 
 @dataclass
 class ParsedClass:
-    """Parsed class."""
+    """Parsed class, line is line number of class keyword."""
 
     name: ParsedName
     docstring: ParsedDocstring
@@ -171,12 +261,17 @@ class ParsedClass:
     decorators: List[ParsedDecorator]
     variables: List[ParsedStatement]
     methods: List[ParsedFunction]
+    line: int = 0
     # TODO Parse or not nested class
 
 
 @dataclass
 class ParsedModule:
-    """Parsed module."""
+    """
+    Parsed module.
+
+    Digest is sha256 of module source file, empty if unknown.
+    """
 
     name: ParsedName
     path: Path
@@ -185,3 +280,4 @@ class ParsedModule:
     statements: List[ParsedStatement]
     classes: List[ParsedClass]
     functions: List[ParsedFunction]
+    digest: str = ''
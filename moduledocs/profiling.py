@@ -0,0 +1,179 @@
+"""Instrumentation of documentation build phases."""
+
+import json
+import sys
+import time
+from cProfile import Profile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore
+
+Timings = Dict[str, Tuple[float, float]]
+
+
+class measure:
+    """
+    Context manager adding wall and CPU time of block to timings.
+
+    Does nothing if timings is None.
+    """
+
+    __slots__ = ('timings', 'phase', 'wall', 'cpu')
+
+    def __init__(self, timings: Optional[Timings], phase: str):
+        """Measure phase into timings."""
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        """Start timers."""
+        if self.timings is not None:
+            self.wall = time.perf_counter()
+            self.cpu = time.process_time()
+
+    def __exit__(self, *exc_info):
+        """Stop timers and add result."""
+        timings = self.timings
+        if timings is not None:
+            wall, cpu = timings.get(self.phase, (0.0, 0.0))
+            timings[self.phase] = (
+                wall + time.perf_counter() - self.wall,
+                cpu + time.process_time() - self.cpu)
+
+
+class Instrumentation:
+    """
+    Hook points around build phases.
+
+    Base class does nothing, it is used when build is not profiled.
+    """
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Wrap block of phase."""
+        yield
+
+    def iterate(self, name: str, items: Iterable) -> Iterator:
+        """Wrap iterator, time of getting every item belongs to phase."""
+        return iter(items)
+
+    @contextmanager
+    def extraction(self) -> Iterator[None]:
+        """Wrap extraction of file in current process."""
+        yield
+
+    def file(self, path: Path, timings: Timings):
+        """Receive timings of phases of single file."""
+
+    def shared(self, name: str, stats: Dict[str, float]):
+        """Receive hits and misses of content sharing (see ContentShare)."""
+
+
+class Profiler(Instrumentation):
+    """
+    Instrumentation collecting build profile.
+
+    Collects wall and CPU time of every phase, time of every file, peak
+    memory, hit rates of deduplication of extraction and rendering and
+    optionally cProfile statistics of extraction.
+    """
+
+    def __init__(self, slowest: int = 10, cprofile: str = ''):
+        """Create profiler reporting slowest files."""
+        self.slowest = slowest
+        self.phases: Timings = {}
+        self.files: Dict[str, Timings] = {}
+        self.shares: Dict[str, Dict[str, float]] = {}
+        self.cprofile = Profile() if cprofile else None
+        self.cprofile_path = cprofile
+        self.started = (time.perf_counter(), time.process_time())
+
+    def phase(self, name: str) -> measure:
+        """Wrap block of phase."""
+        return measure(self.phases, name)
+
+    def iterate(self, name: str, items: Iterable) -> Iterator:
+        """Wrap iterator, time of getting every item belongs to phase."""
+        iterator = iter(items)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    @contextmanager
+    def extraction(self) -> Iterator[None]:
+        """Wrap extraction of file in current process."""
+        if self.cprofile is None:
+            yield
+            return
+        self.cprofile.enable()
+        try:
+            yield
+        finally:
+            self.cprofile.disable()
+
+    def file(self, path: Path, timings: Timings):
+        """Receive timings of phases of single file."""
+        self.files[str(path)] = timings
+        for name, (wall, cpu) in timings.items():
+            total_wall, total_cpu = self.phases.get(name, (0.0, 0.0))
+            self.phases[name] = (total_wall + wall, total_cpu + cpu)
+
+    def shared(self, name: str, stats: Dict[str, float]):
+        """Receive hits and misses of content sharing, they are summed."""
+        total = self.shares.setdefault(name, {'hits': 0, 'misses': 0})
+        total['hits'] += stats['hits']
+        total['misses'] += stats['misses']
+        lookups = total['hits'] + total['misses']
+        total['rate'] = total['hits'] / lookups if lookups else 0.0
+
+    @staticmethod
+    def peak_memory() -> Dict[str, Optional[int]]:
+        """Return peak resident memory of process and workers in bytes."""
+        if resource is None:
+            return {'self': None, 'children': None}
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        scale = 1 if sys.platform == 'darwin' else 1024
+        usage = [resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss]
+        return {'self': usage[0] * scale, 'children': usage[1] * scale}
+
+    def report(self) -> dict:
+        """Return profile as JSON compatible dictionary."""
+        def total(timings: Timings) -> float:
+            return sum(wall for wall, _ in timings.values())
+
+        slowest: List[Tuple[str, Timings]] = sorted(
+            self.files.items(), key=lambda item: total(item[1]),
+            reverse=True)[:self.slowest]
+        return {
+            'total': {'wall': time.perf_counter() - self.started[0],
+                      'cpu': time.process_time() - self.started[1]},
+            'phases': {name: {'wall': wall, 'cpu': cpu}
+                       for name, (wall, cpu) in self.phases.items()},
+            'peak_memory': self.peak_memory(),
+            'dedup': self.shares,
+            'files': {path: {name: wall for name, (wall, _) in
+                             timings.items()}
+                      for path, timings in self.files.items()},
+            'slowest': [dict({'path': path, 'wall': total(timings)},
+                             **{name: wall for name, (wall, _) in
+                                timings.items()})
+                        for path, timings in slowest],
+        }
+
+    def dump(self, report_path: Optional[Path]):
+        """Write JSON report if path is passed and cProfile statistics."""
+        if report_path is not None:
+            with open(report_path, 'w') as file:
+                json.dump(self.report(), file, indent=1)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(self.cprofile_path)
@@ -0,0 +1,260 @@
+"""
+Local documentation server.
+
+Pages are extracted and rendered only when they are requested, parsing
+and rendering run in a process pool, so the event loop keeps answering
+other requests. Rendered pages are kept in memory bounded LRU cache keyed
+by modification time and size of source file, page of touched but
+unchanged file is revalidated by content hash without parsing.
+"""
+
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+from .discovery import Finder
+from .index_tree import INDEX_NAME, build_tree, group_paths, index_pages,\
+    is_index_key
+from .parse import read_source, decode_source, source_digest,\
+    extract_source
+
+DEFAULT_PAGE_CACHE_SIZE = 64 * 1024 * 1024
+CONTENT_TYPES = {'.md': 'text/plain; charset=utf-8',
+                 '.html': 'text/html; charset=utf-8',
+                 '.json': 'application/json'}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error'}
+# Modification time in nanoseconds and size of source file
+Stamp = Tuple[int, int]
+# Stamp, digest of source and rendered page
+PageEntry = Tuple[Stamp, str, bytes]
+
+_builders: Dict[str, Any] = {}
+
+
+def render_page(path: Path, style: str, parser: str = 'auto',
+                extraction: str = 'full',
+                digest: str = '') -> Tuple[str, Optional[bytes]]:
+    """
+    Extract and render source file, it is called in worker process.
+
+    Return digest of source and UTF-8 encoded page, page is None if digest
+    equals passed one.
+    """
+    data = read_source(path)
+    current = source_digest(data)
+    if current == digest:
+        return current, None
+    builder = _builders.get(style)
+    if builder is None:
+        from .cli import load_builder
+        builder = _builders[style] = load_builder(style)()
+        builder.setting()
+    module = extract_source(decode_source(data), path, current,
+                            parser=parser, extraction=extraction)
+    return current, builder.feed(module).encode('utf-8')
+
+
+class PageCache:
+    """
+    LRU cache of rendered pages.
+
+    When total size of pages exceeds max_size least recently used pages
+    are dropped, page larger than max_size is not kept at all.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_PAGE_CACHE_SIZE):
+        """Create empty cache."""
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries: 'OrderedDict[str, PageEntry]' = OrderedDict()
+
+    def get(self, key: str, stamp: Stamp) -> Optional[bytes]:
+        """Return page if it was rendered from source with stamp."""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != stamp:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[2]
+
+    def entry(self, key: str) -> Optional[PageEntry]:
+        """Return entry of page without marking it used."""
+        return self.entries.get(key)
+
+    def put(self, key: str, stamp: Stamp, digest: str, page: bytes):
+        """Store page and drop least recently used pages above max_size."""
+        self.discard(key)
+        if len(page) > self.max_size:
+            return
+        self.entries[key] = (stamp, digest, page)
+        self.size += len(page)
+        while self.size > self.max_size:
+            _, (_, _, dropped) = self.entries.popitem(last=False)
+            self.size -= len(dropped)
+
+    def discard(self, key: str):
+        """Remove page if it is cached."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+
+class DocsServer:
+    """
+    HTTP server of documentation of input directory.
+
+    Page of module "a/b.py" (relative to input directory) is served at
+    "/a/b.py" plus extension of style, index pages of directories are built
+    from files found by finder on every request, top level one is served
+    at "/" too. Concurrent requests of the same page wait for one render.
+    """
+
+    def __init__(self, input_path: Path, style: str = 'md', jobs: int = 0,
+                 cache_size: int = DEFAULT_PAGE_CACHE_SIZE,
+                 finder: Optional[Finder] = None, parser: str = 'auto',
+                 extraction: str = 'full'):
+        """Create server, jobs is number of worker processes (0 for all)."""
+        from .cli import load_builder
+        self.input_path = Path(input_path)
+        self.style = style
+        self.builder = load_builder(style)()
+        self.builder.setting()
+        self.jobs = jobs
+        self.cache = PageCache(cache_size)
+        self.finder = finder or Finder()
+        self.parser = parser
+        self.extraction = extraction
+        self.pending: Dict[str, 'asyncio.Future[bytes]'] = {}
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    async def start(self, host: str = '127.0.0.1',
+                    port: int = 8000) -> asyncio.AbstractServer:
+        """
+        Start worker pool and listening server.
+
+        Workers are spawned, forked ones would inherit sockets of open
+        connections and keep them open after server closes them.
+        """
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.jobs or None,
+            mp_context=multiprocessing.get_context('spawn'))
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        """Stop worker pool."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def listing(self) -> List[str]:
+        """Return paths of found modules relative to input directory."""
+        if not self.input_path.is_dir():
+            return [self.input_path.name]
+        return [python_file.relative_to(self.input_path).as_posix()
+                for python_file in self.finder.find(self.input_path)]
+
+    def source(self, key: str) -> Optional[Path]:
+        """Return source file of page key, None if it is not served."""
+        relative = PurePosixPath(key)
+        if relative.suffix != '.py' or relative.is_absolute() or \
+                '..' in relative.parts or '' in relative.parts:
+            return None
+        if not self.input_path.is_dir():
+            return self.input_path if key == self.input_path.name else None
+        for end in range(1, len(relative.parts) + 1):
+            if self.finder.rules.match('/'.join(relative.parts[:end]),
+                                       end < len(relative.parts)):
+                return None
+        source = self.input_path.joinpath(*relative.parts)
+        return source if source.is_file() else None
+
+    async def index_page(self, key: str) -> Optional[bytes]:
+        """Return index page of key, None if there is no such page."""
+        listing = await asyncio.get_running_loop().run_in_executor(
+            None, self.listing)
+        root = build_tree(group_paths(Path(item) for item in listing))
+        for page in index_pages(root, self.builder.e,
+                                self.builder.index_page_size):
+            if page.path.as_posix() == key:
+                return self.builder.index_page(page).encode('utf-8')
+        return None
+
+    async def page(self, key: str) -> Optional[bytes]:
+        """Return rendered page of key, None if there is no such module."""
+        source = self.source(key)
+        if source is None:
+            return None
+        stat = source.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        page = self.cache.get(key, stamp)
+        if page is not None:
+            return page
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(key, source, stamp))
+            self.pending[key] = task
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _render(self, key: str, source: Path, stamp: Stamp) -> bytes:
+        entry = self.cache.entry(key)
+        digest, page = await asyncio.get_running_loop().run_in_executor(
+            self.executor, render_page, source, self.style,
+            self.parser, self.extraction, entry[1] if entry else '')
+        if page is None:
+            page = entry[2]  # type: ignore
+        self.cache.put(key, stamp, digest, page)
+        return page
+
+    async def respond(self, target: str) -> Tuple[int, str, bytes]:
+        """Return status, content type and body for request path."""
+        path = unquote(urlsplit(target).path)
+        extension = self.builder.e
+        if path == '/':
+            path = '/' + INDEX_NAME + extension
+        try:
+            if path.endswith(extension):
+                key = path[1:-len(extension)]
+                if is_index_key(key):
+                    page = await self.index_page(key)
+                else:
+                    page = await self.page(key)
+                if page is not None:
+                    return 200, CONTENT_TYPES[extension], page
+        except Exception as error:
+            return 500, CONTENT_TYPES['.md'], 'Can not render {}: {}\n'.format(
+                path, error).encode('utf-8')
+        return 404, CONTENT_TYPES['.md'], 'No page {}\n'.format(
+            path).encode('utf-8')
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter):
+        """Answer single HTTP request and close connection."""
+        try:
+            request = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():
+                pass
+            if len(request) != 3:
+                status, content_type, body = 400, CONTENT_TYPES['.md'], b''
+            elif request[0] not in ('GET', 'HEAD'):
+                status, content_type, body = 405, CONTENT_TYPES['.md'], b''
+            else:
+                status, content_type, body = await self.respond(request[1])
+            head = 'HTTP/1.0 {} {}\r\nContent-Type: {}\r\n' \
+                'Content-Length: {}\r\nConnection: close\r\n\r\n'.format(
+                    status, REASONS[status], content_type, len(body))
+            writer.write(head.encode('latin-1'))
+            if request[:1] != ['HEAD']:
+                writer.write(body)
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,159 @@
+"""
+Sharded builds.
+
+Every shard extracts and renders a stable part of modules and writes
+partial manifest, merge_shards writes index and symbol files from partial
+manifests of all shards without parsing. Merged output is the same as
+output of build in one piece.
+"""
+
+import json
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+from .index_tree import group_paths
+from .output import OutputWriter, SaveReport
+from .symbols import Symbol, SymbolIndex, SYMBOLS_NAME, SEARCH_NAME,\
+    dump_search_index
+
+SHARD_MANIFEST = '.moduledocs.shard-{}-of-{}.json'
+SHARD_PATTERN = '.moduledocs.shard-*-of-*.json'
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parse "i/N" (shard i of N, counted from 1) to pair of numbers."""
+    try:
+        index, count = [int(number) for number in shard.split('/')]
+    except ValueError:
+        raise ValueError('Shard must be "i/N", not {!r}'.format(shard))
+    if not 1 <= index <= count:
+        raise ValueError('Shard {} is not between 1 and {}'.format(
+            index, count))
+    return index, count
+
+
+def shard_of(path: Path, base: Path, count: int) -> int:
+    """
+    Return shard of python file counted from 1.
+
+    Shard depends only on path relative to input directory, so it is the
+    same on every machine.
+    """
+    relative = path.relative_to(base).as_posix() if path != base else \
+        path.name
+    digest = sha256(relative.encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def split_shard(paths: List[Path], base: Path, index: int,
+                count: int) -> Tuple[List[Path], List[Path]]:
+    """Split paths to paths of shard and paths of other shards."""
+    own: List[Path] = []
+    others: List[Path] = []
+    for path in paths:
+        (own if shard_of(path, base, count) == index else others).append(path)
+    return own, others
+
+
+class ListFinder:
+    """Finder of already found python files."""
+
+    def __init__(self, paths: List[Path]):
+        """Create finder of paths."""
+        self.paths = paths
+
+    def find(self, base: Path) -> Iterator[Path]:
+        """Return paths in the same order."""
+        return iter(self.paths)
+
+
+def partial_data(order: Dict[str, int], paths: List[str],
+                 symbols: Any) -> Dict[str, Any]:
+    """
+    Return extra data of partial manifest.
+
+    Order is position of every module path in whole build, paths are
+    modules of shard. Symbols (SymbolIndex) are saved as rows for modules
+    of shard.
+    """
+    data: Dict[str, Any] = {'order': {path: order[path] for path in paths}}
+    if symbols is not None:
+        shard_paths = set(Path(path).as_posix() for path in paths)
+        data['symbols'] = [
+            [symbol.name, symbol.module, symbol.path, symbol.kind,
+             symbol.line, symbol.anchor]
+            for symbol in symbols.symbols if symbol.path in shard_paths]
+    return data
+
+
+def load_shards(docs_path: Path, count: int = 0) -> List[Dict[str, Any]]:
+    """
+    Load partial manifests of every shard in docs_path.
+
+    If count is zero, it is taken from manifests. Raise ValueError if any
+    shard is missing or shards were built with different settings.
+    """
+    manifests: Dict[int, Dict[int, Path]] = {}
+    for path in docs_path.glob(SHARD_PATTERN):
+        numbers = path.name[len('.moduledocs.shard-'):-len('.json')]
+        index, _, total = numbers.partition('-of-')
+        manifests.setdefault(int(total), {})[int(index)] = path
+    if not count:
+        if len(manifests) != 1:
+            raise ValueError('Expected partial manifests of one build in '
+                             '{}, found shard counts: {}'.format(
+                                 docs_path, sorted(manifests) or 'none'))
+        count = next(iter(manifests))
+    found = manifests.get(count, {})
+    missing = [index for index in range(1, count + 1) if index not in found]
+    if missing:
+        raise ValueError('Missing partial manifests of shards {} of {}'.format(
+            ', '.join(map(str, missing)), count))
+    shards = []
+    for index in range(1, count + 1):
+        with open(found[index]) as file:
+            shards.append(json.load(file))
+    if len(set(shard.get('settings') for shard in shards)) != 1:
+        raise ValueError('Shards were built with different settings')
+    return shards
+
+
+def merge_shards(docs_path: Path, builder: Any,
+                 count: int = 0) -> SaveReport:
+    """
+    Write index pages and symbol files of sharded build.
+
+    Builder (BaseBuilder) has to have the same settings as builders of
+    shards. Files are rewritten only if they changed.
+    """
+    shards = load_shards(docs_path, count)
+    settings = shards[0]['settings']
+    if not settings.startswith(builder.signature() + ':'):
+        raise ValueError('Shards were built with different builder settings')
+    order: Dict[str, int] = {}
+    for shard in shards:
+        order.update(shard['order'])
+    paths = sorted(order, key=order.__getitem__)
+    writer = OutputWriter(1)
+    if builder.i:
+        for index_path, index_text in builder.index_pages(
+                group_paths(Path(path) for path in paths)):
+            writer.write(builder.output_path(docs_path, index_path),
+                         index_text)
+    report = writer.close()
+    if any('symbols' in shard for shard in shards):
+        rows = [row for shard in shards for row in shard.get('symbols', ())]
+        positions = {Path(path).as_posix(): position
+                     for path, position in order.items()}
+        rows.sort(key=lambda row: positions[row[2]])
+        symbols = SymbolIndex()
+        symbols.extend(Symbol(*row) for row in rows)
+        docs_path.mkdir(parents=True, exist_ok=True)
+        symbols.save(docs_path / SYMBOLS_NAME)
+        writer = OutputWriter(1)
+        writer.write(docs_path / SEARCH_NAME,
+                     dump_search_index(symbols.search_index(builder.e)))
+        written = writer.close()
+        report.written += written.written
+        report.skipped += written.skipped
+    return report
@@ -0,0 +1,134 @@
+"""
+Content addressed sharing within a run.
+
+Many trees have identical files (vendored copies, generated stubs, copied
+templates). Their parsed modules and rendered pages are shared, only the
+first file with given content is parsed and rendered.
+"""
+
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_SHARE_SIZE = 64 * 1024 * 1024
+
+
+def duplicate_keys(paths: Iterable[Path],
+                   key: Callable[[Path], str]) -> Dict[Path, str]:
+    """
+    Return content key of every file which content is not unique.
+
+    Only files of the same size as another file are read by key, unique
+    files are only stat. Files which can not be read are left out.
+    """
+    sizes: Dict[int, List[Path]] = {}
+    for path in paths:
+        try:
+            sizes.setdefault(path.stat().st_size, []).append(path)
+        except OSError:
+            pass
+    keys: Dict[Path, str] = {}
+    for same_size in sizes.values():
+        if len(same_size) < 2:
+            continue
+        groups: Dict[str, List[Path]] = {}
+        for path in same_size:
+            try:
+                groups.setdefault(key(path), []).append(path)
+            except OSError:
+                pass
+        for content_key, group in groups.items():
+            if len(group) > 1:
+                keys.update((path, content_key) for path in group)
+    return keys
+
+
+class Share:
+    """Counter of hits and misses of shared values."""
+
+    def __init__(self):
+        """Create counter."""
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hits, misses and hit rate."""
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'rate': self.hits / total if total else 0.0}
+
+
+class PlannedShare(Share):
+    """
+    Share of values of files with known duplicates.
+
+    Keys come from duplicate_keys, value of key is kept only until the
+    last file with that key takes it, so nothing is kept for unique files.
+    """
+
+    def __init__(self, keys: Dict[Path, str]):
+        """Create share for content keys of paths."""
+        super().__init__()
+        self.keys = keys
+        self.remaining = Counter(keys.values())
+        self.values: Dict[str, Any] = {}
+
+    def get(self, path: Path) -> Optional[Any]:
+        """Return value of file with the same content as path or None."""
+        key = self.keys.get(path)
+        if key is None or key not in self.values:
+            self.misses += 1
+            return None
+        self.hits += 1
+        value = self.values[key]
+        self._taken(key)
+        return value
+
+    def put(self, path: Path, value: Any):
+        """Store value of path if other files have the same content."""
+        key = self.keys.get(path)
+        if key is not None and key not in self.values:
+            self.values[key] = value
+            self._taken(key)
+
+    def _taken(self, key: str):
+        self.remaining[key] -= 1
+        if self.remaining[key] <= 0:
+            self.values.pop(key, None)
+
+
+class ContentShare(Share):
+    """
+    LRU map from content key to shared value.
+
+    Size of every value is passed by caller, when total size exceeds
+    max_size least recently used values are dropped, so memory of streamed
+    build stays bounded.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_SHARE_SIZE):
+        """Create empty share."""
+        super().__init__()
+        self.max_size = max_size
+        self.size = 0
+        self.values: 'OrderedDict[str, Tuple[int, Any]]' = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return value of key or None."""
+        entry = self.values.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.values.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, size: int, value: Any):
+        """Store value and drop least recently used values above max_size."""
+        if key in self.values or size > self.max_size:
+            return
+        self.values[key] = (size, value)
+        self.size += size
+        while self.size > self.max_size:
+            _, (dropped, _) = self.values.popitem(last=False)
+            self.size -= dropped
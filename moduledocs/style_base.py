@@ -1,18 +1,82 @@
 """Base documentation builder class."""
 
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Set
 from pathlib import Path
 from abc import ABC, abstractmethod
+from itertools import tee
+from string import ascii_lowercase
+from . import __version__
 from .parsed_objects import ParsedModule
+from .manifest import Manifest, text_digest
+from .profiling import Instrumentation
+from .output import OutputWriter, SaveReport, SAVE_THREADS, encode_text,\
+    write_if_changed
+from .graph import DependencyGraph
+from .index_tree import IndexPage, INDEX_PAGE_SIZE, build_tree, index_pages
+from .shard import partial_data
+from .share import ContentShare
+from .symbols import Symbol, SymbolIndex, SYMBOLS_NAME, SEARCH_NAME,\
+    DOTTED_NAME, dump_search_index, relative_url
 import warnings
 
 
+class TextWriter:
+    """
+    Buffer of rendered text.
+
+    Chunks passed to write are collected in list and joined once by
+    getvalue, so rendering is linear in size of output. Write is bound
+    list.append, it is the cheapest call for every chunk.
+    """
+
+    __slots__ = ('chunks', 'write')
+
+    def __init__(self):
+        """Create empty buffer."""
+        self.chunks: List[str] = []
+        self.write = self.chunks.append
+
+    def getvalue(self) -> str:
+        """Return whole text of buffer."""
+        return ''.join(self.chunks)
+
+
+def heading_anchor(name: str) -> str:
+    """Return anchor of heading, lowercase letters joined by dashes."""
+    real_link = ['#']
+    for letter in name.lower():
+        if letter == '_' or letter in ascii_lowercase:
+            real_link.append(letter)
+        elif real_link[-1] != '-':
+            real_link.append('-')
+    return ''.join(real_link[1:])
+
+
 class BaseBuilder(ABC):
-    """Abstract class for converting ParsedModule to a special style string."""
+    """
+    Abstract class for converting ParsedModule to a special style string.
+
+    If symbols (SymbolIndex) is set, every module is indexed before the
+    first one is rendered, so pages can link to each other, and the index
+    is saved next to pages. Then incremental build renders again also
+    pages of modules affected by changed ones (see DependencyGraph).
+    Builder of a shard has partial set to position of every module path
+    in whole build, it does not write index and symbol files, they are
+    written by merge_shards from manifest.
+    """
+
+    hooks = Instrumentation()
+    save_threads = SAVE_THREADS
+    index_page_size = INDEX_PAGE_SIZE
+    symbols: Optional[SymbolIndex] = None
+    partial: Optional[Dict[str, int]] = None
+    # Text depends on module only, so modules with the same content share it
+    shares_text = False
 
     def __init__(self):
         """Create builder for parsed module."""
         self.content_table: List[Tuple[str, int]] = []
+        self.links: Set[str] = set()
 
     @abstractmethod
     def setting(self, **kwargs):
@@ -21,43 +85,296 @@ class BaseBuilder(ABC):
         self.i = True
 
     @abstractmethod
-    def index(self, index_items: List[str]) -> str:
-        """Render index as text."""
-        return '\n'.join(index_items)
+    def index_page(self, page: IndexPage) -> str:
+        """Render index page as text."""
+        return '\n'.join(name for name, _ in page.modules)
+
+    def index_pages(self, indexes: Dict[Path, List[Path]]
+                    ) -> Iterator[Tuple[Path, str]]:
+        """
+        Render index pages of module paths grouped by directory.
+
+        Every directory has its own page (split to pages of
+        index_page_size modules), top level page has tree of directories.
+        """
+        root = build_tree(indexes)
+        for page in index_pages(root, self.e, self.index_page_size):
+            yield page.path, self.index_page(page)
+
+    def signature(self) -> str:
+        """Return settings signature, output is reused only if it matches."""
+        return '{}:{}:{}:{}'.format(__version__, type(self).__name__,
+                                    getattr(self, 'e', ''),
+                                    getattr(self, 'i', ''))
+
+    def anchor(self, name: str) -> str:
+        """Return anchor of heading with name, empty if there is none."""
+        return ''
+
+    def feed_key(self, module: ParsedModule) -> str:
+        """
+        Return key of text of module, empty if text can not be shared.
+
+        Modules with the same key within a build share rendered text, so
+        key has to cover everything the text depends on. Without symbols
+        text of builder which shares_text depends on digest and name only.
+        """
+        if not self.shares_text or self.symbols is not None or \
+                not module.digest:
+            return ''
+        return '{}:{}'.format(module.digest, module.name.value)
+
+    def _shared_feed(self, module: ParsedModule, share: ContentShare) -> str:
+        key = self.feed_key(module)
+        if not key:
+            return self.feed(module)
+        text = share.get(key)
+        if text is None:
+            text = self.feed(module)
+            share.put(key, len(text), text)
+        return text
+
+    @staticmethod
+    def _escape(body: str) -> str:
+        return body
+
+    def _link(self, text: str, url: str) -> str:
+        return text
 
-    def build(self, modules: List[ParsedModule]):
-        """Build for parsed module."""
+    def _symbol_link(self, name: str, symbol: Optional[Symbol]) -> str:
+        if symbol is None:
+            return self._escape(name)
+        self.links.add(symbol.path)
+        return self._link(self._escape(name), relative_url(
+            self.module_path, symbol.url(self.e)))
+
+    def _linked(self, code: str) -> str:
+        """Escape code, names of indexed symbols become links."""
+        if self.symbols is None:
+            return self._escape(code)
+        chunks = []
+        position = 0
+        for match in DOTTED_NAME.finditer(code):
+            chunks.append(self._escape(code[position:match.start()]))
+            symbol = self.symbols.resolve(self.module_path, match.group())
+            chunks.append(self._symbol_link(match.group(), symbol))
+            position = match.end()
+        chunks.append(self._escape(code[position:]))
+        return ''.join(chunks)
+
+    def _param_part(self, code: str, annotation: bool) -> str:
+        return self._linked(code) if annotation else self._escape(code)
+
+    def output_path(self, docs_path: Path, path: Path) -> Path:
+        """Return location of rendered file for path."""
+        return Path('{}{}'.format((docs_path / path).absolute(), self.e))
+
+    def build(self, modules: List[ParsedModule],
+              manifest: Optional[Manifest] = None):
+        """
+        Build for parsed module.
+
+        If manifest of previous build is passed, modules with unchanged
+        source are not rendered and index is rendered only when set of
+        modules is changed.
+        """
+        self.texts: List[Tuple[Path, str]] = []
+        self.texts.extend(self._render(modules, manifest))
+
+    def stream(self, modules: Iterable[ParsedModule], docs_path: Path,
+               manifest: Optional[Manifest] = None,
+               context: Iterable[ParsedModule] = ()) -> SaveReport:
+        """
+        Build and save every module before next one is taken.
+
+        Only paths of modules are kept for index, so memory usage does not
+        grow with number of modules. Result is the same as build and save.
+        Context modules (other shards) are only indexed by symbols.
+        """
+        for _ in self._stream_steps(modules, docs_path, manifest, context):
+            pass
+        return self.save_report
+
+    def _stream_steps(self, modules: Iterable[ParsedModule], docs_path: Path,
+                      manifest: Optional[Manifest],
+                      context: Iterable[ParsedModule]) -> Iterator[None]:
+        """Stream, step is yielded after every saved page."""
+        self.texts = []
+        writer = OutputWriter(self.save_threads)
+        try:
+            for path, text in self._render(modules, manifest, context):
+                with self.hooks.phase('save'):
+                    writer.write(self.output_path(docs_path, path), text)
+                yield
+        finally:
+            with self.hooks.phase('save'):
+                self.save_report = writer.close()
+        with self.hooks.phase('save'):
+            self._finish(docs_path, writer)
+
+    def _render(self, modules: Iterable[ParsedModule],
+                manifest: Optional[Manifest],
+                context: Iterable[ParsedModule] = ()
+                ) -> Iterator[Tuple[Path, str]]:
         if not hasattr(self, 'e') or not getattr(self, 'e'):
             warnings.warn('Using default building setting.', RuntimeWarning)
             self.setting()
-        self.texts: List[Tuple[Path, str]] = []
+        self.manifest = manifest
         self.indexes: Dict[Path, List[Path]] = dict()
+        affected: Set[str] = set()
+        share = ContentShare()
+        if self.symbols is not None:
+            modules = list(modules)
+            context = list(context)
+            self.graph = DependencyGraph()
+            indexed = context + modules
+            order = self.partial
+            if order is not None:
+                indexed.sort(key=lambda module: order[str(module.path)])
+            for module in indexed:
+                self.symbols.add(module, self.anchor)
+                self.graph.add(module)
+            if manifest is not None:
+                affected = self._affected(context + modules, manifest)
+                for module in context:
+                    manifest.record_source(str(module.path), module.digest)
         for module in modules:
             module_dir = module.path.parent
             if not self.indexes.get(module_dir):
                 self.indexes[module_dir] = [module.path]
             else:
                 self.indexes[module_dir].append(module.path)
-            module_text = self.feed(module)
-            self.texts.append((module.path, module_text))
-        if hasattr(self, 'i') and self.i:
-            total_index: List[str] = []
-            for folder, index in self.indexes.items():
-                index_str_paths = [str(i) for i in index]
-                total_index.extend(index_str_paths)
-            self.texts.append((Path('index'), self.index(total_index)))
+            if manifest is not None and str(module.path) not in affected \
+                    and manifest.is_fresh(
+                        str(module.path), module.digest,
+                        self.output_path(manifest.docs_path, module.path)):
+                continue
+            self.links = set()
+            with self.hooks.phase('feed'):
+                module_text = self._shared_feed(module, share)
+            if manifest is not None:
+                manifest.record(str(module.path), module.digest, module_text,
+                                self.links)
+            yield module.path, module_text
+        self.hooks.shared('feed', share.stats())
+        if hasattr(self, 'i') and self.i and self.partial is None:
+            with self.hooks.phase('index'):
+                pages = list(self.index_pages(self.indexes))
+            for index_path, index_text in pages:
+                index_digest = text_digest(index_text)
+                if manifest is not None and manifest.is_fresh(
+                        str(index_path), index_digest,
+                        self.output_path(manifest.docs_path, index_path)):
+                    continue
+                if manifest is not None:
+                    manifest.record(str(index_path), index_digest, index_text)
+                yield index_path, index_text
+
+    def _affected(self, modules: List[ParsedModule],
+                  manifest: Manifest) -> Set[str]:
+        """
+        Paths of modules which links may point to changed module.
+
+        Pages whose links resolved to changed module in previous build are
+        affected too, whatever way the name was resolved.
+        """
+        changed = []
+        for module in modules:
+            entry = manifest.previous.get(str(module.path))
+            if not entry or entry[0] != module.digest:
+                changed.append(str(module.path))
+        current = set(str(module.path) for module in modules)
+        for removed in manifest.previous:
+            if removed not in current:
+                self.graph.add_removed(removed)
+                changed.append(removed)
+        affected = self.graph.affected(changed)
+        targets = set(Path(path).as_posix() for path in changed)
+        for path, entry in manifest.previous.items():
+            if len(entry) > 2 and targets.intersection(entry[2]):
+                affected.add(path)
+        return affected
 
     @abstractmethod
     def feed(self, module: ParsedModule):
         """Convert ParsedModule to a string and stores it in self.text."""
         return module.name.value
 
-    def save(self, docs_path: Path):
-        """Save file at location specified on init."""
-        for path, text in self.texts:
-            path = docs_path / path
-            if not path.parent.exists():
-                path.parent.mkdir(parents=True, exist_ok=True)
-            save_path = '{}{}'.format(path.absolute(), self.e)
-            with open(save_path, 'w') as file:
-                file.write(text)
+    def save(self, docs_path: Path) -> SaveReport:
+        """
+        Save file at location specified on init.
+
+        Files with unchanged content are not rewritten. With manifest
+        outputs of removed modules are deleted and manifest is saved for
+        next build. Return numbers of written, skipped and removed files.
+        """
+        with self.hooks.phase('save'):
+            writer = OutputWriter(self.save_threads)
+            try:
+                for path, text in self.texts:
+                    writer.write(self.output_path(docs_path, path), text)
+            finally:
+                self.save_report = writer.close()
+            self._finish(docs_path, writer)
+        return self.save_report
+
+    def _finish(self, docs_path: Path, writer: OutputWriter):
+        manifest = getattr(self, 'manifest', None)
+        if self.partial is not None and manifest is not None:
+            manifest.extra.update(partial_data(
+                self.partial, [str(path) for paths in self.indexes.values()
+                               for path in paths], self.symbols))
+        elif self.symbols is not None:
+            writer.directory(docs_path)
+            self.symbols.save(docs_path / SYMBOLS_NAME)
+            write_if_changed(docs_path / SEARCH_NAME, encode_text(
+                dump_search_index(self.symbols.search_index(self.e))))
+        if manifest is not None:
+            for removed in manifest.removed():
+                self._remove_output(docs_path, Path(removed), writer)
+            manifest.save()
+
+    def _remove_output(self, docs_path: Path, path: Path,
+                       writer: OutputWriter):
+        output = self.output_path(docs_path, path)
+        writer.remove(output)
+        root = docs_path.absolute()
+        folder = output.parent
+        while folder != root and root in folder.parents:
+            try:
+                folder.rmdir()
+            except OSError:
+                break
+            folder = folder.parent
+
+
+def stream_builders(builders: List[BaseBuilder],
+                    modules: Iterable[ParsedModule], docs_paths: List[Path],
+                    manifests: Optional[List[Optional[Manifest]]] = None,
+                    context: Iterable[ParsedModule] = ()
+                    ) -> List[SaveReport]:
+    """
+    Stream the same modules to several builders.
+
+    Modules are taken from iterable once, builders render pages by turns,
+    so only a few modules are held in memory (all with symbols). Every
+    builder saves to its docs path with its manifest.
+    """
+    context = list(context)
+    if manifests is None:
+        manifests = [None] * len(builders)
+    steps = [builder._stream_steps(copy, docs_path, manifest, context)
+             for builder, copy, docs_path, manifest in zip(
+                 builders, tee(modules, len(builders)), docs_paths,
+                 manifests)]
+    try:
+        while steps:
+            for step in list(steps):
+                try:
+                    next(step)
+                except StopIteration:
+                    steps.remove(step)
+    finally:
+        for step in steps:
+            step.close()
+    return [builder.save_report for builder in builders]
@@ -0,0 +1,176 @@
+"""HTML documentation builder class."""
+
+from html import escape
+from typing import List, Tuple
+from .style_base import BaseBuilder, TextWriter, heading_anchor
+from .parsed_objects import ParsedModule, ParsedFunction
+from .index_tree import IndexPage
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{0}</title>
+</head>
+<body>
+"""
+PAGE_TAIL = """</body>
+</html>
+"""
+
+
+class HtmlBuilder(BaseBuilder):
+    """
+    HTML builder for parsed module.
+
+    Page has the same parts as markdown page, headings have ids equal to
+    markdown anchors, so links between styles look the same.
+    """
+
+    shares_text = True
+
+    @staticmethod
+    def _escape(body: str) -> str:
+        return escape(body, False)
+
+    def _link(self, text: str, url: str) -> str:
+        return '<a href="{1}">{0}</a>'.format(text, escape(url))
+
+    def setting(self, include_index: bool = True, **kwargs):
+        """Builder settings for parsed module."""
+        self.e = '.html'
+        self.i = include_index
+
+    def anchor(self, name: str) -> str:
+        """Return id of heading with name."""
+        return heading_anchor(name)
+
+    def _heading(self, body: TextWriter, level: int, name: str):
+        self.content_table.append((name, level))
+        body.write('<h{0} id="{1}">{2}</h{0}>\n'.format(
+            level, self.anchor(name), self._escape(name)))
+
+    def _paragraph(self, body: TextWriter, text: str):
+        body.write('<p>{}</p>\n'.format(text))
+
+    def index_page(self, page: IndexPage) -> str:
+        """Render index page as string."""
+        index_body = TextWriter()
+        title = 'Index of {}'.format(page.title) if page.title else 'Index'
+        if page.count > 1:
+            title += ', page {} of {}'.format(page.number + 1, page.count)
+        index_body.write(PAGE_HEAD.format(self._escape(title)))
+        index_body.write('<h1>{}</h1>\n'.format(self._escape(title)))
+        if page.up:
+            self._paragraph(index_body, self._link('Up', page.up))
+        if page.tree:
+            index_body.write('<h2>Tree</h2>\n')
+            level = 0
+            for depth, name, url, total in page.tree:
+                if depth + 1 > level:
+                    index_body.write('<ul>\n')
+                    level += 1
+                else:
+                    index_body.write('</li>\n')
+                    while level > depth + 1:
+                        index_body.write('</ul></li>\n')
+                        level -= 1
+                index_body.write('<li>{} {}'.format(
+                    self._link(self._escape(name) + '/', url), total))
+            index_body.write('</li>\n')
+            index_body.write('</ul></li>\n' * (level - 1) + '</ul>\n')
+        elif page.directories:
+            index_body.write('<h2>Directories</h2>\n<ul>\n')
+            for name, url, total in page.directories:
+                index_body.write('<li>{} {}</li>\n'.format(
+                    self._link(self._escape(name) + '/', url), total))
+            index_body.write('</ul>\n')
+        if page.modules:
+            index_body.write('<h2>Modules</h2>\n<ul>\n')
+            for name, url in page.modules:
+                index_body.write('<li>{}</li>\n'.format(
+                    self._link(self._escape(name), url)))
+            index_body.write('</ul>\n')
+        links = []
+        if page.previous:
+            links.append(self._link('Previous', page.previous))
+        if page.next:
+            links.append(self._link('Next', page.next))
+        if links:
+            self._paragraph(index_body, ' '.join(links))
+        index_body.write(PAGE_TAIL)
+        return index_body.getvalue()
+
+    def _feed_func(self, body: TextWriter, functions: List[ParsedFunction],
+                   level: int):
+        for function in functions:
+            self._heading(body, level, function.name.value)
+            signature = '<code>{}</code>'.format(
+                function.code_param(self._param_part))
+            if function.return_annotation.annotation:
+                signature += ' -&gt; <code>{}</code>'.format(self._linked(
+                    function.return_annotation.annotation.strip()))
+            self._paragraph(body, signature)
+            if function.docstring.doc:
+                self._docstring(body, function.docstring.doc)
+
+    def _docstring(self, body: TextWriter, doc: str):
+        body.write('<pre>{}</pre>\n'.format(self._escape(doc)))
+
+    def feed(self, module: ParsedModule) -> str:
+        """Convert ParsedModule to a string and return it."""
+        self.module_path = module.path
+        nice_name = module.name.value
+        nice_name = nice_name.replace('_', ' ').replace('  ', '__')  # FIXME
+        nice_name = nice_name.capitalize()
+        body = TextWriter()
+        used: List[str] = []
+        for module_import in module.imports:
+            if module_import.from_module not in used:
+                used.append(module_import.from_module)
+        if used:
+            self._heading(body, 2, 'Require')
+            self._paragraph(body, '<em>{}</em>'.format(
+                self._escape(', '.join(used))))
+        if module.docstring.doc:
+            self._heading(body, 2, 'Docstring')
+            self._docstring(body, module.docstring.doc)
+        self._heading(body, 2, 'Configuration')
+        if module.imports:
+            self._heading(body, 3, 'Imports')
+            for module_import in module.imports:
+                self._paragraph(body, '<code>{}</code>'.format(
+                    self._escape(module_import.code())))
+        if module.statements:
+            self._heading(body, 3, 'Statements')
+            for module_statement in module.statements:
+                self._paragraph(body, '<code>{}</code>'.format(
+                    self._escape(module_statement.code())))
+        if module.classes:
+            self._heading(body, 2, 'Classes')
+            for module_class in module.classes:
+                self._heading(body, 3, module_class.name.value)
+                if self.symbols is not None and module_class.parent_class:
+                    self._paragraph(body, 'Bases: ' + ', '.join([
+                        self._symbol_link(name, symbol) for name, symbol in
+                        self.symbols.split_bases(module.path,
+                                                 module_class.parent_class)]))
+                if module_class.docstring.doc:
+                    self._docstring(body, module_class.docstring.doc)
+                self._feed_func(body, module_class.methods, 4)
+        if module.functions:
+            self._heading(body, 2, 'Functions')
+            self._feed_func(body, module.functions, 3)
+        text = TextWriter()
+        text.write(PAGE_HEAD.format(self._escape(nice_name)))
+        text.write('<h1 id="{}">{}</h1>\n'.format(self.anchor(nice_name),
+                                                  self._escape(nice_name)))
+        text.write('<ul class="contents">\n')
+        for name, level in self.content_table:
+            text.write('<li class="level-{}"><a href="#{}">{}</a></li>\n'
+                       .format(level, self.anchor(name), self._escape(name)))
+        text.write('</ul>\n')
+        text.chunks.extend(body.chunks)
+        text.write(PAGE_TAIL)
+        self.content_table: List[Tuple[str, int]] = []
+        return text.getvalue()
@@ -0,0 +1,96 @@
+"""JSON documentation builder class."""
+
+import json
+from typing import Any, Dict, List
+from .style_base import BaseBuilder
+from .parsed_objects import ParsedModule, ParsedClass, ParsedFunction
+from .index_tree import IndexPage
+from .symbols import DOTTED_NAME, relative_url
+
+
+class JsonBuilder(BaseBuilder):
+    """
+    JSON builder for parsed module.
+
+    Every page is object with the same parts as markdown page, code is
+    recreated as text. With symbols every class and function has links,
+    object of names and urls of pages where they are defined.
+    """
+
+    def setting(self, include_index: bool = True, indent: int = 1,
+                **kwargs):
+        """Builder settings for parsed module."""
+        self.e = '.json'
+        self.i = include_index
+        self.indent = indent
+
+    def index_page(self, page: IndexPage) -> str:
+        """Render index page as object with links to pages."""
+        data: Dict[str, Any] = {
+            'title': page.title, 'page': page.number + 1,
+            'pages': page.count, 'up': page.up, 'previous': page.previous,
+            'next': page.next,
+            'directories': [{'name': name, 'page': url, 'modules': total}
+                            for name, url, total in page.directories],
+            'modules': [{'name': name, 'page': url}
+                        for name, url in page.modules]}
+        if page.tree:
+            data['tree'] = [{'depth': depth, 'name': name, 'page': url,
+                             'modules': total}
+                            for depth, name, url, total in page.tree]
+        return self._dump(data)
+
+    def _dump(self, data: Any) -> str:
+        return json.dumps(data, indent=getattr(self, 'indent', 1),
+                          ensure_ascii=False) + '\n'
+
+    def _links(self, names: List[str]) -> Dict[str, str]:
+        links = {}
+        if self.symbols is not None:
+            for name in names:
+                symbol = self.symbols.resolve(self.module_path, name)
+                if symbol is not None:
+                    self.links.add(symbol.path)
+                    links[name] = relative_url(self.module_path,
+                                               symbol.url(self.e))
+        return links
+
+    def _function(self, function: ParsedFunction) -> Dict[str, Any]:
+        data = {'name': function.name.value, 'line': function.line,
+                'signature': function.code_param(),
+                'returns': function.return_annotation.annotation.strip(),
+                'docstring': function.docstring.doc}
+        if self.symbols is not None:
+            data['links'] = self._links([
+                name for annotation in function.annotations()
+                for name in DOTTED_NAME.findall(annotation)])
+        return data
+
+    def _class(self, parsed_class: ParsedClass) -> Dict[str, Any]:
+        data = {'name': parsed_class.name.value, 'line': parsed_class.line,
+                'bases': parsed_class.parent_class or '',
+                'docstring': parsed_class.docstring.doc,
+                'methods': [self._function(method)
+                            for method in parsed_class.methods]}
+        if self.symbols is not None:
+            data['links'] = self._links([
+                name for name, symbol in self.symbols.split_bases(
+                    self.module_path, parsed_class.parent_class or '')
+                if symbol is not None])
+        return data
+
+    def feed(self, module: ParsedModule) -> str:
+        """Convert ParsedModule to a string and return it."""
+        self.module_path = module.path
+        return self._dump({
+            'name': module.name.value,
+            'path': module.path.as_posix(),
+            'docstring': module.docstring.doc,
+            'imports': [module_import.code()
+                        for module_import in module.imports],
+            'statements': [statement.code()
+                           for statement in module.statements],
+            'classes': [self._class(parsed_class)
+                        for parsed_class in module.classes],
+            'functions': [self._function(function)
+                          for function in module.functions]})
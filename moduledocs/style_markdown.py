@@ -1,15 +1,16 @@
 """Markdown documentation builder class."""
 
-from typing import List, Union, Tuple
-from copy import copy
-from string import ascii_lowercase
-from .style_base import BaseBuilder
+from typing import List, Union, Tuple, Set
+from .style_base import BaseBuilder, TextWriter, heading_anchor
 from .parsed_objects import ParsedModule, ParsedClass
+from .index_tree import IndexPage
 
 
 class MarkdownBuilder(BaseBuilder):
     """Markdown builder for parsed."""
 
+    shares_text = True
+
     @staticmethod
     def _escape(body: str) -> str:
         return body.replace('_', '\\_')
@@ -54,96 +55,133 @@ class MarkdownBuilder(BaseBuilder):
         self.code_multiline = '```{0}```'
         self.horizontal_line = '------'
 
-    def index(self, index_items: List[str]) -> str:
-        """Render index as string."""
-        index_body = ''
-        position = ''
-        for index_item in sorted(index_items):
-            *path, item = index_item.split('/')
-            link = ''
-            if path[-1] != position:
-                index_body += '+ /' + self._line('/'.join(path), self.plain)
-            link += '  + [{0}]({1})'.format(item, index_item + self.e)
-            index_body += self._line(link, self.plain)
-            position = path[-1]
-        return index_body
+    def index_page(self, page: IndexPage) -> str:
+        """Render index page as string."""
+        index_body = TextWriter()
+        title = 'Index of {}'.format(page.title) if page.title else 'Index'
+        if page.count > 1:
+            title += ', page {} of {}'.format(page.number + 1, page.count)
+        index_body.write(self.headings[1].format(self._escape(title)))
+        index_body.write(self.paragraph_indentation)
+        if page.up:
+            index_body.write('[Up]({})\n\n'.format(page.up))
+        if page.tree:
+            index_body.write('## Tree\n\n')
+            for depth, name, url, total in page.tree:
+                index_body.write('{}+ [{}/]({}) {}\n'.format(
+                    '  ' * depth, self._escape(name), url, total))
+            index_body.write('\n')
+        elif page.directories:
+            index_body.write('## Directories\n\n')
+            for name, url, total in page.directories:
+                index_body.write('+ [{}/]({}) {}\n'.format(
+                    self._escape(name), url, total))
+            index_body.write('\n')
+        if page.modules:
+            index_body.write('## Modules\n\n')
+            for name, url in page.modules:
+                index_body.write('+ [{}]({})\n'.format(self._escape(name),
+                                                       url))
+            index_body.write('\n')
+        links = []
+        if page.previous:
+            links.append('[Previous]({})'.format(page.previous))
+        if page.next:
+            links.append('[Next]({})'.format(page.next))
+        if links:
+            index_body.write(' '.join(links) + '\n')
+        return index_body.getvalue()
+
+    def anchor(self, name: str) -> str:
+        """Return anchor of heading with name."""
+        return heading_anchor(name)
 
     def _local_link(self, name: str) -> str:
-        link = copy(name)
-        real_link = '#'
-        for letter in link.lower():
-            if letter == '_' or letter in ascii_lowercase:
-                real_link += letter
-            elif real_link[-1] != '-':
-                real_link += '-'
-        return '[{0}]({1})'.format(self._escape(name), real_link)
+        return '[{0}](#{1})'.format(self._escape(name), self.anchor(name))
+
+    def _link(self, text: str, url: str) -> str:
+        return '[{0}]({1})'.format(text, url)
 
-    def _feed_func(self,
+    def _feed_func(self, body: TextWriter,
                    functions: List[Union[ParsedModule, ParsedClass]],
-                   name_style: str) -> str:
-        body = self.paragraph_indentation
+                   name_style: str):
+        body.write(self.paragraph_indentation)
         for function in functions:
             function_name = function.name.value
-            function_body = self._line(function_name, name_style, False)
-            function_body += self._append(function.code_param(), self.bold)
+            function_body = [
+                self._line(function_name, name_style, False),
+                self.bold.format(function.code_param(self._param_part)) + ' ']
             if function.return_annotation.annotation:
-                function_body += self._append('->', self.plain)
-                function_body += self._append(
-                    function.return_annotation.annotation.strip(),
-                    self.bold
-                )
-            body += self._line(function_body, self.plain, False)
+                function_body.append(self._append('->', self.plain))
+                function_body.append(self.bold.format(self._linked(
+                    function.return_annotation.annotation.strip())) + ' ')
+            body.write(self._line(''.join(function_body), self.plain, False))
             if function.docstring.doc:
-                body += self._line(function.docstring.doc, self.plain)
-            # body += self._line('', self.horizontal_line)
-        return body
+                body.write(self._line(function.docstring.doc, self.plain))
+            # body.write(self._line('', self.horizontal_line))
 
     def feed(self, module: ParsedModule) -> str:
         """Convert ParsedModule to a string and return it."""
+        self.module_path = module.path
         nice_name = module.name.value
         nice_name = nice_name.replace('_', ' ').replace('  ', '__')  # FIXME
         nice_name = nice_name.capitalize()
         title = self._line(nice_name, self.headings[1])
-        body = self.paragraph_indentation
+        body = TextWriter()
+        body.write(self.paragraph_indentation)
         used: List[str] = []
+        used_set: Set[str] = set()
         for module_import in module.imports:
             require = module_import.from_module
-            if require not in used:
+            if require not in used_set:
+                used_set.add(require)
                 used.append(require)
         if used:
-            body += self._line('Require', self.headings[2])
-            body += self._append(', '.join(used), self.italic)
-            body += self.paragraph_indentation
+            body.write(self._line('Require', self.headings[2]))
+            body.write(self._append(', '.join(used), self.italic))
+            body.write(self.paragraph_indentation)
         if module.docstring.doc:
-            body += self._line('Docstring', self.headings[2])
-            body += self._line(module.docstring.doc, self.plain)
-        body += self._line('Configuration', self.headings[2])
+            body.write(self._line('Docstring', self.headings[2]))
+            body.write(self._line(module.docstring.doc, self.plain))
+        body.write(self._line('Configuration', self.headings[2]))
         if module.imports:
-            body += self._line('Imports', self.headings[3])
+            body.write(self._line('Imports', self.headings[3]))
             for module_import in module.imports:
-                body += self._line(module_import.code(), self.code, False)
+                body.write(self._line(module_import.code(), self.code, False))
         if module.statements:
-            body += self._line('Statements', self.headings[3])
+            body.write(self._line('Statements', self.headings[3]))
             for module_statement in module.statements:
-                body += self._line(module_statement.code(), self.code, False)
+                body.write(self._line(module_statement.code(), self.code,
+                                      False))
         if module.classes:
-            body += self._line('Classes', self.headings[2])
+            body.write(self._line('Classes', self.headings[2]))
             for module_class in module.classes:
                 module_class_name = module_class.name.value
-                body += self._line(module_class_name, self.headings[3])
+                body.write(self._line(module_class_name, self.headings[3]))
+                if self.symbols is not None and module_class.parent_class:
+                    bases = ', '.join([
+                        self._symbol_link(name, symbol) for name, symbol in
+                        self.symbols.split_bases(module.path,
+                                                 module_class.parent_class)])
+                    body.write(self._line(self._append('Bases:', self.plain) +
+                                          bases, self.plain, False))
                 if module_class.docstring.doc:
-                    body += self._line(module_class.docstring.doc, self.plain)
+                    body.write(self._line(module_class.docstring.doc,
+                                          self.plain))
                 if module_class.methods:
-                    body += self._feed_func(module_class.methods,
-                                            self.headings[4])
-                # body += self._line('', self.horizontal_line)
+                    self._feed_func(body, module_class.methods,
+                                    self.headings[4])
+                # body.write(self._line('', self.horizontal_line))
         if module.functions:
-            body += self._line('Functions', self.headings[2])
-            body += self._feed_func(module.functions, self.headings[3])
-        content_links = self.paragraph_indentation
+            body.write(self._line('Functions', self.headings[2]))
+            self._feed_func(body, module.functions, self.headings[3])
+        text = TextWriter()
+        text.write(title)
+        text.write(self.paragraph_indentation)
         for content in self.content_table:
-            link_body = '  ' * content[1] + '+ '
-            link_body += self._local_link(content[0])
-            content_links += self._line(link_body, self.plain, False)
+            link_body = '  ' * content[1] + '+ ' + \
+                self._local_link(content[0])
+            text.write(self._line(link_body, self.plain, False))
+        text.chunks.extend(body.chunks)
         self.content_table: List[Tuple[str, int]] = []
-        return title + content_links + body
+        return text.getvalue()
@@ -0,0 +1,360 @@
+"""
+Cross-module index of documented symbols.
+
+Every module, class, method and function of a build is recorded with its
+page and anchor, so names in annotations and parent classes can be turned
+into links to other pages. Index is saved as SQLite database with prefix
+search and as precomputed search index for client side search.
+"""
+
+import json
+import os
+import posixpath
+import re
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from threading import get_ident
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from .parsed_objects import ParsedModule, ParsedImport, ParsedKeyword,\
+    ParsedName, ParsedOperator
+
+SYMBOLS_NAME = 'symbols.sqlite'
+SEARCH_NAME = 'search.json'
+SEARCH_FORMAT = 1
+SEARCH_LIMIT = 20
+# Dotted names in annotation code
+DOTTED_NAME = re.compile(r'[^\W\d]\w*(?:\.[^\W\d]\w*)*')
+# Words of name, "HTTPServer_start2" is "http", "server", "start", "2"
+WORD = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+# Re-exports followed when name is not defined in module
+MAX_ALIASES = 8
+
+
+@dataclass(frozen=True)
+class Symbol:
+    """
+    Documented symbol.
+
+    Name is qualified in module ("Class.method"), module is dotted name of
+    module and path is module path (page of symbol without extension).
+    """
+
+    name: str
+    module: str
+    path: str
+    kind: str
+    line: int
+    anchor: str = ''
+
+    @property
+    def qualified(self) -> str:
+        """Name qualified with module name."""
+        if self.kind == 'module':
+            return self.module
+        return '{}.{}'.format(self.module, self.name)
+
+    def url(self, extension: str) -> str:
+        """Return page and anchor of symbol relative to docs root."""
+        if self.anchor:
+            return '{}{}#{}'.format(self.path, extension, self.anchor)
+        return self.path + extension
+
+
+def module_name(path: Path) -> str:
+    """Return dotted name of module, package for __init__.py."""
+    parts = list(path.relative_to(path.anchor).with_suffix('').parts)
+    if parts and parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+def import_bindings(module_import: ParsedImport, package: str,
+                    full: bool = False) -> List[Tuple[str, str]]:
+    """
+    Return pairs of bound name and imported dotted name.
+
+    Relative imports are resolved against package, star imports are
+    skipped. Plain "import a.b" binds "a" to "a", with full it is "a.b".
+    """
+    data = module_import.import_data
+    if not data:
+        return []
+    bindings = []
+    if data[0] == ParsedKeyword('from'):
+        level = 0
+        source: List[str] = []
+        index = 1
+        while data[index] != ParsedKeyword('import'):
+            if isinstance(data[index], ParsedOperator) and not source:
+                level += data[index].value.count('.')
+            if isinstance(data[index], ParsedName):
+                source.append(data[index].value)
+            index += 1
+        if level:
+            parts = package.split('.') if package else []
+            if level > 1:
+                parts = parts[:-(level - 1)]
+            source = parts + source
+        names = data[index + 1:]
+    else:
+        source = []
+        names = data[1:]
+    dotted: List[str] = []
+    alias = False
+    for part in names + [ParsedOperator(',')]:
+        if part == ParsedOperator(','):
+            if dotted and alias:
+                bindings.append((dotted[-1], '.'.join(source + dotted[:-1])))
+            elif dotted and source:
+                bindings.append((dotted[0], '.'.join(source + dotted)))
+            elif dotted:
+                bindings.append((dotted[0],
+                                 '.'.join(dotted if full else dotted[:1])))
+            dotted = []
+            alias = False
+        elif part == ParsedKeyword('as'):
+            alias = True
+        elif isinstance(part, ParsedName):
+            dotted.append(part.value)
+    return bindings
+
+
+def importable_names(modules: Iterable[str],
+                     packages: Set[str]) -> Dict[str, str]:
+    """
+    Map importable names of modules to dotted names.
+
+    Module is importable from every directory which is not a package,
+    "src/pkg/module.py" is "src.pkg.module" and "pkg.module" if src has
+    no __init__.py.
+    """
+    names: Dict[str, str] = {}
+    for module in modules:
+        parts = module.split('.')
+        for start in range(len(parts)):
+            if start == 0 or '.'.join(parts[:start]) not in packages:
+                names.setdefault('.'.join(parts[start:]), module)
+    return names
+
+
+class SymbolIndex:
+    """
+    Symbols of every module of a build.
+
+    Names are resolved like Python does it, in namespace of module: names
+    defined in module and imported names. Absolute imports are matched
+    with modules importable from any directory of build (see modules), so
+    index works with any input directory.
+    """
+
+    def __init__(self):
+        """Create empty index."""
+        self.symbols: List[Symbol] = []
+        self.qualified: Dict[str, Symbol] = {}
+        self.packages: Set[str] = set()
+        self.namespaces: Dict[str, Dict[str, str]] = {}
+        self._modules: Optional[Dict[str, str]] = None
+
+    def add(self, module: ParsedModule,
+            anchor: Callable[[str], str] = lambda name: ''):
+        """Record symbols of module, anchor returns anchor of heading."""
+        name = module_name(module.path)
+        path = module.path.as_posix()
+        namespace: Dict[str, str] = {}
+        package = name
+        if module.path.stem == '__init__':
+            self.packages.add(name)
+        else:
+            package = name.rpartition('.')[0]
+        for module_import in module.imports:
+            namespace.update(import_bindings(module_import, package))
+        symbols = [Symbol(name, name, path, 'module', 1)]
+        for parsed_class in module.classes:
+            class_name = parsed_class.name.value
+            symbols.append(Symbol(class_name, name, path, 'class',
+                                  parsed_class.line, anchor(class_name)))
+            for method in parsed_class.methods:
+                symbols.append(Symbol(
+                    '{}.{}'.format(class_name, method.name.value), name,
+                    path, 'method', method.line, anchor(method.name.value)))
+        for function in module.functions:
+            symbols.append(Symbol(function.name.value, name, path,
+                                  'function', function.line,
+                                  anchor(function.name.value)))
+        self.extend(symbols)
+        for symbol in symbols:
+            if symbol.kind in ('class', 'function'):
+                namespace[symbol.name] = symbol.qualified
+        self.namespaces[path] = namespace
+        self._modules = None
+
+    def extend(self, symbols: Iterable[Symbol]):
+        """
+        Record symbols without names of their modules.
+
+        Symbols are kept all, only the first one with qualified name is
+        resolved and saved.
+        """
+        for symbol in symbols:
+            self.symbols.append(symbol)
+            self.qualified.setdefault(symbol.qualified, symbol)
+        self._modules = None
+
+    @property
+    def modules(self) -> Dict[str, str]:
+        """Map importable names of modules to dotted names."""
+        if self._modules is None:
+            self._modules = importable_names(
+                [symbol.module for symbol in self.qualified.values()
+                 if symbol.kind == 'module'], self.packages)
+        return self._modules
+
+    def resolve(self, path: Path, name: str) -> Optional[Symbol]:
+        """Return symbol of dotted name used in module at path."""
+        namespace = self.namespaces.get(path.as_posix())
+        if not namespace:
+            return None
+        head, _, rest = name.partition('.')
+        target = namespace.get(head)
+        if target is None:
+            return None
+        return self.find('{}.{}'.format(target, rest) if rest else target)
+
+    def find(self, name: str, aliases: int = MAX_ALIASES) -> Optional[Symbol]:
+        """Return symbol of dotted name, re-exports are followed."""
+        parts = name.split('.')
+        for end in range(len(parts), 0, -1):
+            module = self.modules.get('.'.join(parts[:end]))
+            if module is None:
+                continue
+            rest = parts[end:]
+            symbol = self.qualified.get('.'.join([module] + rest))
+            if symbol is not None or not rest or aliases <= 0:
+                return symbol
+            namespace = self.namespaces.get(
+                self.qualified[module].path, {})
+            target = namespace.get(rest[0])
+            if target is None:
+                return None
+            return self.find('.'.join([target] + rest[1:]), aliases - 1)
+        return None
+
+    def split_bases(self, path: Path,
+                    parent_class: str) -> List[Tuple[str, Optional[Symbol]]]:
+        """
+        Split dotted names of parent classes to resolved names.
+
+        Names of all bases are joined by dot in parent_class, the longest
+        resolved names are taken greedily, unresolved names stay joined.
+        """
+        parts = parent_class.split('.')
+        bases: List[Tuple[str, Optional[Symbol]]] = []
+        start = 0
+        while start < len(parts):
+            for end in range(len(parts), start, -1):
+                name = '.'.join(parts[start:end])
+                symbol = self.resolve(path, name)
+                if symbol is not None:
+                    bases.append((name, symbol))
+                    start = end
+                    break
+            else:
+                if bases and bases[-1][1] is None:
+                    bases[-1] = ('{}.{}'.format(bases[-1][0], parts[start]),
+                                 None)
+                else:
+                    bases.append((parts[start], None))
+                start += 1
+        return bases
+
+    def search_index(self, extension: str) -> dict:
+        """
+        Return precomputed index for client side search.
+
+        Symbols are rows of qualified name, kind, url and line. Tokens are
+        sorted pairs of lowercase word and numbers of symbols, so client
+        finds words by prefix with binary search, without tokenizing.
+        """
+        symbols = sorted(self.qualified.values(),
+                         key=lambda symbol: symbol.qualified)
+        tokens: Dict[str, List[int]] = {}
+        for number, symbol in enumerate(symbols):
+            words = set()
+            for part in symbol.qualified.split('.'):
+                words.add(part.lower())
+                words.update(word.lower() for word in WORD.findall(part))
+            for word in words:
+                tokens.setdefault(word, []).append(number)
+        return {'format': SEARCH_FORMAT,
+                'symbols': [[symbol.qualified, symbol.kind,
+                             symbol.url(extension), symbol.line]
+                            for symbol in symbols],
+                'tokens': sorted(tokens.items())}
+
+    def save(self, path: Path):
+        """Replace SQLite database at path with symbols of index."""
+        temp = path.with_name('.{}.{}.{}.tmp'.format(path.name, os.getpid(),
+                                                     get_ident()))
+        try:
+            connection = sqlite3.connect(str(temp))
+            try:
+                with connection:
+                    connection.execute(
+                        'CREATE TABLE symbols (key TEXT, qualified_key TEXT,'
+                        ' name TEXT, module TEXT, path TEXT, kind TEXT,'
+                        ' line INTEGER, anchor TEXT)')
+                    connection.executemany(
+                        'INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        [(symbol.name.lower(), symbol.qualified.lower(),
+                          symbol.name, symbol.module, symbol.path,
+                          symbol.kind, symbol.line, symbol.anchor)
+                         for symbol in self.qualified.values()])
+                    connection.execute(
+                        'CREATE INDEX symbols_key ON symbols (key)')
+                    connection.execute('CREATE INDEX symbols_qualified_key '
+                                       'ON symbols (qualified_key)')
+            finally:
+                connection.close()
+            os.replace(temp, path)
+        except BaseException:
+            try:
+                temp.unlink()
+            except OSError:
+                pass
+            raise
+
+
+def search(path: Path, prefix: str,
+           limit: int = SEARCH_LIMIT) -> List[Symbol]:
+    """
+    Find symbols by case insensitive prefix in SQLite database at path.
+
+    Prefix is matched with name in module ("Class.method") and with name
+    qualified by module, shorter names are returned first.
+    """
+    low = prefix.lower()
+    high = low + '\U0010ffff'
+    connection = sqlite3.connect('file:{}?mode=ro'.format(
+        Path(path).absolute().as_posix()), uri=True)
+    try:
+        rows = connection.execute(
+            'SELECT * FROM (SELECT name, module, path, kind, line, anchor'
+            ' FROM symbols WHERE key >= ? AND key < ? UNION'
+            ' SELECT name, module, path, kind, line, anchor FROM symbols'
+            ' WHERE qualified_key >= ? AND qualified_key < ?)'
+            ' ORDER BY length(name), name, module LIMIT ?',
+            (low, high, low, high, limit)).fetchall()
+    finally:
+        connection.close()
+    return [Symbol(*row) for row in rows]
+
+
+def relative_url(page: Path, url: str) -> str:
+    """Return url relative to docs root as url relative to page of module."""
+    return posixpath.relpath(url, posixpath.dirname(page.as_posix()) or '.')
+
+
+def dump_search_index(index: dict) -> str:
+    """Return compact JSON of search index."""
+    return json.dumps(index, separators=(',', ':'), ensure_ascii=False)
@@ -0,0 +1,120 @@
+"""Watch mode, rebuilds documentation of changed files only."""
+
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple, Optional
+import parso
+from .discovery import Finder
+from .parse import read_source, decode_source, source_digest,\
+    extract_tree
+from .parsed_objects import ParsedModule
+from .manifest import Manifest, text_digest
+from .index_tree import group_paths, is_index_key
+from .style_base import BaseBuilder
+from .style_markdown import MarkdownBuilder
+
+
+class Watcher:
+    """
+    Keep parsed modules in memory and rerender touched files.
+
+    Files are polled by modification time and size. Changed files are
+    parsed with parso differential parser, which reuses tree of previous
+    version of file, so small edit is cheap to reparse.
+    """
+
+    def __init__(self, input_path: Path, output_path: Path,
+                 builder: Optional[BaseBuilder] = None,
+                 finder: Optional[Finder] = None):
+        """Create watcher for input directory."""
+        self.input_path = Path(input_path)
+        self.output_path = Path(output_path)
+        if builder is None:
+            builder = MarkdownBuilder()
+            builder.setting()
+        self.builder = builder
+        self.finder = finder or Finder()
+        self.grammar = parso.load_grammar()
+        self.modules: Dict[Path, ParsedModule] = {}
+        self.stamps: Dict[Path, Tuple[int, int]] = {}
+        self.manifest = Manifest(self.output_path, builder.signature())
+
+    def scan(self) -> Dict[Path, Tuple[int, int]]:
+        """Return modification time and size of every python file."""
+        stamps = {}
+        for python_file in self.finder.find(self.input_path):
+            try:
+                stat = python_file.stat()
+            except OSError:
+                continue
+            stamps[python_file] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def extract(self, file_name: Path) -> ParsedModule:
+        """Extract parsed module reusing previous parso tree of file."""
+        data = read_source(file_name)
+        root_node = self.grammar.parse(decode_source(data),
+                                       path=str(file_name.absolute()),
+                                       diff_cache=True, cache=False)
+        return extract_tree(root_node, file_name, source_digest(data))
+
+    def build(self):
+        """Extract every file and write changed documentation."""
+        self.stamps = self.scan()
+        for python_file in self.stamps:
+            self.modules[python_file] = self.extract(python_file)
+        self.builder.build(self.modules.values(), self.manifest)
+        self.builder.save(self.output_path)
+
+    def refresh(self) -> Tuple[List[Path], List[Path]]:
+        """Rerender touched files, return changed and removed paths."""
+        stamps = self.scan()
+        removed = [path for path in self.stamps if path not in stamps]
+        changed = []
+        for python_file, stamp in list(stamps.items()):
+            if self.stamps.get(python_file) == stamp:
+                continue
+            try:
+                module = self.extract(python_file)
+            except (OSError, UnicodeDecodeError):
+                stamps.pop(python_file)
+                continue
+            previous = self.modules.get(python_file)
+            self.modules[python_file] = module
+            if previous is None or previous.digest != module.digest:
+                changed.append(python_file)
+        added = [path for path in changed if path not in self.stamps]
+        self.stamps = stamps
+        if not changed and not removed:
+            return changed, removed
+        manifest = self.manifest
+        manifest.previous = dict(manifest.current)
+        texts = []
+        for python_file in removed:
+            self.modules.pop(python_file, None)
+            manifest.current.pop(str(python_file), None)
+        for python_file in changed:
+            module = self.modules[python_file]
+            text = self.builder.feed(module)
+            texts.append((python_file, text))
+            manifest.record(str(python_file), module.digest, text)
+        if (added or removed) and getattr(self.builder, 'i', False):
+            for key in [key for key in manifest.current
+                        if is_index_key(key)]:
+                manifest.current.pop(key)
+            for path, text in self.builder.index_pages(
+                    group_paths(self.modules)):
+                texts.append((path, text))
+                manifest.record(str(path), text_digest(text), text)
+        self.builder.texts = texts
+        self.builder.manifest = manifest
+        self.builder.save(self.output_path)
+        return changed, removed
+
+    def run(self, interval: float = 1.0, cycles: Optional[int] = None):
+        """Poll input directory every interval seconds."""
+        while cycles is None or cycles > 0:
+            time.sleep(interval)
+            self.refresh()
+            if cycles is not None:
+                cycles -= 1
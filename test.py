@@ -1,19 +1,65 @@
+from inspect import signature
 from pathlib import Path
 from random import shuffle
-from moduledocs.parsed_objects import ParsedKeyword
+from shutil import copytree
+import asyncio
+import json
+import os
+import pickle
+import time
+import pytest
+from moduledocs.parsed_objects import ParsedKeyword, ParsedOperator,\
+    ParsedName, ParsedLiteral
 from moduledocs.parse import find_python, extract, extract_statements,\
-    extract_imports
+    extract_imports, find_and_extract, read_source, extract_tree,\
+    extract_tree_functions, iter_nodes, filter_nodes, PART_TYPES,\
+    extract_source, same_parsed, LARGE_FILE_SIZE
+from moduledocs.budget import Budget, BudgetExceeded, ErrorReport,\
+    extract_within
+from moduledocs.cache import ParseCache
+from moduledocs.parse_large import extract_large, map_source,\
+    top_level_chunks
+from moduledocs.discovery import DEFAULT_EXCLUDE, Finder
+from moduledocs.output import SAVE_WINDOW, SaveReport
+from moduledocs.manifest import Manifest
+from moduledocs.index_tree import group_paths
+from moduledocs.profiling import Profiler
+from moduledocs.style_markdown import MarkdownBuilder
+from moduledocs.watch import Watcher
+from moduledocs.cli import cli, fast_arguments, merge, extract as\
+    extract_ir, render, make_budget
+from moduledocs.ir import IRReader, IRWriter
+from moduledocs.serve import DocsServer, PageCache
+from moduledocs.shard import parse_shard, split_shard
+from moduledocs.symbols import Symbol, search
+from moduledocs.graph import DependencyGraph
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import compare
+from benchmarks.bench_startup import import_times, LAZY_MODULES,\
+    IMPORT_BUDGET
 import parso
+from parso.python.tree import Name, Keyword, Operator, Literal
 
 
-def test_find():
+@pytest.fixture(scope='session')
+def testset(tmp_path_factory):
     module_dir = Path('testset/mypy')
+    if module_dir.is_dir():
+        return module_dir
+    module_dir = tmp_path_factory.mktemp('testset')
+    generate_corpus(module_dir, small_modules=20, huge_modules=1,
+                    deep_modules=1, decorated_modules=1, import_modules=1)
+    return module_dir
+
+
+def test_find(testset):
+    module_dir = testset
     paths = list(find_python(module_dir))
     assert paths
 
 
-def test_extract():
-    module_dir = Path('testset/mypy')
+def test_extract(testset):
+    module_dir = testset
     python_files = list(find_python(module_dir))
     shuffle(python_files)
     parsed_modules = []
@@ -49,3 +95,672 @@ def test_statement():
     module = parso.parse('\n'.join(code))
     statements = extract_statements(module)
     assert len(statements) == 5
+
+
+def test_extract_parallel():
+    module_dir = Path('moduledocs')
+    serial = list(find_and_extract(module_dir))
+    parallel = list(find_and_extract(module_dir, jobs=2))
+    assert [m.path for m in serial] == [m.path for m in parallel]
+    assert serial == parallel
+
+
+def test_parse_cache(tmp_path, monkeypatch):
+    cache = ParseCache(tmp_path / 'cache')
+    python_file = Path('moduledocs/parse.py')
+    parsed_module = cache.extract(python_file)
+    assert parsed_module == extract(python_file)
+    key = cache.key(read_source(python_file))
+    assert cache.get(key) == parsed_module
+    copy_file = tmp_path / 'copy.py'
+    copy_file.write_bytes(read_source(python_file))
+    copied_module = cache.extract(copy_file)
+    assert copied_module.path == copy_file
+    assert copied_module.name.value == 'copy'
+    assert copied_module.functions == parsed_module.functions
+    cache.max_size = 0
+    assert cache.evict() == 1
+    assert cache.get(key) is None
+
+    def interrupt(*args):
+        raise BudgetExceeded()
+
+    monkeypatch.setattr(pickle, 'dump', interrupt)
+    with pytest.raises(BudgetExceeded):
+        cache.put(key, parsed_module)
+    assert not list((tmp_path / 'cache').rglob('*.tmp'))
+
+
+def test_incremental_build(tmp_path):
+    modules = list(find_and_extract(Path('moduledocs')))
+    builder = MarkdownBuilder()
+    builder.setting()
+    builder.build(modules, Manifest(tmp_path, builder.signature()))
+    builder.save(tmp_path)
+    assert len(builder.texts) == len(modules) + 2
+    builder.build(modules, Manifest(tmp_path, builder.signature()))
+    builder.save(tmp_path)
+    assert builder.texts == []
+    removed = modules.pop()
+    builder.build(modules, Manifest(tmp_path, builder.signature()))
+    builder.save(tmp_path)
+    assert [path for path, _ in builder.texts] == \
+        [Path('index'), Path('moduledocs/index')]
+    assert not builder.output_path(tmp_path, removed.path).exists()
+
+
+def test_watcher(tmp_path):
+    source = tmp_path / 'src'
+    source.mkdir()
+    (source / 'first.py').write_text('def a():\n    """A."""\n')
+    (source / 'second.py').write_text('def b():\n    """B."""\n')
+    output = tmp_path / 'docs'
+    watcher = Watcher(source, output)
+    watcher.build()
+    first_doc = watcher.builder.output_path(output, source / 'first.py')
+    second_doc = watcher.builder.output_path(output, source / 'second.py')
+    assert 'A.' in first_doc.read_text()
+    assert watcher.refresh() == ([], [])
+    (source / 'first.py').write_text('def a():\n    """Changed."""\n')
+    (source / 'second.py').unlink()
+    assert watcher.refresh() == ([source / 'first.py'],
+                                 [source / 'second.py'])
+    assert 'Changed.' in first_doc.read_text()
+    assert not second_doc.exists()
+    source_index = output.joinpath(*source.parts[1:], 'index.md')
+    assert 'first' in source_index.read_text()
+    assert 'second' not in source_index.read_text()
+
+
+def test_visitor():
+    code = ['"""Module."""',
+            'import os',
+            'if os.name:',
+            '    from os import path as p',
+            'X = Y = 2',
+            '@deco(True, 1)',
+            'def f(a, /, b: int = 2, *, c=lambda: (yield), **kw) -> (int):',
+            '    """Doc."""',
+            '    def nested():',
+            '        return 1',
+            '    if a:',
+            '        return (yield b)',
+            '    raise',
+            'class A(B, metaclass=M):',
+            '    x = 1',
+            '    async def m(self): "d"; yield from x',
+            'y = 1']
+    module = parso.parse('\n'.join(code))
+    visited = extract_tree(module, Path('example.py'))
+    assert visited == extract_tree_functions(module, Path('example.py'))
+    assert len(visited.functions[0].returns) == 1
+    assert len(visited.functions[0].yields) == 1
+    for python_file in find_python(Path('moduledocs')):
+        module = parso.parse(python_file.read_text())
+        assert extract_tree(module, python_file) == \
+            extract_tree_functions(module, python_file)
+
+
+def test_deep_nesting():
+    depth = 3000
+    module = parso.parse('x = ' + '[' * depth + ']' * depth + '\n')
+    statement = extract_statements(module)[0]
+    assert len(statement.value) == depth * 2
+    parts = list(iter_nodes(module, PART_TYPES))
+    assert parts == list(filter_nodes(module, [Name, Keyword, Operator,
+                                               Literal]))
+
+
+def test_stream_build(tmp_path):
+    modules = list(find_and_extract(Path('moduledocs')))
+    builder = MarkdownBuilder()
+    builder.setting()
+    builder.build(modules)
+    builder.save(tmp_path / 'saved')
+    streamed = tmp_path / 'streamed'
+
+    window = builder.save_threads * SAVE_WINDOW
+
+    def produce():
+        for number, module in enumerate(modules):
+            if number > window:
+                previous = modules[number - window - 1].path
+                assert builder.output_path(streamed, previous).exists()
+            yield module
+
+    builder.stream(produce(), streamed)
+    for path in (tmp_path / 'saved').rglob('*.md'):
+        relative = path.relative_to(tmp_path / 'saved')
+        assert (streamed / relative).read_text() == path.read_text()
+
+
+def test_compact_tokens():
+    module = parso.parse('from a import b, c as d\n')
+    parsed_import = extract_imports(module)[0]
+    assert parsed_import.import_data[0] is ParsedKeyword('from')
+    assert ParsedOperator(',') is ParsedOperator(',')
+    assert not hasattr(ParsedName('x'), '__dict__')
+    assert not hasattr(ParsedLiteral('1'), '__dict__')
+    copied = pickle.loads(pickle.dumps(parsed_import))
+    assert copied.import_data[0] is ParsedKeyword('from')
+    assert copied.code() == 'from a import b, c as d'
+
+
+def test_corpus(tmp_path):
+    first = generate_corpus(tmp_path / 'first', seed=3, small_modules=5)
+    second = generate_corpus(tmp_path / 'second', seed=3, small_modules=5)
+    assert first == second
+    for path in find_python(tmp_path / 'first'):
+        relative = path.relative_to(tmp_path / 'first')
+        assert (tmp_path / 'second' / relative).read_text() == \
+            path.read_text()
+    assert compare({'extract': 2.0, 'feed': 1.0},
+                   {'extract': 1.0, 'feed': 1.0}, 0.2) == ['extract']
+
+
+def test_profile(tmp_path):
+    report_path = tmp_path / 'profile.json'
+    stats_path = tmp_path / 'extract.prof'
+    cli('moduledocs', str(tmp_path / 'docs'), profile=str(report_path),
+        slowest=3, cprofile=str(stats_path))
+    report = json.loads(report_path.read_text())
+    files = [str(path) for path in find_python(Path('moduledocs'))]
+    assert sorted(report['files']) == sorted(files)
+    for phase in ['discovery', 'read', 'parse', 'extract', 'feed', 'index',
+                  'save']:
+        assert report['phases'][phase]['wall'] >= 0
+    assert len(report['slowest']) == 3
+    walls = [item['wall'] for item in report['slowest']]
+    assert walls == sorted(walls, reverse=True)
+    assert stats_path.stat().st_size > 0
+    parallel_path = tmp_path / 'parallel.json'
+    cli('moduledocs', str(tmp_path / 'docs'), jobs=2,
+        profile=str(parallel_path))
+    assert sorted(json.loads(parallel_path.read_text())['files']) == \
+        sorted(files)
+
+
+def test_find_rules(tmp_path):
+    files = ['a.py', 'pkg/__init__.py', 'pkg/b.py', 'pkg/gen/c.py',
+             'pkg/keep.py', 'scripts/d.py', '.git/e.py', 'build/f.py',
+             'pkg/build/g.py', 'notes.txt']
+    for name in files:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text('x = 1\n')
+    (tmp_path / 'pkg/.gitignore').write_text('gen/\n*.py\n!keep.py\n')
+
+    def found(**options):
+        return sorted(str(path.relative_to(tmp_path))
+                      for path in find_python(tmp_path, **options))
+
+    assert found() == sorted(name for name in files if name.endswith('.py'))
+    assert found(exclude=DEFAULT_EXCLUDE) == [
+        'a.py', 'pkg/__init__.py', 'pkg/b.py', 'pkg/build/g.py',
+        'pkg/gen/c.py', 'pkg/keep.py', 'scripts/d.py']
+    assert found(exclude=DEFAULT_EXCLUDE, gitignore=True) == [
+        'a.py', 'pkg/keep.py', 'scripts/d.py']
+    assert found(exclude=['/build/', '.*/'], packages_only=True) == [
+        'a.py', 'pkg/__init__.py', 'pkg/b.py', 'pkg/keep.py']
+    module_dir = Path('moduledocs')
+    assert list(find_python(module_dir, threads=4)) == \
+        list(find_python(module_dir))
+
+
+def test_markdown_render():
+    source = (
+        '"""Doc."""\nfrom os import path\nX_Y = 1\n\n\n'
+        'class My_Class:\n    """Class doc."""\n\n'
+        '    def method(self, a: int = 1) -> str:\n'
+        '        """Method doc."""\n\n\n'
+        'def func(*args, **kwargs):\n    pass\n')
+    builder = MarkdownBuilder()
+    builder.setting()
+    text = builder.feed(extract_source(source, Path('pkg/my_mod.py')))
+    assert text == (
+        '# My mod\n\n\n\n  + [My mod](#my-mod)\n\n'
+        '    + [Require](#require)\n\n    + [Docstring](#docstring)\n\n'
+        '    + [Configuration](#configuration)\n\n'
+        '      + [Imports](#imports)\n\n'
+        '      + [Statements](#statements)\n\n'
+        '    + [Classes](#classes)\n\n'
+        '      + [My\\_Class](#my_class)\n\n'
+        '        + [method](#method)\n\n'
+        '    + [Functions](#functions)\n\n      + [func](#func)\n\n\n\n'
+        '## Require\n\n_os_ \n\n## Docstring\n\nDoc.\n\n'
+        '## Configuration\n\n### Imports\n\n`from os import path`\n\n'
+        '### Statements\n\n`X_Y = 1`\n\n## Classes\n\n'
+        '### My\\_Class\n\nClass doc.\n\n\n\n#### method\n\n'
+        '__(self, a: int = 1)__ -> __str__ \n\nMethod doc.\n\n'
+        '## Functions\n\n\n\n### func\n\n__(*args, **kwargs)__ \n\n')
+    builder.index_page_size = 1
+    pages = dict(builder.index_pages(group_paths(
+        [Path('pkg/my_mod.py'), Path('pkg/sub/b.py'), Path('pkg/a.py')])))
+    assert list(pages) == [Path('index'), Path('pkg/index'),
+                           Path('pkg/index-2'), Path('pkg/sub/index')]
+    assert pages[Path('index')] == (
+        '# Index\n\n## Tree\n\n+ [pkg/](pkg/index.md) 3\n'
+        '  + [sub/](pkg/sub/index.md) 1\n\n')
+    assert pages[Path('pkg/index-2')] == (
+        '# Index of /pkg, page 2 of 2\n\n[Up](../index.md)\n\n'
+        '## Directories\n\n+ [sub/](sub/index.md) 1\n\n'
+        '## Modules\n\n+ [my\\_mod.py](my_mod.py.md)\n\n'
+        '[Previous](index.md)\n')
+
+
+def test_index_pages(tmp_path):
+    modules = [extract_source('X = {}\n'.format(number), Path(path))
+               for number, path in enumerate(
+                   ['a/one.py', 'a/two.py', 'a/b/three.py', 'c/four.py'])]
+    builder = MarkdownBuilder()
+    builder.setting()
+    builder.index_page_size = 1
+    builder.build(modules, Manifest(tmp_path, builder.signature()))
+    builder.save(tmp_path)
+    assert (tmp_path / 'a' / 'index-2.md').is_file()
+    assert '(../index.md)' in (tmp_path / 'a' / 'b' / 'index.md').read_text()
+    builder.build(modules[:2], Manifest(tmp_path, builder.signature()))
+    builder.save(tmp_path)
+    assert [path for path, _ in builder.texts if path.suffix != '.py'] == \
+        [Path('index'), Path('a/index'), Path('a/index-2')]
+    assert not (tmp_path / 'a' / 'b' / 'index.md').exists()
+    assert not (tmp_path / 'c' / 'index.md').exists()
+    assert (tmp_path / 'a' / 'index-2.md').is_file()
+
+
+def test_save_report(tmp_path):
+    modules = list(find_and_extract(Path('moduledocs')))
+    builder = MarkdownBuilder()
+    builder.setting()
+    builder.build(modules)
+    assert builder.save(tmp_path) == SaveReport(len(modules) + 2, 0, 0)
+    output = builder.output_path(tmp_path, modules[0].path)
+    builder.texts[0] = (modules[0].path, 'changed')
+    assert builder.save(tmp_path) == SaveReport(1, len(modules) + 1, 0)
+    assert output.read_text() == 'changed'
+    stamp = output.stat().st_mtime_ns
+    assert builder.save(tmp_path) == SaveReport(0, len(modules) + 2, 0)
+    assert output.stat().st_mtime_ns == stamp
+    assert not list(tmp_path.rglob('*.tmp'))
+    docs = tmp_path / 'incremental'
+    builder.stream(modules, docs, Manifest(docs, builder.signature()))
+    report = builder.stream(modules[1:], docs,
+                            Manifest(docs, builder.signature()))
+    assert report == SaveReport(2, 0, 1)
+
+
+def test_ast_parser(testset):
+    code = '\n'.join(['"""Module."""',
+                      'import os',
+                      'if os.name:',
+                      '    from os import (path as p,)',
+                      'X: int = f"{os.name!r:>{10}}" "tail"',
+                      '@deco(True, 1)',
+                      'def f(a, /, b: int = 2, *, c=lambda: (yield),',
+                      '      **kw) -> (  # result',
+                      '        int):',
+                      '    """Doc."""',
+                      '    def nested():',
+                      '        return 1',
+                      '    if a:',
+                      '        return (yield b)',
+                      '    raise',
+                      'class A(B.C, metaclass=M):',
+                      '    async def m(self): "d"; yield from x',
+                      'class D(): pass'])
+    path = Path('example.py')
+    assert extract_source(code, path, parser='ast') == \
+        extract_source(code, path)
+    files = list(find_python(Path('moduledocs'))) + \
+        list(find_python(testset))
+    for python_file in files:
+        source = read_source(python_file).decode()
+        assert extract_source(source, python_file, parser='ast') == \
+            extract_source(source, python_file)
+    match = 'def f(x):\n    match x:\n        case 1:\n            return 1\n'
+    with pytest.raises(SyntaxError):
+        extract_source(match, path, parser='ast')
+    assert extract_source(match, path, parser='auto') == \
+        extract_source(match, path)
+    assert extract_source('def f(:\n', path, parser='auto') == \
+        extract_source('def f(:\n', path)
+
+
+def test_startup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path('small.py').write_text('def f(x):\n    return f"{x!r:>{10}}"\n')
+    cli('small.py', 'docs')
+    assert '(small.py.md)' in Path('docs/index.md').read_text()
+    times = import_times('moduledocs.cli')
+    assert not set(LAZY_MODULES) & set(times)
+    assert times['moduledocs.cli'] < IMPORT_BUDGET
+    assert fast_arguments(cli, ['src', '--jobs', '2', '--incremental',
+                                '--cache-dir=cache']) == \
+        {'input_directory': 'src', 'jobs': 2, 'incremental': True,
+         'cache_dir': 'cache'}
+    assert fast_arguments(cli, ['src', 'out', 'md']) == \
+        {'input_directory': 'src', 'output_directory': 'out', 'style': 'md'}
+    assert fast_arguments(cli, ['--help']) is None
+    assert fast_arguments(cli, ['src', '--jobs=many']) is None
+    assert fast_arguments(cli, ['src', '--incremental=False']) is None
+
+
+def test_signatures_extraction():
+    for python_file in find_python(Path('moduledocs')):
+        for parser in ['parso', 'ast']:
+            full = extract(python_file, parser=parser)
+            signatures = extract(python_file, parser=parser,
+                                 extraction='signatures')
+            assert not signatures.statements
+            assert signatures.imports == full.imports
+            full_functions = full.functions + [
+                method for parsed_class in full.classes
+                for method in parsed_class.methods]
+            functions = signatures.functions + [
+                method for parsed_class in signatures.classes
+                for method in parsed_class.methods]
+            assert [function.code_param() for function in functions] == \
+                [function.code_param() for function in full_functions]
+            assert not any(function.returns or function.yields or
+                           function.raises for function in functions)
+    with pytest.raises(ValueError):
+        extract(Path('moduledocs/cli.py'), extraction='bodies')
+
+
+def test_symbol_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path('src/pkg/sub').mkdir(parents=True)
+    Path('src/pkg/__init__.py').write_text('from .base import Base\n')
+    Path('src/pkg/sub/__init__.py').write_text('')
+    Path('src/pkg/base.py').write_text(
+        'class Base:\n    def run(self):\n        pass\n')
+    Path('src/pkg/sub/child.py').write_text(
+        'import json\nfrom .. import Base\nimport pkg.base as b\n\n\n'
+        'class Child(Base):\n    def copy(self, other: "b.Base") -> Base:'
+        '\n        pass\n\n\ndef load() -> json.JSONDecoder:\n    pass\n')
+    cli('src', 'docs', symbols=True, incremental=True)
+    child = Path('docs/src/pkg/sub/child.py.md').read_text()
+    assert 'Bases: [Base](../base.py.md#base)' in child
+    assert '__(self, other: "[b.Base](../base.py.md#base)")__' in child
+    assert '-> __[Base](../base.py.md#base)__' in child
+    assert '__json.JSONDecoder__' in child
+    symbols = search(Path('docs/symbols.sqlite'), 'base.r')
+    assert symbols == [Symbol('Base.run', 'src.pkg.base', 'src/pkg/base.py',
+                              'method', 2, 'run')]
+    assert [symbol.qualified for symbol in search(
+        Path('docs/symbols.sqlite'), 'src.pkg.sub.')] == \
+        ['src.pkg.sub.child.load', 'src.pkg.sub.child.Child',
+         'src.pkg.sub.child.Child.copy', 'src.pkg.sub.child']
+    index = json.loads(Path('docs/search.json').read_text())
+    names = [symbol[0] for symbol in index['symbols']]
+    assert index['symbols'][names.index('src.pkg.sub.child.Child')] == \
+        ['src.pkg.sub.child.Child', 'class',
+         'src/pkg/sub/child.py.md#child', 6]
+    assert names.index('src.pkg.base.Base') in dict(index['tokens'])['base']
+    Path('src/pkg/base.py').write_text('class Root:\n    pass\n')
+    cli('src', 'docs', symbols=True, incremental=True)
+    child = Path('docs/src/pkg/sub/child.py.md').read_text()
+    assert 'Bases: Base' in child
+    assert 'Base.run' not in Path('docs/search.json').read_text()
+
+
+def test_dependency_graph(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path('pkg').mkdir()
+    sources = {'pkg/__init__.py': '',
+               'pkg/base.py': 'import os\nclass Base:\n    pass\n',
+               'pkg/mid.py': 'from .base import Base\nfrom . import top\n'
+                             'class Mid:\n    pass\n',
+               'pkg/top.py': 'from pkg.mid import Base\n',
+               'pkg/other.py': 'from .mid import Mid\nimport pkg.top\n'}
+    graph = DependencyGraph()
+    for name, source in sources.items():
+        Path(name).write_text(source)
+        graph.add(extract(Path(name)))
+    assert graph.dependencies['pkg/mid.py'] == ['pkg/base.py', 'pkg/top.py']
+    assert graph.dependents['pkg/mid.py'] == ['pkg/other.py', 'pkg/top.py']
+    order = graph.topological_order()
+    assert order.index('pkg/base.py') < order.index('pkg/mid.py') < \
+        order.index('pkg/other.py')
+    assert graph.cycles() == [['pkg/mid.py', 'pkg/top.py']]
+    assert graph.affected(['pkg/base.py']) == \
+        {'pkg/base.py', 'pkg/mid.py', 'pkg/top.py', 'pkg/other.py'}
+    assert graph.affected(['pkg/other.py']) == {'pkg/other.py'}
+    assert '"pkg.top" -> "pkg.mid" [color=red];' in graph.to_dot()
+    assert json.loads(graph.to_json())['cycles'] == [['pkg.mid', 'pkg.top']]
+    graph = DependencyGraph()
+    for name in ['pkg/__init__.py', 'pkg/base.py', 'pkg/other.py']:
+        graph.add(extract(Path(name)))
+    graph.add_removed('pkg/mid.py')
+    assert graph.affected(['pkg/mid.py']) == {'pkg/mid.py', 'pkg/other.py'}
+    Path('user.py').write_text(
+        'import pkg\n\n\ndef f(x: pkg.base.Base):\n    pass\n')
+    graph.add(extract(Path('user.py')))
+    assert graph.affected(['pkg/base.py']) == \
+        {'pkg/base.py', 'pkg/other.py', 'user.py'}
+    link = '[pkg.base.Base](pkg/base.py.md#base)'
+    cli('.', 'docs', symbols=True, incremental=True)
+    assert link in Path('docs/user.py.md').read_text()
+    for name in ['Other', 'Base']:
+        Path('pkg/base.py').write_text(
+            'import os\nclass {}:\n    pass\n'.format(name))
+        cli('.', 'docs', symbols=True, incremental=True)
+        assert (link in Path('docs/user.py.md').read_text()) == \
+            (name == 'Base')
+
+
+def test_sharded_build(tmp_path, monkeypatch):
+    copytree(Path('moduledocs'), tmp_path / 'src' / 'moduledocs')
+    monkeypatch.chdir(tmp_path)
+    cli('src', 'one', symbols=True)
+    for index in [1, 2]:
+        cli('src', 'many', symbols=True, shard='{}/3'.format(index))
+    with pytest.raises(ValueError):
+        merge('many')
+    cli('src', 'many', symbols=True, shard='3/3')
+    merge('many')
+    one = sorted(path.relative_to('one') for path in Path('one').rglob('*')
+                 if path.is_file())
+    many = sorted(path.relative_to('many') for path in Path('many').rglob('*')
+                  if path.is_file() and
+                  not path.name.startswith('.moduledocs.shard-'))
+    assert one == many
+    for path in one:
+        assert (Path('one') / path).read_bytes() == \
+            (Path('many') / path).read_bytes()
+    assert split_shard([Path('src/a.py'), Path('src/b/c.py')], Path('src'),
+                       1, 1) == ([Path('src/a.py'), Path('src/b/c.py')], [])
+    with pytest.raises(ValueError):
+        parse_shard('4/3')
+
+
+def test_ir_render(tmp_path, monkeypatch):
+    copytree(Path('moduledocs'), tmp_path / 'src' / 'moduledocs')
+    monkeypatch.chdir(tmp_path)
+    cli('src', 'direct', style='md,html,json', symbols=True)
+    extract_ir('src', 'src.ir')
+    render('src.ir', 'rendered', style='md,html,json', symbols=True)
+    with IRReader(Path('src.ir')) as reader:
+        paths = reader.paths()
+        assert Path('src/moduledocs/ir.py') in paths
+        assert reader.load(Path('src/moduledocs/ir.py')).name.value == 'ir'
+        assert len(list(reader)) == len(paths)
+    direct = sorted(path.relative_to('direct')
+                    for path in Path('direct').rglob('*') if path.is_file())
+    assert {path.parts[0] for path in direct} == {'md', 'html', 'json'}
+    for path in direct:
+        if not path.name.startswith('.moduledocs'):
+            assert (Path('direct') / path).read_bytes() == \
+                (Path('rendered') / path).read_bytes()
+    page = json.loads(Path('direct/json/src/moduledocs/ir.py.json')
+                      .read_text())
+    assert [item['name'] for item in page['classes']] == ['IRWriter',
+                                                          'IRReader']
+    Path('bad.ir').write_bytes(b'NOPE')
+    with pytest.raises(ValueError):
+        IRReader(Path('bad.ir'))
+    with monkeypatch.context() as patch:
+        patch.setattr('moduledocs.ir.__version__', '0.0.0')
+        with IRWriter(Path('old.ir')) as writer:
+            writer.write(extract(Path('src/moduledocs/ir.py')))
+    with pytest.raises(ValueError, match='0.0.0'):
+        IRReader(Path('old.ir'))
+
+
+def test_serve(tmp_path):
+    (tmp_path / 'pkg').mkdir()
+    (tmp_path / 'pkg' / 'a.py').write_text('def first(x: int):\n    pass\n')
+    (tmp_path / 'skip').mkdir()
+    (tmp_path / 'skip' / 'b.py').write_text('x = 1\n')
+    docs_server = DocsServer(tmp_path, jobs=1, finder=Finder(['skip/']))
+
+    async def get(port, path):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write('GET {} HTTP/1.0\r\n\r\n'.format(path).encode())
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), body.decode()
+
+    async def requests():
+        server = await docs_server.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            pages = await asyncio.gather(*[get(port, '/pkg/a.py.md')
+                                           for _ in range(3)])
+            assert docs_server.cache.misses == 3
+            assert len(docs_server.cache.entries) == 1
+            status, index = await get(port, '/')
+            assert status == 200 and '(pkg/index.md)' in index
+            assert 'skip' not in index
+            status, index = await get(port, '/pkg/index.md')
+            assert status == 200 and '(a.py.md)' in index
+            assert (await get(port, '/pkg/index-2.md'))[0] == 404
+            assert (await get(port, '/skip/b.py.md'))[0] == 404
+            assert (await get(port, '/../pkg/a.py.md'))[0] == 404
+            os.utime(tmp_path / 'pkg' / 'a.py', (1, 1))
+            assert await get(port, '/pkg/a.py.md') == pages[0]
+            (tmp_path / 'pkg' / 'a.py').write_text('def second():\n    pass\n')
+            return pages, await get(port, '/pkg/a.py.md')
+        finally:
+            server.close()
+            await server.wait_closed()
+            docs_server.close()
+
+    pages, changed = asyncio.run(requests())
+    assert pages[0] == pages[1] == pages[2]
+    assert pages[0][0] == 200 and 'first' in pages[0][1]
+    assert changed[0] == 200 and 'second' in changed[1]
+    cache = PageCache(10)
+    cache.put('a', (0, 0), '', b'123456')
+    cache.put('b', (0, 0), '', b'123456')
+    assert list(cache.entries) == ['b'] and cache.size == 6
+    assert cache.get('b', (0, 1)) is None
+
+
+def test_dedup(tmp_path):
+    source = 'def first(x: int):\n    pass\n'
+    for name in ['a/one.py', 'b/one.py', 'b/two.py', 'c.py']:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text(source if 'one' in name else name)
+    profiler = Profiler()
+    modules = {module.path.relative_to(tmp_path).as_posix(): module
+               for module in find_and_extract(tmp_path, hooks=profiler)}
+    assert modules['b/one.py'].path == tmp_path / 'b' / 'one.py'
+    assert modules['b/one.py'].functions is modules['a/one.py'].functions
+    assert modules['b/two.py'].functions is not \
+        modules['a/one.py'].functions
+    assert profiler.report()['dedup']['extract'] == {
+        'hits': 1, 'misses': 3, 'rate': 0.25}
+    plain = list(find_and_extract(tmp_path, dedup=False))
+    assert sorted(plain, key=str) == sorted(modules.values(), key=str)
+    builder = MarkdownBuilder()
+    builder.setting()
+    builder.hooks = profiler
+    builder.build(list(modules.values()))
+    assert profiler.shares['feed']['hits'] == 1
+    texts = {str(path): text for path, text in builder.texts}
+    assert texts[str(modules['a/one.py'].path)] == \
+        texts[str(modules['b/one.py'].path)]
+
+
+class FaultyCache:
+    def extract(self, file_name, timings=None):
+        if file_name.name == 'crash.py':
+            os._exit(1)
+        if file_name.name == 'slow.py':
+            time.sleep(10)
+        return extract(file_name, timings)
+
+
+def test_budget(tmp_path):
+    for name in ['a.py', 'big.py', 'crash.py', 'slow.py', 'z.py']:
+        (tmp_path / name).write_text('X = {!r}\n'.format(
+            name * (100 if name == 'big.py' else 1)))
+    budget = Budget(max_size=200, timeout=0.5)
+    errors = ErrorReport()
+    modules = find_and_extract(tmp_path, jobs=2, cache=FaultyCache(),
+                               budget=budget, errors=errors)
+    assert sorted(module.path.name for module in modules) == ['a.py', 'z.py']
+    assert sorted((Path(error.path).name, error.kind) for error in errors) \
+        == [('big.py', 'size'), ('crash.py', 'crash'), ('slow.py', 'timeout')]
+    errors = ErrorReport()
+    modules = find_and_extract(tmp_path, budget=budget, errors=errors)
+    assert len(list(modules)) == 4
+    assert errors.report()['kinds'] == {'size': 1, 'timeout': 0, 'error': 0,
+                                        'crash': 0}
+    error = extract_within(lambda path: same_parsed(None), budget,
+                           tmp_path / 'a.py')
+    assert (error.kind, error.error, error.message) == \
+        ('error', 'Exception', 'Same not found!')
+
+
+def test_large_module(tmp_path):
+    code = '\n'.join([
+        '# Comment', '"""Doc."""', 'import os', 'X = """', 'def fake():',
+        '"""', 'Y = (1,', '# ) in comment', '2)', 'Z = \'(\' + "\\"(" \\',
+        "    + ''", '@decorator', '', "def first(a='#'):",
+        '    """Doc of first."""', 'try:', '    import sys', 'except A:',
+        '    pass', 'else:', '    pass', 'class Second(Base):',
+        '    def method(self, b: \'str\' = "\'"):', '        return b', ''])
+    path = tmp_path / 'large.py'
+    path.write_text(code)
+    with map_source(path) as data:
+        chunks = [bytes(data[start:end]).decode().split('\n')[0]
+                  for start, end, _ in top_level_chunks(data, 1)]
+    assert chunks == ['# Comment', 'import os', 'X = """', 'Y = (1,',
+                      "Z = '(' + \"\\\"(\" \\", '@decorator', 'try:',
+                      'class Second(Base):']
+    for parser in ['parso', 'ast']:
+        module = extract(path, parser=parser, large_size=0)
+        assert extract_large(path, parser=parser, chunk_size=1) == module
+        assert extract(path, parser=parser, large_size=1) == module
+        assert module.classes[0].methods[0].line == 23
+    (tmp_path / 'empty.py').write_text('')
+    with map_source(tmp_path / 'empty.py') as data:
+        assert list(top_level_chunks(data)) == [(0, 0, 1)]
+
+
+def test_large_budget(tmp_path):
+    comment = '#' * 4000 + '\n'
+    with open(tmp_path / 'huge.py', 'w') as file:
+        for number in range(LARGE_FILE_SIZE // len(comment) + 1):
+            file.write('def f{}():\n    """Doc."""\n'.format(number) +
+                       comment)
+    (tmp_path / 'mid.py').write_text('X = 1\n' + comment * 500)
+    defaults = signature(cli).parameters
+    budgets = [make_budget(defaults['max_file_size'].default,
+                           defaults['file_timeout'].default),
+               make_budget(16.0, 60.0)]
+    for budget in budgets:
+        errors = ErrorReport()
+        modules = {module.path.name: module for module in find_and_extract(
+            tmp_path, budget=budget, errors=errors)}
+        assert len(modules['huge.py'].functions) == \
+            LARGE_FILE_SIZE // len(comment) + 1
+        assert not errors
+    errors = ErrorReport()
+    assert not list(find_and_extract(tmp_path, budget=make_budget(1.0, 60.0),
+                                     errors=errors))
+    assert sorted((Path(error.path).name, error.kind)
+                  for error in errors) == [('huge.py', 'size'),
+                                           ('mid.py', 'size')]